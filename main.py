@@ -2,7 +2,6 @@
 # -*- coding: utf-8 -*-
 
 """
-<<<<<<< HEAD
 小鹅通视频下载器主程序
 
 使用方法:
@@ -21,6 +20,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent / 'src'))
 
 from xiaoet_downloader import XiaoetConfig, XiaoetDownloadManager, logger
+from xiaoet_downloader.core.scheduler import POLICY_NAMES, create_policy
 
 
 def main():
@@ -35,6 +35,14 @@ def main():
   python main.py --config custom.json     # 使用自定义配置文件
   python main.py --no-cache               # 忽略缓存重新下载
   python main.py --no-transcode           # 只下载不转码
+  python main.py --progressive            # 边下载边输出，下载时即可播放
+  python main.py --audio-only             # 视频课程只保留音频（.m4a）
+  python main.py --order shortest         # 片段最少的视频优先下载
+  python main.py --resume                 # 从上次中断处继续下载课程
+  python main.py --watch --interval 300   # 守护模式，每5分钟同步新发布的视频
+  python main.py --transcode-all -j 8     # 并行转码所有已下载的视频
+  python main.py --verify-all -j 16       # 并行校验所有已合并的视频
+  python main.py --serve-cache --cache-host 0.0.0.0   # 作为局域网缓存代理运行
   python main.py --check                  # 检查运行环境
         """
     )
@@ -62,6 +70,149 @@ def main():
         help='只下载不转码'
     )
     
+    parser.add_argument(
+        '--progressive',
+        action='store_true',
+        help='边下载边输出：按顺序把已下载的片段追加到输出TS文件和live.m3u8，'
+             '下载过程中即可播放，完成后不再合并'
+    )
+    
+    parser.add_argument(
+        '--audio-only',
+        action='store_true',
+        help='视频课程只保留音频（.m4a）：播放列表提供独立音轨时只下载音轨，否则合并时去掉视频流'
+    )
+    
+    parser.add_argument(
+        '--order',
+        choices=POLICY_NAMES,
+        default='catalogue',
+        help='课程资源下载顺序: catalogue=目录顺序, shortest=片段最少优先, '
+             'newest=最新发布优先, priority=按 --priority 指定, '
+             'throughput=剩余下载量最少优先 (默认: catalogue)'
+    )
+    
+    parser.add_argument(
+        '--priority',
+        help='优先下载的资源ID，逗号分隔，配合 --order priority 使用'
+    )
+    
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='从上次中断的检查点继续下载课程（沿用课程目录和下载队列）'
+    )
+    
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='守护模式：常驻运行，定期检查课程更新并只下载新增的视频'
+    )
+    
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=600,
+        help='守护模式的检查间隔，单位秒 (默认: 600)'
+    )
+    
+    parser.add_argument(
+        '--status-port',
+        type=int,
+        default=8765,
+        help='守护模式的本地状态接口端口，0表示不启动 (默认: 8765)'
+    )
+    
+    parser.add_argument(
+        '--auth-wait',
+        type=float,
+        help='cookie失效后等待配置文件中的cookie被更新的秒数，更新后自动继续 '
+             '(默认: 立即停止；守护模式下一直等待)'
+    )
+    
+    parser.add_argument(
+        '--transcode-all',
+        action='store_true',
+        help='并行转码下载目录中所有已下载的视频（不访问网络）'
+    )
+    
+    parser.add_argument(
+        '--verify-all',
+        action='store_true',
+        help='并行校验所有已合并的视频（容器时长与播放列表时长比较、抽查关键帧），'
+             '上次校验通过且没有变化的文件跳过，配合 --no-cache 全部重新校验'
+    )
+    
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        help='批量转码/校验的并发数上限 (默认: 转码为CPU核数，校验为CPU核数的2倍)'
+    )
+    
+    parser.add_argument(
+        '--io-jobs',
+        type=int,
+        help='批量转码时同时读写磁盘的任务数上限 (默认: 4)'
+    )
+    
+    parser.add_argument(
+        '--nice',
+        type=int,
+        help='以指定的nice值运行ffmpeg'
+    )
+    
+    parser.add_argument(
+        '--ionice',
+        action='store_true',
+        help='以idle IO优先级运行ffmpeg（仅Linux）'
+    )
+    
+    parser.add_argument(
+        '--gc-segments',
+        action='store_true',
+        help='清理片段去重存储中没有被任何资源引用的片段'
+    )
+    
+    parser.add_argument(
+        '--serve-cache',
+        action='store_true',
+        help='作为局域网缓存代理运行：缓存片段和m3u8请求，其他实例在配置中设置 '
+             'cache_proxy 指向本机后每个片段只从CDN下载一次'
+    )
+    
+    parser.add_argument(
+        '--cache-host',
+        default='127.0.0.1',
+        help='缓存代理的监听地址 (默认: 127.0.0.1，只允许本机访问；局域网共享时设为 0.0.0.0 或本机局域网IP)'
+    )
+    
+    parser.add_argument(
+        '--cache-allow-host',
+        action='append',
+        metavar='HOST',
+        help='缓存代理允许请求的上游主机（包括其子域名），可多次指定 (默认: 小鹅通和腾讯云点播的CDN域名)'
+    )
+    
+    parser.add_argument(
+        '--cache-port',
+        type=int,
+        default=8800,
+        help='缓存代理的监听端口 (默认: 8800)'
+    )
+    
+    parser.add_argument(
+        '--cache-size',
+        type=float,
+        default=20,
+        help='缓存代理的磁盘缓存上限，单位GB (默认: 20)'
+    )
+    
+    parser.add_argument(
+        '--no-progress',
+        action='store_true',
+        help='不显示汇总进度（终端中的进度条或定期输出的进度行）'
+    )
+    
     parser.add_argument(
         '--check',
         action='store_true',
@@ -82,6 +233,19 @@ def main():
         logger.set_level(logging.DEBUG)
     
     try:
+        # 缓存代理模式不需要登录信息，配置文件只用于确定缓存位置
+        if args.serve_cache:
+            from xiaoet_downloader.core.cache_proxy import CachingProxy
+            download_dir = XiaoetConfig.from_file(args.config).download_dir if os.path.exists(args.config) else 'download'
+            CachingProxy(
+                os.path.join(download_dir, CachingProxy.DIR_NAME),
+                max_bytes=int(args.cache_size * 1024 ** 3),
+                host=args.cache_host,
+                port=args.cache_port,
+                upstream_hosts=args.cache_allow_host
+            ).run()
+            return 0
+        
         # 加载配置
         if not os.path.exists(args.config):
             logger.error(f"配置文件不存在: {args.config}")
@@ -89,7 +253,12 @@ def main():
             return 1
         
         config = XiaoetConfig.from_file(args.config)
-        manager = XiaoetDownloadManager(config)
+        if args.audio_only:
+            config.audio_only = True
+        # 登录失效时的等待时间：守护模式默认一直等待cookie更新
+        auth_wait = args.auth_wait if args.auth_wait is not None else (None if args.watch else 0)
+        manager = XiaoetDownloadManager(config, config_path=args.config, auth_wait=auth_wait,
+                                        progressive=args.progressive)
         
         # 检查环境
         if args.check:
@@ -105,13 +274,43 @@ def main():
             logger.error("环境检查失败，请先解决环境问题")
             return 1
         
+        # 清理片段去重存储
+        if args.gc_segments:
+            manager.gc_segment_store()
+            return 0
+        
+        # 批量转码已下载的视频
+        if args.transcode_all:
+            results = manager.transcode_all(
+                jobs=args.jobs,
+                io_jobs=args.io_jobs,
+                nice=args.nice,
+                ionice=args.ionice
+            )
+            return 1 if results['failed'] else 0
+        
+        # 校验已合并的视频
+        if args.verify_all:
+            results = manager.verify_all(jobs=args.jobs, force=args.no_cache)
+            return 1 if results['failed'] else 0
+        
+        # 守护模式
+        if args.watch:
+            started = manager.watch_course(
+                interval=args.interval,
+                auto_transcode=not args.no_transcode,
+                status_port=args.status_port or None
+            )
+            return 0 if started else 1
+        
         # 下载单个视频
         if args.single:
             logger.info(f"开始下载单个视频: {args.single}")
             result = manager.download_single_video(
                 args.single,
                 nocache=args.no_cache,
-                auto_transcode=not args.no_transcode
+                auto_transcode=not args.no_transcode,
+                show_progress=not args.no_progress
             )
             
             if result.success:
@@ -123,13 +322,17 @@ def main():
         
         # 下载整个课程
         logger.info("开始下载课程")
+        priority_ids = [i.strip() for i in (args.priority or '').split(',') if i.strip()]
         results = manager.download_course(
             nocache=args.no_cache,
-            auto_transcode=not args.no_transcode
+            auto_transcode=not args.no_transcode,
+            policy=create_policy(args.order, priority_ids),
+            resume=args.resume,
+            show_progress=not args.no_progress
         )
         
         # 返回适当的退出码
-        if results['failed']:
+        if results['failed'] or results['interrupted']:
             return 1
         else:
             return 0
@@ -147,248 +350,3 @@ def main():
 
 if __name__ == '__main__':
     sys.exit(main())
-=======
-File name    : main.py
-Author       : miaoyc
-Create time  : 2025/3/8 21:11
-Update time  : 2025/6/14 21:11
-Description  :
-"""
-
-import ast
-import ffmpy
-import m3u8
-import os
-import json
-import requests
-
-from m3u8.model import SegmentList, Segment, find_key
-
-
-def load_config(config_path):
-    try:
-        with open(config_path, 'r', encoding='utf-8') as file:
-            config_data = json.load(file)
-        return config_data
-    except FileNotFoundError:
-        print(f"错误: 文件 {config_path} 不存在")
-    except json.JSONDecodeError:
-        print("错误: 文件内容不是有效的 JSON 格式")
-    except Exception as e:
-        print(f"读取文件时发生错误: {e}")
-
-
-def download_file(url, save_path):
-    """
-    下载指定 URL 的文件并保存到本地
-    :param url: 文件的 URL
-    :param save_path: 保存文件的本地路径
-    """
-    try:
-        response = requests.get(url, stream=True)
-        response.raise_for_status()  # 检查请求是否成功
-        os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        with open(save_path, 'wb') as file:
-            for chunk in response.iter_content(chunk_size=8192):
-                file.write(chunk)
-    except requests.exceptions.RequestException as e:
-        print(f"下载失败: {e}")
-
-
-def extract_ts_urls(m3u8_file):
-    """
-    从 m3u8 文件中提取 ts 文件的 URL 列表
-    :param m3u8_file: m3u8 文件路径
-    :return: ts 文件的 URL 列表
-    """
-    with open(m3u8_file, 'r', encoding='utf-8') as file:
-        m3u8_content = file.read()
-    playlist = m3u8.loads(m3u8_content)
-    ts_urls = [segment.uri for segment in playlist.segments]
-    return ts_urls
-
-
-def create_file_list(ts_files, list_file_path):
-    """
-    创建包含 ts 文件路径的列表文件
-    :param ts_files: ts 文件路径列表
-    :param list_file_path: 列表文件保存路径
-    """
-    with open(list_file_path, 'w') as file:
-        for ts_file in ts_files:
-            file.write(f"file '{ts_file}'\n")
-    print(f"文件列表已保存到: {list_file_path}")
-
-
-def merge_ts_files(list_file_path, output_file):
-    """
-    使用 ffmpeg 合并 ts 文件
-    :param list_file_path: 包含 ts 文件路径的列表文件
-    :param output_file: 合并后的输出文件路径
-    """
-    command = f"ffmpeg -f concat -safe 0 -i {list_file_path} -c copy {output_file}"
-    os.system(command)
-    print(f"合并完成，输出文件: {output_file}")
-
-
-class Xet(object):
-    def __init__(self, conf=None):
-        if conf:
-            self.config = conf
-        else:
-            current_dir = os.getcwd()
-            config_path = os.path.join(current_dir, 'config.json')
-            self.config = load_config(config_path)
-        # init config
-        self.host = self.config['host']
-        self.app_id = self.config['app_id']
-        self.base_url = f"https://{self.app_id}.{self.host}"
-        self.cookie = self.config['cookie']
-        self.product_id = self.config['product_id']
-        self.download_dir = self.config['download_dir']
-        # int urls
-        self.get_column_items_url = f"{self.base_url}/xe.course.business.column.items.get/2.0.0"
-        self.get_video_details_info_url = f"{self.base_url}/xe.course.business.video.detail_info.get/2.0.0"
-        self.get_micro_navigation_url = f"{self.base_url}/xe.micro_page.navigation.get/1.0.0"
-        self.get_play_url = f"{self.base_url}/xe.material-center.play/getPlayUrl"
-
-    def get_video_detail_info(self, v_resource_id):
-        payload = {
-            'bizData[resource_id]': v_resource_id,
-            'bizData[product_id]': self.product_id,
-            'bizData[opr_sys]': 'MacIntel'
-        }
-        headers = {
-            'cookie': self.cookie,
-        }
-        response = requests.request("POST", self.get_video_details_info_url, headers=headers, data=payload)
-        data = json.loads(response.text).get('data').get('video_info')
-        return data
-
-    def get_column_items(self, column_id, page_index=1, page_size=100, sort='desc'):
-        payload = {
-            'bizData[column_id]': column_id,
-            'bizData[page_index]': str(page_index),
-            'bizData[page_size]': str(page_size),
-            'bizData[sort]': sort
-        }
-        headers = {
-            'cookie': self.cookie,
-        }
-        response = requests.request("POST", self.get_column_items_url, headers=headers, data=payload)
-        data = json.loads(response.text).get('data')
-        return [(i.get('resource_id'), i.get('resource_title')) for i in data.get('list')]
-
-    def get_mico_navigation_info(self, app_id):
-        payload = json.dumps({
-            "app_id": app_id,
-            "agent_type": 1,
-            "app_version": 0
-        })
-        headers = {
-            'cookie': self.cookie,
-        }
-        response = requests.request("POST", self.get_micro_navigation_url, headers=headers, data=payload)
-        return json.loads(response.text).get('data', {})
-
-    def get_play(self, app_id, user_id, play_sign):
-        payload = json.dumps({
-            "org_app_id": app_id,
-            "app_id": app_id,
-            "user_id": user_id,
-            "play_sign": [
-                play_sign
-            ],
-            "play_line": "A",
-            "opr_sys": "MacIntel"
-        })
-        headers = {
-            'cookie': self.cookie,
-        }
-        response = requests.request("POST", self.get_play_url, headers=headers, data=payload)
-        return json.loads(response.text).get('data', {}).get(play_sign, {}).get('play_list', {})
-
-    def download_video(self, download_dir, play_list_info, v_resource_id):
-        current_dir = os.getcwd()
-        resource_dir = os.path.join(download_dir, v_resource_id)
-        os.makedirs(resource_dir, exist_ok=True)
-
-        # 获取play_info
-        play_info = play_list_info.get('720p_hls', {})
-        m3u8_file_url = play_info.get('play_url')
-
-        # 下载m3u8文件
-        m3u8_file_path = os.path.join(current_dir, "m3u8", f"{v_resource_id}.m3u8")
-        print(f"Downloading M3U8 file to: {m3u8_file_path}")
-        download_file(m3u8_file_url, m3u8_file_path)
-
-        # 提取 m3u8 文件中的 ts 文件 URL 列表
-        ext = play_info.get('ext', {})
-        # ext 参数示例
-        # "ext": {
-        #    "host": "https://v-tos-k.xiaoeknow.com",
-        #    "path": "2919df88vodtranscq1252524126/2591e9eb387702303541605952/drm",
-        #    "param": "sign=8dbfe87b7b39bc6bb7f00a3f358c1871\u0026t=684e210e\u0026us=jCANilCutB"
-        # }
-        ts_base_url = str(os.path.join(ext.get('host'), ext.get('path')))
-        ts_urls = extract_ts_urls(m3u8_file_path)
-        ts_urls = [os.path.join(ts_base_url, ts_url) for ts_url in ts_urls]
-
-        ts_files = []
-        list_file_path = os.path.join(str(resource_dir), "file_list.txt")
-        for index, ts_url in enumerate(ts_urls):
-            print(f"Downloading segment {index + 1}: {ts_url}")
-
-            # 生成 ts 文件的本地路径
-            file_name = f'segment_{index + 1}.ts'
-            ts_file = os.path.join(str(resource_dir), file_name)
-            print(f"TS file path: {ts_file}")
-            ts_files.append(file_name)
-            if os.path.exists(ts_file):
-                print(f"Already Downloaded: {ts_file}")
-            else:
-                #download_file(ts_url, ts_file)
-                print(f"Downloaded: {ts_file}")
-
-        # 创建包含 ts 文件路径的列表文件
-        create_file_list(ts_files, list_file_path)
-        # 合并 ts 文件
-        output_file = "output.ts"
-        merge_ts_files(list_file_path, output_file)
-        return
-
-
-def main():
-    # 业务逻辑：
-    # 1. 获取配置，准备数据
-
-    current_dir = os.getcwd()
-    config_path = os.path.join(current_dir, 'config.json')
-    conf = load_config(config_path)
-
-    app_id = conf["app_id"]  # app_id
-    column_id = conf["product_id"]  # 课程id
-    #
-    xet = Xet(conf)
-
-    # 获取user_id（别的方法也可以获取，都行）
-    # get_mico_navigation_info是点击个人中心时调用的接口之一
-    navigation_info = xet.get_mico_navigation_info(app_id)
-    user_id = navigation_info['user_id']
-    print(f"User ID: {user_id}")
-    v_resource_ids = xet.get_column_items(column_id)
-    print(f"Video Resource IDs: {v_resource_ids}")
-    for v_resource_id, resource_title in v_resource_ids:
-        video_details_info = xet.get_video_detail_info(v_resource_id)
-        # 获取 play_sign
-        play_sign = video_details_info.get('play_sign')
-        print(f"Video Resource ID: {v_resource_id}, Title: {resource_title}, Play Sign: {play_sign}")
-        play_list_info = xet.get_play(app_id, user_id, play_sign)
-        xet.download_video(xet.download_dir, play_list_info, v_resource_id)
-
-        break
-
-
-if __name__ == '__main__':
-    main()
->>>>>>> b7aa8bf5c1896b642b29b613cdc0bc851845932a
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+HTTP传输基准测试
+
+用同一批片段分别测试HTTP/1.1（requests）和HTTP/2（httpx）传输，
+输出建立的TCP连接数、协议版本和吞吐量。用法：
+
+    python scripts/benchmark_http.py "<m3u8播放地址>" --segments 32 --concurrency 8
+"""
+
+import argparse
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import m3u8
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from xiaoet_downloader.core.transport import Http2Session, create_http_session  # noqa: E402
+from xiaoet_downloader.utils.url_utils import UrlUtils  # noqa: E402
+
+
+class ConnectionCounter:
+    """统计进程内发起的TCP连接数"""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+        self._original = socket.socket.connect
+
+    def __enter__(self):
+        counter = self
+
+        def connect(sock, address):
+            with counter._lock:
+                counter.count += 1
+            return counter._original(sock, address)
+
+        socket.socket.connect = connect
+        return self
+
+    def __exit__(self, *exc):
+        socket.socket.connect = self._original
+
+
+def segment_urls(session, play_url, limit):
+    """获取播放列表中前limit个片段的完整URL"""
+    response = session.get(play_url, timeout=30)
+    response.raise_for_status()
+    segments = m3u8.loads(response.text).data.get('segments', [])[:limit]
+    prefix = UrlUtils.playlist_prefix(play_url)
+    return [UrlUtils.segment_url(play_url, prefix, segment['uri']) for segment in segments]
+
+
+def run(name, http2, urls, concurrency, headers):
+    """用一种传输并发下载所有片段，返回统计结果"""
+    session = create_http_session(http2, headers)
+    if http2 and not isinstance(session, Http2Session):
+        print(f"{name}: 未安装httpx[http2]，跳过")
+        return None
+
+    def fetch(url):
+        response = session.get(url, timeout=60)
+        response.raise_for_status()
+        return len(response.content)
+
+    with ConnectionCounter() as counter:
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            total_bytes = sum(executor.map(fetch, urls))
+        elapsed = time.monotonic() - start
+
+    protocols = dict(session.protocols) if isinstance(session, Http2Session) else {'HTTP/1.1': len(urls)}
+    session.close()
+    return {
+        'name': name,
+        'connections': counter.count,
+        'protocols': protocols,
+        'bytes': total_bytes,
+        'elapsed': elapsed,
+        'throughput': total_bytes / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='比较HTTP/1.1与HTTP/2下载片段的连接数和吞吐量')
+    parser.add_argument('play_url', help='m3u8播放地址')
+    parser.add_argument('--segments', type=int, default=32, help='下载的片段数')
+    parser.add_argument('--concurrency', type=int, default=8, help='并发请求数')
+    parser.add_argument('--referer', default='', help='请求的Referer')
+    args = parser.parse_args()
+
+    headers = {'User-Agent': 'Mozilla/5.0'}
+    if args.referer:
+        headers['Referer'] = args.referer
+
+    urls = segment_urls(create_http_session(False, headers), args.play_url, args.segments)
+    if not urls:
+        print("播放列表中没有片段")
+        return 1
+
+    print(f"片段数 {len(urls)}，并发数 {args.concurrency}")
+    print(f"{'传输':<10}{'连接数':>8}{'耗时(s)':>10}{'吞吐量(MB/s)':>14}  协议")
+    baseline = None
+    for name, http2 in (('HTTP/1.1', False), ('HTTP/2', True)):
+        result = run(name, http2, urls, args.concurrency, headers)
+        if result is None:
+            continue
+        line = (f"{result['name']:<10}{result['connections']:>8}{result['elapsed']:>10.2f}"
+                f"{result['throughput'] / 1024 / 1024:>14.2f}  {result['protocols']}")
+        if baseline:
+            line += f"  (吞吐量 {result['throughput'] / baseline['throughput']:.2f}x，" \
+                    f"连接数 {result['connections']}/{baseline['connections']})"
+        else:
+            baseline = result
+        print(line)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
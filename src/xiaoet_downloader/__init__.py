@@ -13,7 +13,6 @@ __description__ = "小鹅通视频下载器"
 
 from .models.config import XiaoetConfig
 from .models.video import VideoResource, VideoMetadata, DownloadResult
-from .core.manager import XiaoetDownloadManager
 from .utils.logger import logger
 
 __all__ = [
@@ -22,5 +21,19 @@ __all__ = [
     'VideoMetadata',
     'DownloadResult',
     'XiaoetDownloadManager',
+    'BatchDownload',
+    'DownloadEvent',
+    'EventType',
     'logger'
-]
\ No newline at end of file
+]
+
+
+def __getattr__(name):
+    # 下载管理器依赖requests、m3u8等较重的模块，首次访问时才导入
+    if name == 'XiaoetDownloadManager':
+        from .core.manager import XiaoetDownloadManager
+        return XiaoetDownloadManager
+    if name in ('BatchDownload', 'DownloadEvent', 'EventType'):
+        from .core import batch
+        return getattr(batch, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
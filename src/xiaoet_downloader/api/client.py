@@ -6,6 +6,8 @@ import requests
 from typing import Dict, List, Tuple, Optional, Any
 from ..models.config import XiaoetConfig
 from ..models.video import VideoResource
+from ..core.session_health import check_auth_response
+from ..core.transport import create_http_session
 
 
 class XiaoetAPIClient:
@@ -14,14 +16,14 @@ class XiaoetAPIClient:
     # API URL模板
     GET_COLUMN_ITEMS_URL = "https://{0}.h5.xiaoeknow.com/xe.course.business.column.items.get/2.0.0"
     GET_VIDEO_DETAILS_INFO_URL = "https://{0}.h5.xiaoeknow.com/xe.course.business.video.detail_info.get/2.0.0"
+    GET_AUDIO_DETAILS_INFO_URL = "https://{0}.h5.xiaoeknow.com/xe.course.business.audio.detail_info.get/2.0.0"
     GET_MICRO_NAVIGATION_URL = "https://{0}.h5.xiaoeknow.com/xe.micro_page.navigation.get/1.0.0"
     GET_PLAY_URL = "https://{0}.h5.xiaoeknow.com/xe.material-center.play/getPlayUrl"
     
     def __init__(self, config: XiaoetConfig):
         """初始化API客户端"""
         self.config = config
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.session = create_http_session(config.http2, {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36'
         })
     
@@ -39,9 +41,7 @@ class XiaoetAPIClient:
         }
         
         try:
-            response = requests.post(url, headers=headers, data=payload)
-            response.raise_for_status()
-            data = response.json().get('data', {})
+            data = self._post(url, headers, payload).get('data', {})
             return data
         except requests.RequestException as e:
             raise Exception(f"获取导航信息失败: {str(e)}")
@@ -51,6 +51,18 @@ class XiaoetAPIClient:
     def get_column_items(self, column_id: str, page_index: int = 1, 
                         page_size: int = 100, sort: str = 'desc') -> List[Tuple[str, str]]:
         """获取专栏项目列表"""
+        items = self._get_column_item_list(column_id, page_index, page_size, sort)
+        return [(item.get('resource_id'), item.get('resource_title')) for item in items]
+    
+    def get_column_resources(self, column_id: str, page_index: int = 1,
+                             page_size: int = 100, sort: str = 'desc') -> List[VideoResource]:
+        """获取专栏资源列表（包含发布时间等信息）"""
+        items = self._get_column_item_list(column_id, page_index, page_size, sort)
+        return [VideoResource.from_column_item(item) for item in items]
+    
+    def _get_column_item_list(self, column_id: str, page_index: int,
+                              page_size: int, sort: str) -> List[Dict[str, Any]]:
+        """请求专栏项目列表接口，返回原始条目"""
         url = self.GET_COLUMN_ITEMS_URL.format(self.config.app_id)
         payload = {
             'bizData[column_id]': column_id,
@@ -63,11 +75,8 @@ class XiaoetAPIClient:
         }
         
         try:
-            response = requests.post(url, headers=headers, data=payload)
-            response.raise_for_status()
-            data = response.json().get('data', {})
-            items = data.get('list', [])
-            return [(item.get('resource_id'), item.get('resource_title')) for item in items]
+            data = self._post(url, headers, payload).get('data', {})
+            return data.get('list', [])
         except requests.RequestException as e:
             raise Exception(f"获取专栏项目列表失败: {str(e)}")
         except json.JSONDecodeError as e:
@@ -86,24 +95,42 @@ class XiaoetAPIClient:
         }
         
         try:
-            response = requests.post(url, headers=headers, data=payload)
-            response.raise_for_status()
-            data = response.json().get('data', {}).get('video_info', {})
+            data = self._post(url, headers, payload).get('data', {}).get('video_info', {})
             return data
         except requests.RequestException as e:
             raise Exception(f"获取视频详情失败: {str(e)}")
         except json.JSONDecodeError as e:
             raise Exception(f"解析视频详情响应失败: {str(e)}")
     
-    def get_play_url(self, user_id: str, play_sign: str) -> Dict[str, Any]:
-        """获取播放URL"""
+    def get_audio_detail_info(self, resource_id: str) -> Dict[str, Any]:
+        """获取音频详情信息"""
+        url = self.GET_AUDIO_DETAILS_INFO_URL.format(self.config.app_id)
+        payload = {
+            'bizData[resource_id]': resource_id,
+            'bizData[product_id]': self.config.product_id,
+            'bizData[opr_sys]': 'MacIntel'
+        }
+        headers = {
+            'cookie': self.config.cookie,
+        }
+        
+        try:
+            data = self._post(url, headers, payload).get('data', {}).get('audio_info', {})
+            return data
+        except requests.RequestException as e:
+            raise Exception(f"获取音频详情失败: {str(e)}")
+        except json.JSONDecodeError as e:
+            raise Exception(f"解析音频详情响应失败: {str(e)}")
+    
+    def get_play_url(self, user_id: str, play_sign: str, play_line: str = 'A') -> Dict[str, Any]:
+        """获取指定播放线路的播放URL"""
         url = self.GET_PLAY_URL.format(self.config.app_id)
         payload = json.dumps({
             "org_app_id": self.config.app_id,
             "app_id": self.config.app_id,
             "user_id": user_id,
             "play_sign": [play_sign],
-            "play_line": "A",
+            "play_line": play_line,
             "opr_sys": "MacIntel"
         })
         headers = {
@@ -112,9 +139,7 @@ class XiaoetAPIClient:
         }
         
         try:
-            response = requests.post(url, headers=headers, data=payload)
-            response.raise_for_status()
-            data = response.json().get('data', {})
+            data = self._post(url, headers, payload).get('data', {})
             play_list_dict = data.get(play_sign, {}).get('play_list', {})
             return play_list_dict
         except requests.RequestException as e:
@@ -122,6 +147,15 @@ class XiaoetAPIClient:
         except json.JSONDecodeError as e:
             raise Exception(f"解析播放URL响应失败: {str(e)}")
     
+    def _post(self, url: str, headers: Dict[str, str], payload: Any) -> Dict[str, Any]:
+        """发送API请求并解析JSON响应，登录失效时抛出AuthExpiredError"""
+        response = self.session.post(url, headers=headers, data=payload)
+        check_auth_response(response)
+        response.raise_for_status()
+        body = response.json()
+        check_auth_response(response, body)
+        return body if isinstance(body, dict) else {}
+    
     def get_best_quality_url(self, play_list_dict: Dict[str, Any]) -> Optional[Tuple[str, str]]:
         """获取最佳质量的播放URL"""
         quality_order = ['1080p_hls', '720p_hls', '480p_hls', '360p_hls']
@@ -130,4 +164,9 @@ class XiaoetAPIClient:
             if quality in play_list_dict and play_list_dict.get(quality, {}).get('play_url'):
                 return play_list_dict.get(quality, {}).get('play_url'), quality
         
+        # 音频等没有清晰度档位的资源：使用任意一个有播放地址的条目
+        for quality, item in play_list_dict.items():
+            if isinstance(item, dict) and item.get('play_url'):
+                return item['play_url'], quality
+        
         return None, None
\ No newline at end of file
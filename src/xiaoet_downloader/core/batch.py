@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import queue
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from enum import Enum
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .checkpoint import ResourcePhase
+from ..models.segment import SegmentTable
+from ..models.video import DownloadResult, VideoResource
+from ..utils.logger import logger
+
+
+class EventType(Enum):
+    """批量下载事件类型"""
+    # 播放地址解析完成，开始下载
+    RESOLVED = 'resolved'
+    # 处理完一个片段
+    PROGRESS = 'progress'
+    DOWNLOADED = 'downloaded'
+    MUXED = 'muxed'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    # 整个批量任务结束，之后不再有事件
+    FINISHED = 'finished'
+
+
+@dataclass
+class DownloadEvent:
+    """批量下载事件"""
+    type: EventType
+    resource_id: str = ''
+    title: str = ''
+    # 片段进度：已完成片段数、片段总数、本片段从网络下载的字节数（缓存或去重复用时为0）
+    completed: int = 0
+    total: int = 0
+    fetched_bytes: int = 0
+    file_path: Optional[str] = None
+    message: str = ''
+    timestamp: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典（可直接序列化为JSON）"""
+        data = asdict(self)
+        data['type'] = self.type.value
+        return data
+
+
+class DownloadCancelled(Exception):
+    """批量任务已取消，在片段之间中止当前资源的下载"""
+
+
+class BatchDownload:
+    """
+    批量下载任务句柄
+
+    后台线程依次处理资源，处理过程通过有上限的事件队列交给调用方：
+    队列满时下载线程等待调用方读取（背压），下载速度不会超过事件的消费速度，
+    内存占用也不会随未读事件增长。cancel() 后在下一个片段处中止当前资源，
+    剩余资源记为已取消，取消后队列满时丢弃事件而不再等待。
+
+    用法::
+
+        batch = manager.download_many(['v_1', 'v_2'])
+        for event in batch:
+            print(event.to_dict())
+        results = batch.result()
+    """
+
+    # 等待队列空位、读取事件时检查取消和结束状态的间隔（秒）
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, resources: List[VideoResource],
+                 process: Callable[[VideoResource], DownloadResult],
+                 max_events: int = 1000, auto_transcode: bool = True):
+        """
+        初始化批量下载任务
+
+        Args:
+            resources: 要处理的资源
+            process: 下载（并转码）单个资源的回调
+            max_events: 事件队列上限，0表示不限制（没有背压）
+            auto_transcode: 是否合并，成功的资源合并后发送MUXED事件
+        """
+        self.resources = list(resources)
+        self.process = process
+        self.auto_transcode = auto_transcode
+        # 结束时调用（下载管理器用来移除进度和阶段回调）
+        self.on_finish: Optional[Callable[[], None]] = None
+        self.results: Dict[str, List[DownloadResult]] = {
+            'success': [],
+            'failed': [],
+            'cancelled': []
+        }
+
+        self._queue: 'queue.Queue[DownloadEvent]' = queue.Queue(max_events)
+        self._cancel = threading.Event()
+        self._finished = threading.Event()
+        self._current: Optional[VideoResource] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def cancelled(self) -> bool:
+        """是否已取消"""
+        return self._cancel.is_set()
+
+    @property
+    def done(self) -> bool:
+        """后台线程是否已处理完（事件可能尚未读完）"""
+        return self._finished.is_set()
+
+    def start(self) -> 'BatchDownload':
+        """启动后台线程"""
+        self._thread = threading.Thread(target=self._worker, name='xiaoet-batch', daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self) -> None:
+        """取消任务：当前资源在下一个片段处中止，剩余资源不再处理"""
+        if not self._cancel.is_set():
+            logger.info("批量下载已取消")
+            self._cancel.set()
+
+    def events(self) -> Iterator[DownloadEvent]:
+        """按顺序读取事件，任务结束且事件读完后停止"""
+        while True:
+            try:
+                yield self._queue.get(timeout=self.POLL_INTERVAL)
+            except queue.Empty:
+                if self._finished.is_set() and self._queue.empty():
+                    return
+
+    def __iter__(self) -> Iterator[DownloadEvent]:
+        return self.events()
+
+    def result(self) -> Dict[str, List[DownloadResult]]:
+        """等待任务结束（丢弃未读的事件），返回处理结果"""
+        for _ in self.events():
+            pass
+        if self._thread:
+            self._thread.join()
+        return self.results
+
+    def on_progress(self, resource: VideoResource, table: SegmentTable, fetched: int) -> None:
+        """下载管理器的进度回调：转为PROGRESS事件，已取消时中止当前下载"""
+        if resource is not self._current:
+            return
+        if self._cancel.is_set():
+            raise DownloadCancelled("已取消")
+        self._emit(DownloadEvent(EventType.PROGRESS, resource.resource_id, resource.title,
+                                 completed=table.completed_count, total=len(table), fetched_bytes=fetched))
+
+    def on_phase(self, resource_id: str, phase: ResourcePhase, message: Optional[str] = None) -> None:
+        """下载管理器的阶段回调：开始下载时发送RESOLVED，下载完成时发送DOWNLOADED"""
+        resource = self._current
+        if resource is None or resource.resource_id != resource_id:
+            return
+        event_type = {ResourcePhase.DOWNLOADING: EventType.RESOLVED,
+                      ResourcePhase.DOWNLOADED: EventType.DOWNLOADED}.get(phase)
+        if event_type:
+            self._emit(DownloadEvent(event_type, resource_id, resource.title, message=message or ''))
+
+    def _worker(self) -> None:
+        try:
+            for resource in self.resources:
+                if self._cancel.is_set():
+                    self._finish(resource, DownloadResult(resource, False, "已取消"))
+                    continue
+                self._current = resource
+                try:
+                    result = self.process(resource)
+                except DownloadCancelled:
+                    result = DownloadResult(resource, False, "已取消")
+                except Exception as e:
+                    # 登录失效等导致下载管理器放弃的错误，记为该资源失败后继续
+                    result = DownloadResult(resource, False, str(e))
+                finally:
+                    self._current = None
+                self._finish(resource, result)
+        finally:
+            if self.on_finish:
+                self.on_finish()
+            self._emit(DownloadEvent(
+                EventType.FINISHED,
+                message=f"成功 {len(self.results['success'])}，失败 {len(self.results['failed'])}，"
+                        f"取消 {len(self.results['cancelled'])}"
+            ))
+            self._finished.set()
+
+    def _finish(self, resource: VideoResource, result: DownloadResult) -> None:
+        """记录资源的处理结果并发送结束事件"""
+        if result.success:
+            self.results['success'].append(result)
+            if self.auto_transcode:
+                self._emit(DownloadEvent(EventType.MUXED, resource.resource_id, resource.title,
+                                         file_path=result.file_path, message=result.message))
+        elif self._cancel.is_set():
+            self.results['cancelled'].append(result)
+            self._emit(DownloadEvent(EventType.CANCELLED, resource.resource_id, resource.title,
+                                     message="已取消"))
+        else:
+            self.results['failed'].append(result)
+            self._emit(DownloadEvent(EventType.FAILED, resource.resource_id, resource.title,
+                                     message=result.message))
+
+    def _emit(self, event: DownloadEvent) -> None:
+        """放入事件队列，队列满时等待调用方读取；已取消时不再等待，丢弃放不下的事件"""
+        while not self._cancel.is_set():
+            try:
+                self._queue.put(event, timeout=self.POLL_INTERVAL)
+                return
+            except queue.Full:
+                continue
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            pass
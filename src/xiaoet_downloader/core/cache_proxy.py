@@ -0,0 +1,426 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import signal
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+from urllib.parse import parse_qs, urljoin, urlsplit
+
+import requests
+
+from .transport import create_http_session
+from ..utils.file_utils import FileUtils
+from ..utils.logger import logger
+from ..utils.url_utils import UrlUtils
+
+
+class LRUDiskCache:
+    """
+    有容量上限的磁盘缓存，超出上限时淘汰最久没有访问的条目
+
+    条目保存在 <root>/<键前两位>/<键>，访问时更新文件的修改时间，
+    重启后按修改时间恢复访问顺序
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        """
+        初始化磁盘缓存
+
+        Args:
+            root: 缓存目录
+            max_bytes: 容量上限（字节）
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.evictions = 0
+        self._entries: 'OrderedDict[str, int]' = OrderedDict()
+        self._lock = threading.Lock()
+        FileUtils.ensure_dir(root)
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """读取缓存条目，不存在时返回None"""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            # 读取期间被淘汰
+            return None
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """写入缓存条目，必要时淘汰旧条目"""
+        if len(data) > self.max_bytes:
+            return
+        path = self.path(key)
+        FileUtils.ensure_dir(os.path.dirname(path))
+        temp_file = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp_file, 'wb') as f:
+            f.write(data)
+        os.replace(temp_file, path)
+        with self._lock:
+            self.total_bytes += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            evicted = []
+            while self.total_bytes > self.max_bytes and self._entries:
+                old_key, size = self._entries.popitem(last=False)
+                self.total_bytes -= size
+                self.evictions += 1
+                evicted.append(old_key)
+        for old_key in evicted:
+            FileUtils.remove_file_safely(self.path(old_key))
+
+    def _load(self) -> None:
+        """扫描缓存目录，按修改时间恢复访问顺序"""
+        found = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                if name.endswith('.tmp'):
+                    FileUtils.remove_file_safely(path)
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                found.append((stat.st_mtime, name, stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self.total_bytes += size
+
+
+class SingleFlight:
+    """合并同一个键的并发调用：只有第一个调用实际执行，其余等待并共享结果"""
+
+    def __init__(self):
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        执行或等待调用
+
+        Returns:
+            Tuple[Any, bool]: (结果, 是否共享了其他调用的结果)
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+        if not leader:
+            return future.result(), True
+        try:
+            result = func()
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+@dataclass
+class UpstreamResponse:
+    """上游（CDN）的完整响应"""
+    status: int
+    body: bytes = b''
+    content_type: str = 'application/octet-stream'
+    retry_after: Optional[str] = None
+
+
+class CachingProxy:
+    """
+    局域网缓存代理
+
+    其他下载器（配置 cache_proxy）把片段和m3u8请求发到 /fetch?url=<CDN地址>。
+    以稳定CDN路径（去掉主机和签名参数）为键：片段保存在有容量上限的LRU磁盘缓存中，
+    m3u8只在内存中短时间缓存（其中的片段URI带有签名）。同一个键的并发请求
+    合并为一次上游请求，每个片段只经过一次外网。
+
+    只代理允许的上游主机（默认为小鹅通和腾讯云点播的CDN域名）上的媒体文件，
+    重定向也只跟随到允许的主机，避免成为开放代理或被用来访问内网地址；
+    默认只监听本机，局域网共享需要显式指定监听地址
+    """
+
+    DIR_NAME = '.proxy_cache'
+    # 只代理媒体相关的请求
+    ALLOWED_SUFFIXES = ('.ts', '.m3u8', '.m4s', '.mp4', '.aac', '.m4a', '.mp3')
+    # 默认允许的上游主机（域名本身及其子域名）
+    DEFAULT_UPSTREAM_HOSTS = ('xiaoeknow.com', 'xiaoe-tech.com', 'xiaoecloud.com', 'xet.tech',
+                              'xet.citv.cn', 'myqcloud.com', 'vod-qcloud.com')
+    # 最多跟随的重定向次数
+    MAX_REDIRECTS = 5
+    # 内存中缓存的m3u8条目数上限
+    MAX_PLAYLISTS = 1000
+    # 转发给上游的请求头（CDN可能校验Referer）
+    FORWARD_HEADERS = ('User-Agent', 'Referer')
+
+    def __init__(self, cache_dir: str, max_bytes: int = 20 * 1024 ** 3,
+                 host: str = '127.0.0.1', port: int = 8800,
+                 session: Any = None, playlist_ttl: float = 30.0, timeout: float = 30,
+                 upstream_hosts: Optional[Iterable[str]] = None):
+        """
+        初始化缓存代理
+
+        Args:
+            cache_dir: 磁盘缓存目录
+            max_bytes: 磁盘缓存容量上限（字节）
+            host: 监听地址，默认只允许本机访问，局域网共享时设为 0.0.0.0 或本机局域网IP
+            port: 监听端口，0表示随机端口
+            session: 请求上游使用的HTTP会话
+            playlist_ttl: m3u8在内存中的缓存时间（秒）
+            timeout: 上游请求的超时时间（秒）
+            upstream_hosts: 允许的上游主机（域名本身及其子域名），默认为 DEFAULT_UPSTREAM_HOSTS
+        """
+        self.cache = LRUDiskCache(cache_dir, max_bytes)
+        self.host = host
+        self.upstream_hosts = tuple(host.lower().strip('.') for host in
+                                    (upstream_hosts if upstream_hosts is not None else self.DEFAULT_UPSTREAM_HOSTS))
+        self.port = port
+        self.session = session or create_http_session()
+        self.playlist_ttl = playlist_ttl
+        self.timeout = timeout
+        self._flight = SingleFlight()
+        # 按写入时间排列：写入时从头部淘汰过期的条目，条目数不超过上限
+        self._playlists: 'OrderedDict[str, Tuple[float, UpstreamResponse]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._stop = threading.Event()
+
+        self.requests = 0
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.upstream_bytes = 0
+        self.served_bytes = 0
+
+    @property
+    def address(self) -> Optional[Tuple[str, int]]:
+        """实际监听的地址"""
+        return self._server.server_address[:2] if self._server else None
+
+    def start(self) -> 'CachingProxy':
+        """在后台线程中启动代理"""
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler_class())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='xiaoet-cache-proxy', daemon=True).start()
+        host, port = self.address
+        logger.info(f"缓存代理已启动: http://{host}:{port}（缓存 {len(self.cache)} 个片段，"
+                    f"上限 {self.cache.max_bytes / 1024 ** 3:.1f} GB）")
+        if host not in ('127.0.0.1', '::1', 'localhost'):
+            logger.warning(f"缓存代理监听 {host}，网络中的其他机器都可以通过它请求允许的CDN主机: "
+                           f"{', '.join(self.upstream_hosts)}")
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def run(self) -> None:
+        """运行直到收到中断信号"""
+        if threading.current_thread() is threading.main_thread() and hasattr(signal, 'SIGTERM'):
+            signal.signal(signal.SIGTERM, lambda signum, frame: self._stop.set())
+        self.start()
+        try:
+            while not self._stop.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+            logger.info(f"缓存代理已停止: {self.stats()}")
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'hits': self.hits,
+                'misses': self.misses,
+                'shared': self.shared,
+                'upstream_bytes': self.upstream_bytes,
+                'served_bytes': self.served_bytes,
+                'cached_entries': len(self.cache),
+                'cached_bytes': self.cache.total_bytes,
+                'evictions': self.cache.evictions,
+            }
+
+    def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> Tuple[UpstreamResponse, str]:
+        """
+        获取URL内容，优先使用缓存
+
+        Returns:
+            Tuple[UpstreamResponse, str]: (响应, 来源 HIT/MISS/SHARED)
+        """
+        key = UrlUtils.stable_key(url)
+        playlist = self._is_playlist(url)
+        cached = self._cached(key, playlist)
+        source = 'HIT'
+        if cached is None:
+            cached, shared = self._flight.do(key, lambda: self._fetch_upstream(url, headers, key, playlist))
+            source = 'SHARED' if shared else 'MISS'
+            if shared and cached.status != 200:
+                # 其他请求的签名可能已过期，失败时用自己的URL再请求一次
+                cached = self._fetch_upstream(url, headers, key, playlist)
+                source = 'MISS'
+        with self._lock:
+            self.requests += 1
+            self.hits += source == 'HIT'
+            self.misses += source == 'MISS'
+            self.shared += source == 'SHARED'
+            self.served_bytes += len(cached.body)
+        return cached, source
+
+    def _cached(self, key: str, playlist: bool) -> Optional[UpstreamResponse]:
+        if playlist:
+            with self._lock:
+                entry = self._playlists.get(key)
+                if entry is None:
+                    return None
+                if time.monotonic() - entry[0] < self.playlist_ttl:
+                    return entry[1]
+                del self._playlists[key]
+            return None
+        data = self.cache.get(key)
+        return UpstreamResponse(200, data, 'video/mp2t') if data is not None else None
+
+    def _fetch_upstream(self, url: str, headers: Optional[Dict[str, str]], key: str,
+                        playlist: bool) -> UpstreamResponse:
+        """请求上游，成功的响应写入缓存"""
+        try:
+            response = self._get_upstream(url, headers)
+            if response is None:
+                return UpstreamResponse(403, b'redirect not allowed', 'text/plain; charset=utf-8')
+            body = response.content
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"缓存代理请求上游失败: {str(e)}")
+            return UpstreamResponse(502, str(e).encode('utf-8'), 'text/plain; charset=utf-8')
+        with self._lock:
+            self.upstream_bytes += len(body)
+        result = UpstreamResponse(response.status_code, body,
+                                  response.headers.get('Content-Type', 'application/octet-stream'),
+                                  response.headers.get('Retry-After'))
+        if response.status_code != 200:
+            return result
+        expected = response.headers.get('Content-Length')
+        if expected and not response.headers.get('Content-Encoding') and expected.isdigit() \
+                and int(expected) != len(body):
+            logger.warning(f"缓存代理收到不完整的响应: {len(body)}/{expected} 字节")
+            return UpstreamResponse(502, b'incomplete upstream response', 'text/plain; charset=utf-8')
+        if playlist:
+            self._store_playlist(key, result)
+        else:
+            self.cache.put(key, body)
+        return result
+
+    def _store_playlist(self, key: str, response: UpstreamResponse) -> None:
+        """缓存m3u8，同时淘汰过期的条目和超出上限的最旧条目"""
+        now = time.monotonic()
+        with self._lock:
+            self._playlists.pop(key, None)
+            self._playlists[key] = (now, response)
+            while self._playlists:
+                oldest_key, (stored_at, _) = next(iter(self._playlists.items()))
+                if now - stored_at < self.playlist_ttl and len(self._playlists) <= self.MAX_PLAYLISTS:
+                    break
+                del self._playlists[oldest_key]
+
+    def _get_upstream(self, url: str, headers: Optional[Dict[str, str]]) -> Any:
+        """请求上游，只跟随到允许的主机的重定向；重定向到其他主机时返回None"""
+        for _ in range(self.MAX_REDIRECTS + 1):
+            response = self.session.get(url, headers=headers or {}, timeout=self.timeout,
+                                        allow_redirects=False)
+            location = response.headers.get('Location')
+            if not (response.is_redirect and location):
+                return response
+            response.close()
+            url = urljoin(url, location)
+            if not self.allowed_host(url):
+                logger.warning(f"缓存代理拒绝重定向到不允许的主机: {urlsplit(url).hostname}")
+                return None
+        raise requests.exceptions.TooManyRedirects(f"重定向超过 {self.MAX_REDIRECTS} 次")
+
+    @classmethod
+    def _is_playlist(cls, url: str) -> bool:
+        return urlsplit(url).path.endswith('.m3u8')
+
+    def allowed_host(self, url: str) -> bool:
+        """URL是否为允许的上游主机上的http(s)地址"""
+        parts = urlsplit(url)
+        host = (parts.hostname or '').rstrip('.')
+        return parts.scheme in ('http', 'https') and bool(host) \
+            and any(host == allowed or host.endswith('.' + allowed) for allowed in self.upstream_hosts)
+
+    def allowed(self, url: str) -> bool:
+        """是否为允许代理的URL：允许的上游主机上的媒体文件"""
+        return self.allowed_host(url) and urlsplit(url).path.lower().endswith(self.ALLOWED_SUFFIXES)
+
+    def _handler_class(self):
+        proxy = self
+
+        class ProxyHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                if parts.path == '/stats':
+                    self._respond(200, json.dumps(proxy.stats()).encode('utf-8'), 'application/json')
+                    return
+                if parts.path != '/fetch':
+                    self._respond(404, b'not found', 'text/plain')
+                    return
+                url = (parse_qs(parts.query).get('url') or [''])[0]
+                if not proxy.allowed(url):
+                    self._respond(403, b'url not allowed', 'text/plain')
+                    return
+                headers = {name: self.headers[name] for name in proxy.FORWARD_HEADERS if self.headers.get(name)}
+                response, source = proxy.fetch(url, headers)
+                extra = {'X-Cache': source}
+                if response.retry_after:
+                    extra['Retry-After'] = response.retry_after
+                self._respond(response.status, response.body, response.content_type, extra)
+
+            def _respond(self, status: int, body: bytes, content_type: str,
+                         headers: Optional[Dict[str, str]] = None) -> None:
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', content_type)
+                    self.send_header('Content-Length', str(len(body)))
+                    for name, value in (headers or {}).items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+
+            def log_message(self, format, *args):
+                logger.debug(f"缓存代理: {format % args}")
+
+        return ProxyHandler
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import base64
+import os
+import threading
+import time
+from array import array
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional
+
+from ..models.segment import SegmentStatus, SegmentTable
+from ..models.video import ResourceType, VideoResource
+from ..utils.file_utils import FileUtils
+from ..utils.logger import logger
+
+
+class ResourcePhase(Enum):
+    """检查点中资源的处理阶段"""
+    PENDING = 'pending'
+    DOWNLOADING = 'downloading'
+    DOWNLOADED = 'downloaded'
+    TRANSCODING = 'transcoding'
+    TRANSCODED = 'transcoded'
+    FAILED = 'failed'
+
+
+class CheckpointJournal:
+    """
+    课程级检查点
+
+    记录课程目录快照、下载队列顺序、每个资源的处理阶段和已完成片段的大小，
+    保存在 <download_dir>/.checkpoint.json。阶段变化时立即写入，片段进度
+    按时间间隔批量写入；每次都是原子写入，进程崩溃不会留下半个文件。
+    恢复时下载器直接用记录的片段大小标记已完成的片段，不再逐个获取文件大小
+    """
+
+    FILE_NAME = '.checkpoint.json'
+    VERSION = 2
+
+    def __init__(self, download_dir: str, flush_interval: float = 5.0):
+        """
+        初始化检查点
+
+        Args:
+            download_dir: 下载目录
+            flush_interval: 片段进度的写入间隔（秒）
+        """
+        self.path = os.path.join(download_dir, self.FILE_NAME)
+        self.flush_interval = flush_interval
+        self._data: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_flush = 0.0
+        # 尚未写入的片段表，写入时才编码片段大小
+        self._tables: Dict[str, SegmentTable] = {}
+
+    def load(self, product_id: str) -> bool:
+        """加载同一课程的检查点，不存在或不匹配时返回False"""
+        data = FileUtils.load_json(self.path)
+        if not data or data.get('version') != self.VERSION or data.get('product_id') != product_id:
+            return False
+        self._data = data
+        return True
+
+    def start(self, product_id: str, user_id: str, resources: List[VideoResource]) -> None:
+        """开始新的检查点，记录课程目录快照"""
+        self._data = {
+            'version': self.VERSION,
+            'product_id': product_id,
+            'user_id': user_id,
+            'created_at': time.time(),
+            'catalogue': [
+                {
+                    'resource_id': resource.resource_id,
+                    'title': resource.title,
+                    'resource_type': resource.resource_type.value,
+                    'published_at': resource.published_at,
+                }
+                for resource in resources
+            ],
+            'queue': [],
+            'resources': {},
+        }
+        self.flush(force=True)
+
+    @property
+    def user_id(self) -> str:
+        return self._data.get('user_id', '')
+
+    def catalogue(self) -> List[VideoResource]:
+        """课程目录快照"""
+        return [
+            VideoResource(
+                resource_id=item['resource_id'],
+                title=item['title'],
+                resource_type=ResourceType(item['resource_type']),
+                published_at=item.get('published_at')
+            )
+            for item in self._data.get('catalogue', [])
+        ]
+
+    @property
+    def queue(self) -> List[str]:
+        """已规划的下载队列（资源ID）"""
+        return list(self._data.get('queue', []))
+
+    def set_queue(self, resource_ids: List[str]) -> None:
+        """记录下载队列顺序，恢复时不再重新规划"""
+        with self._lock:
+            self._data['queue'] = list(resource_ids)
+        self.flush(force=True)
+
+    def phase(self, resource_id: str) -> ResourcePhase:
+        """资源的处理阶段"""
+        entry = self._data.get('resources', {}).get(resource_id)
+        return ResourcePhase(entry['phase']) if entry else ResourcePhase.PENDING
+
+    def resource_ids(self, phase: ResourcePhase) -> List[str]:
+        """处于指定阶段的资源ID"""
+        return [resource_id for resource_id, entry in self._data.get('resources', {}).items()
+                if entry['phase'] == phase.value]
+
+    def set_phase(self, resource_id: str, phase: ResourcePhase, message: Optional[str] = None) -> None:
+        """更新资源阶段并立即写入"""
+        with self._lock:
+            entry = self._data.setdefault('resources', {}).setdefault(resource_id, {})
+            entry['phase'] = phase.value
+            entry['updated_at'] = time.time()
+            if message is not None:
+                entry['message'] = message
+        self.flush(force=True)
+
+    def record_segments(self, resource_id: str, table: SegmentTable) -> None:
+        """记录片段完成情况，按写入间隔批量写入"""
+        with self._lock:
+            self._tables[resource_id] = table
+            self._dirty = True
+        self.flush()
+
+    def segment_sizes(self, resource_id: str) -> Optional[array]:
+        """检查点中记录的各片段大小（int64数组，未完成为0），没有记录返回None"""
+        segments = self._data.get('resources', {}).get(resource_id, {}).get('segments')
+        if not segments:
+            return None
+        sizes = array('q')
+        sizes.frombytes(base64.b64decode(segments['sizes']))
+        return sizes if len(sizes) == segments['total'] else None
+
+    def completed_segments(self, resource_id: str) -> List[int]:
+        """检查点中记录为已完成的片段序号"""
+        sizes = self.segment_sizes(resource_id)
+        return [index for index, size in enumerate(sizes) if size > 0] if sizes else []
+
+    def flush(self, force: bool = False) -> None:
+        """写入检查点文件；非强制写入时距离上次写入不足间隔则跳过"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and (not self._dirty or now - self._last_flush < self.flush_interval):
+                return
+            for resource_id, table in self._tables.items():
+                self._encode_segments(resource_id, table)
+            self._tables.clear()
+            self._data['updated_at'] = time.time()
+            if not FileUtils.save_json_atomic(self._data, self.path):
+                logger.warning(f"写入检查点失败: {self.path}")
+                return
+            self._dirty = False
+            self._last_flush = now
+
+    def _encode_segments(self, resource_id: str, table: SegmentTable) -> None:
+        """把片段表编码为已完成片段的大小数组（与打包存储的偏移索引一样使用本机字节序）"""
+        sizes = array('q', bytes(8 * len(table)))
+        for index in table.indices(SegmentStatus.COMPLETED):
+            sizes[index] = table.actual_sizes[index]
+        entry = self._data.setdefault('resources', {}).setdefault(
+            resource_id, {'phase': ResourcePhase.DOWNLOADING.value})
+        entry['segments'] = {
+            'total': len(table),
+            'completed': table.completed_count,
+            'sizes': base64.b64encode(sizes.tobytes()).decode('ascii'),
+        }
+
+    def remove(self) -> None:
+        """课程全部完成后删除检查点"""
+        FileUtils.remove_file_safely(self.path)
+
+
+def remove_stale_temp_files(download_dir: str, resource_ids: Iterable[str]) -> int:
+    """
+    删除上次运行中断时在要恢复的资源目录中遗留的临时文件（*.tmp）
+
+    只处理这些资源的目录：片段去重存储和缓存代理目录可能正被其他进程写入
+
+    Returns:
+        int: 删除的文件数
+    """
+    removed = 0
+    for resource_id in resource_ids:
+        for root, _, files in os.walk(os.path.join(download_dir, resource_id)):
+            for name in files:
+                if name.endswith('.tmp') and FileUtils.remove_file_safely(os.path.join(root, name)):
+                    removed += 1
+    return removed
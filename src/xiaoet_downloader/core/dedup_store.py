@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+from typing import Optional, Tuple
+
+from ..utils.file_utils import FileUtils
+from ..utils.logger import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Linux FICLONE ioctl，用于Btrfs/XFS等支持reflink的文件系统
+FICLONE = 0x40049409
+
+
+class SegmentDedupStore:
+    """
+    跨资源的片段去重存储
+
+    以片段稳定CDN路径（去掉主机和签名参数）的哈希为键，把片段保存在
+    <download_dir>/.segment_store/<键前两位>/<键>.ts。其他资源需要同一片段时
+    直接硬链接（不支持时尝试reflink，再退化为复制），不再重复下载。
+    引用计数即存储对象的硬链接数减一，没有任何资源引用的对象才会被清理，
+    因此只有能与片段文件硬链接的对象才加入存储，打包布局（没有独立的片段文件）不支持去重
+    """
+
+    DIR_NAME = '.segment_store'
+
+    def __init__(self, download_dir: str):
+        """初始化去重存储"""
+        self.root = os.path.join(download_dir, self.DIR_NAME)
+        FileUtils.ensure_dir(self.root)
+        self.hits = 0
+        self.saved_bytes = 0
+
+    def object_path(self, key: str) -> str:
+        """键对应的存储对象路径"""
+        return os.path.join(self.root, key[:2], f'{key}.ts')
+
+    def lookup(self, key: str) -> Optional[str]:
+        """查找已存储的片段，不存在返回None"""
+        path = self.object_path(key)
+        return path if FileUtils.get_file_size(path) > 0 else None
+
+    def add(self, key: str, source: str) -> bool:
+        """
+        把新下载的片段以硬链接方式加入存储（与资源目录共享同一份数据）
+
+        文件系统不支持硬链接时不加入：副本的硬链接数为1，会被当作没有引用的对象清理
+
+        Args:
+            key: 片段键
+            source: 片段文件路径
+
+        Returns:
+            bool: 存储中是否有该片段
+        """
+        path = self.object_path(key)
+        if os.path.exists(path):
+            return True
+        FileUtils.ensure_dir(os.path.dirname(path))
+        try:
+            os.link(source, path)
+        except FileExistsError:
+            pass
+        except OSError as e:
+            logger.debug(f"无法硬链接片段，不加入去重存储: {str(e)}")
+            return False
+        return True
+
+    def link_into(self, key: str, dest: str) -> int:
+        """
+        把存储中的片段链接到目标路径
+
+        Returns:
+            int: 片段大小，片段不存在时返回0
+        """
+        path = self.lookup(key)
+        if not path:
+            return 0
+        temp_file = dest + '.tmp'
+        FileUtils.remove_file_safely(temp_file)
+        self._clone(path, temp_file)
+        os.replace(temp_file, dest)
+        size = FileUtils.get_file_size(dest)
+        self.hits += 1
+        self.saved_bytes += size
+        return size
+
+    @staticmethod
+    def _clone(source: str, dest: str) -> None:
+        """依次尝试硬链接、reflink和复制"""
+        try:
+            os.link(source, dest)
+            return
+        except OSError:
+            pass
+        if fcntl is not None:
+            try:
+                with open(source, 'rb') as src, open(dest, 'wb') as dst:
+                    fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                return
+            except OSError:
+                FileUtils.remove_file_safely(dest)
+        shutil.copyfile(source, dest)
+
+    def refcount(self, key: str) -> int:
+        """片段被资源目录引用（硬链接）的次数"""
+        try:
+            return os.stat(self.object_path(key)).st_nlink - 1
+        except OSError:
+            return 0
+
+    def gc(self) -> Tuple[int, int]:
+        """
+        清理没有被任何资源引用的存储对象
+
+        Returns:
+            Tuple[int, int]: (删除的对象数, 释放的字节数)
+        """
+        removed = 0
+        freed = 0
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                if entry.name.endswith('.tmp') or stat.st_nlink <= 1:
+                    if FileUtils.remove_file_safely(entry.path):
+                        removed += 1
+                        freed += stat.st_size
+        logger.info(f"片段去重存储清理完成: 删除 {removed} 个对象, 释放 {freed} 字节")
+        return removed, freed
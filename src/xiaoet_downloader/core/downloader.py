@@ -5,29 +5,69 @@ import os
 import time
 import requests
 import m3u8
-from typing import List, Optional, Tuple
-from m3u8.model import SegmentList, Segment, find_key
+from typing import Callable, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
 
 from ..models.config import XiaoetConfig
 from ..models.video import VideoResource, VideoMetadata, DownloadResult, DownloadStatus
+from ..models.segment import SegmentTable, SegmentStatus
+from .batch import DownloadCancelled
+from .dedup_store import SegmentDedupStore
+from .hedging import HedgedFetcher
+from .line_selector import PlayLine, PlayLineSet, fetch_media_playlist, stream_media_playlist
+from .progressive import ProgressiveOutput
+from .session_health import AuthExpiredError
+from .transport import ProxiedSession, create_http_session
+from .segment_store import SegmentStore, create_segment_store
 from ..utils.file_utils import FileUtils
+from ..utils.m3u8_utils import M3U8Utils
+from ..utils.url_utils import UrlUtils
 from ..utils.logger import logger
 
 
 class VideoDownloader:
     """视频下载器"""
     
+    # 签名距离过期不足多少秒时提前刷新播放地址
+    REFRESH_MARGIN = 60
+    # 片段重试的初始等待时间（秒），之后每次加倍，不超过MAX_BACKOFF
+    RETRY_DELAY = 1.0
+    MAX_BACKOFF = 30.0
+    # 这些状态码表示服务器暂时不可用，等待后重试
+    RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+    # 直接下载媒体文件时的读取块大小
+    FILE_CHUNK_SIZE = 1024 * 1024
+    
     def __init__(self, config: XiaoetConfig):
         """初始化下载器"""
         self.config = config
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.dedup = None
+        if config.segment_dedup:
+            if config.segment_layout == 'files':
+                self.dedup = SegmentDedupStore(config.download_dir)
+            else:
+                logger.warning(f"片段去重依赖硬链接片段文件，不支持 {config.segment_layout} 片段布局，已关闭去重")
+        self.session = create_http_session(config.http2, {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36',
             'Referer': f'https://{config.app_id}.h5.xiaoeknow.com/'
         })
+        if config.cache_proxy:
+            # CDN请求经局域网缓存代理转发
+            self.session = ProxiedSession(self.session, config.cache_proxy)
+        self.fetcher = HedgedFetcher(self.session, enabled=config.hedge_requests)
+        self.line_switches = 0
+        self.url_refreshes = 0
+        # 从网络下载的片段字节数（不含缓存和去重复用）
+        self.bytes_downloaded = 0
     
     def download_m3u8_video(self, resource: VideoResource, play_url: str, 
-                           download_dir: str, nocache: bool = False) -> DownloadResult:
+                           download_dir: str, nocache: bool = False,
+                           lines: Optional[List[PlayLine]] = None,
+                           refresh: Optional[Callable[[], List[PlayLine]]] = None,
+                           progress: Optional[Callable[[SegmentTable, int], None]] = None,
+                           progressive: bool = False,
+                           progressive_output: Optional[str] = None,
+                           known_sizes: Optional[Sequence[int]] = None) -> DownloadResult:
         """
         下载m3u8视频
         
@@ -36,6 +76,12 @@ class VideoDownloader:
             play_url: m3u8播放地址
             download_dir: 下载目录
             nocache: 是否忽略缓存
+            lines: 测速排序后的播放线路，第一条为首选线路，其余用于故障转移
+            refresh: 重新解析播放线路的回调，签名即将过期或返回HTTP 403时调用
+            progress: 每处理完一个片段调用一次，参数为片段表和该片段从网络下载的字节数
+            progressive: 是否边下载边输出（live.m3u8，连续的片段完成后立即追加）
+            progressive_output: 边下载边输出的TS文件路径，为空时只输出live.m3u8
+            known_sizes: 检查点记录的各片段大小（未完成为0），片段仍在存储中时直接使用
             
         Returns:
             DownloadResult: 下载结果
@@ -51,64 +97,119 @@ class VideoDownloader:
             resource.download_status = DownloadStatus.DOWNLOADING
             logger.info(f"开始下载视频: {resource.title}")
             
-            # 获取m3u8内容
-            response = self.session.get(play_url)
-            if response.status_code != 200:
-                return DownloadResult(resource, False, f"获取m3u8内容失败: HTTP {response.status_code}")
+            # 获取m3u8内容（线路选择时已获取则直接复用）
+            primary = lines[0] if lines else PlayLine('', play_url)
+            if not primary.playlist_text:
+                media_url, response = fetch_media_playlist(self.session, primary.play_url, self.config.audio_only)
+                if response.status_code == 403 and refresh:
+                    logger.warning("获取m3u8返回HTTP 403，签名可能已过期，重新获取播放地址")
+                    lines = refresh() or lines
+                    primary = lines[0] if lines else primary
+                    if not primary.playlist_text:
+                        media_url, response = fetch_media_playlist(self.session, primary.play_url,
+                                                                   self.config.audio_only)
+                if not primary.playlist_text:
+                    if response.status_code != 200:
+                        return DownloadResult(resource, False, f"获取m3u8内容失败: HTTP {response.status_code}")
+                    if media_url != primary.play_url:
+                        # 主播放列表：片段相对于选择的码流或音轨的地址
+                        primary = PlayLine(primary.name, media_url, primary.quality)
+                    primary.playlist_text = response.text
+            playlist_text = primary.playlist_text
             
             # 解析m3u8内容
             try:
-                media = m3u8.loads(response.text)
+                media = m3u8.loads(playlist_text)
             except Exception as e:
                 return DownloadResult(resource, False, f"解析m3u8内容失败: {str(e)}")
             
             if not media.data.get('segments'):
                 return DownloadResult(resource, False, "m3u8文件中没有找到视频片段")
             
-            # 获取URL前缀
-            url_prefix = self._get_url_prefix(play_url)
-            segments = SegmentList()
+            # 建立片段表，之后不再需要解析结果
+            table = SegmentTable.from_segments(media.data['segments'])
+            media = None
+            total_segments = len(table)
+            
+            # 首选线路使用本地片段表，备用线路只用其播放列表中的片段URI
+            primary.table = table
+            line_set = PlayLineSet([primary] + [line for line in (lines or [])[1:]
+                                                if line.table is not None and len(line.table) == total_segments])
             changed = False
-            complete = True
-            total_segments = len(media.data['segments'])
-            downloaded_segments = 0
             
             logger.info(f"总计 {total_segments} 个视频片段")
             
+            # 打开片段存储，一次性加载已缓存片段的索引
+            store = create_segment_store(self.config.segment_layout, resource_dir, total_segments)
+            store.open(nocache)
+            # 片段数与检查点记录不一致时播放列表已变化，记录作废
+            if nocache or known_sizes is None or len(known_sizes) != total_segments:
+                known_sizes = None
+            
+            # 边下载边输出：片段按顺序下载，每个片段完成后输出推进到第一个缺失的片段
+            live = ProgressiveOutput(resource_dir, playlist_text, store, progressive_output) if progressive else None
+            output_path = None
+            
             # 下载每个视频片段
-            for index, segment in enumerate(media.data['segments']):
-                ts_file = os.path.join(resource_dir, f'v_{index}.ts')
-                
-                # 如果文件已存在且不忽略缓存，则跳过
-                if not nocache and os.path.exists(ts_file):
-                    logger.info(f"[{index+1}/{total_segments}] 已下载: {os.path.basename(ts_file)}")
-                    downloaded_segments += 1
-                else:
-                    # 下载片段
-                    success = self._download_segment(segment, ts_file, url_prefix, index + 1, total_segments)
-                    if success:
-                        changed = True
-                        downloaded_segments += 1
+            auto_refresh = refresh is not None
+            try:
+                if live:
+                    live.open()
+                for index in range(total_segments):
+                    # 如果片段已缓存且不忽略缓存，则跳过
+                    if known_sizes and known_sizes[index] > 0 and store.has_segment(index):
+                        cached_size = known_sizes[index]
                     else:
-                        complete = False
-                
-                # 更新片段URI为本地文件
-                segment['uri'] = f'v_{index}.ts'
-                segments.append(Segment(base_uri=None, keyobject=find_key(segment.get('key', {}), media.keys), **segment))
+                        cached_size = store.cached_size(index)
+                    if cached_size <= 0 and auto_refresh and line_set.expiring(self.REFRESH_MARGIN):
+                        logger.info("片段签名即将过期，重新获取播放地址")
+                        # 刷新失败或新签名的有效期仍然很短时不再提前刷新，只在HTTP 403时刷新
+                        auto_refresh = (self._refresh_lines(line_set, refresh)
+                                        and not line_set.expiring(self.REFRESH_MARGIN))
+                    fetched = 0
+                    if cached_size > 0:
+                        logger.debug(f"[{index+1}/{total_segments}] 已下载: {store.segment_name(index)}")
+                        table.mark_completed(index, cached_size)
+                    elif self._import_from_dedup(table, index, store, line_set):
+                        changed = True
+                    elif index in primary.samples:
+                        # 线路测速时已下载的片段
+                        sample = primary.samples.pop(index)
+                        table.mark_completed(index, store.write(index, sample))
+                        fetched = len(sample)
+                        changed = True
+                    elif self._download_segment(table, index, store, line_set, refresh):
+                        fetched = table.actual_sizes[index]
+                        changed = True
+                    self.bytes_downloaded += fetched
+                    if live and table.status(index) == SegmentStatus.COMPLETED:
+                        live.segment_ready(index)
+                    if progress:
+                        progress(table, fetched)
+            finally:
+                if live:
+                    output_path = live.close()
+                store.close()
+                primary.samples.clear()
+                self.line_switches += line_set.switches
+                self.url_refreshes += line_set.refreshes
             
-            # 生成本地m3u8文件
+            # 生成本地m3u8文件：逐行流式重写原始播放列表，只把URI行替换为本地条目
             m3u8_file = os.path.join(resource_dir, 'video.m3u8')
-            if changed or not os.path.exists(m3u8_file):
-                media.segments = segments
-                with open(m3u8_file, 'w', encoding='utf8') as f:
-                    f.write(media.dumps())
+            if changed or nocache or not os.path.exists(m3u8_file):
+                M3U8Utils.rewrite_playlist(
+                    M3U8Utils.iter_lines(line_set.primary.playlist_text), m3u8_file, store.playlist_entry
+                )
             
             # 保存元数据
+            complete = table.is_complete
+            downloaded_segments = table.completed_count
             metadata = VideoMetadata(
                 title=resource.title,
                 complete=complete,
                 total_segments=total_segments,
-                downloaded_segments=downloaded_segments
+                downloaded_segments=downloaded_segments,
+                file_size=table.total_size
             )
             FileUtils.save_json(metadata.to_dict(), os.path.join(resource_dir, 'metadata.json'))
             
@@ -117,63 +218,218 @@ class VideoDownloader:
             
             if complete:
                 logger.info(f"视频下载完成: {resource.title}")
-                return DownloadResult(resource, True, "下载完成", resource_dir)
+                return DownloadResult(resource, True, "下载完成", resource_dir, segment_table=table,
+                                      output_path=output_path)
             else:
                 logger.warning(f"视频下载不完整: {resource.title} ({downloaded_segments}/{total_segments})")
-                return DownloadResult(resource, False, f"下载不完整 ({downloaded_segments}/{total_segments})")
+                return DownloadResult(resource, False, f"下载不完整 ({downloaded_segments}/{total_segments})",
+                                      segment_table=table)
                 
+        except (AuthExpiredError, DownloadCancelled):
+            # 登录失效或批量任务取消时不记为下载失败，已下载的片段保留，由调用方处理
+            raise
         except Exception as e:
             resource.download_status = DownloadStatus.FAILED
             logger.error(f"下载视频时发生错误: {str(e)}")
             return DownloadResult(resource, False, f"下载失败: {str(e)}")
     
-    def _get_url_prefix(self, play_url: str) -> str:
-        """获取URL前缀"""
-        if 'v.f230' in play_url:
-            return play_url.split('v.f230')[0]
-        return play_url.rsplit('/', 1)[0] + '/'
+    def probe_playlist(self, play_url: str) -> Optional[Tuple[int, float]]:
+        """
+        预读m3u8播放列表，只统计片段数和总时长
+        
+        Returns:
+            Optional[Tuple[int, float]]: (片段数, 总时长秒数)，失败返回None
+        """
+        try:
+            status_code, lines = stream_media_playlist(self.session, play_url, self.config.audio_only, timeout=30)
+            if status_code != 200:
+                logger.warning(f"预读m3u8失败: HTTP {status_code}")
+                return None
+            # 边接收边统计，不保留整个播放列表
+            return M3U8Utils.summarize(lines)
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"预读m3u8出错: {str(e)}")
+            return None
+    
+    def download_file(self, resource: VideoResource, url: str, download_dir: str,
+                      nocache: bool = False, max_retries: int = 3) -> DownloadResult:
+        """
+        直接下载单个媒体文件（没有切片的音频）
+        
+        先写入临时文件，长度与Content-Length一致后再重命名
+        
+        Args:
+            resource: 资源
+            url: 文件地址
+            download_dir: 下载目录
+            nocache: 是否忽略已下载的文件
+            max_retries: 最大重试次数
+            
+        Returns:
+            DownloadResult: 下载结果，file_path为下载的文件
+        """
+        resource_dir = os.path.join(download_dir, resource.resource_id)
+        FileUtils.ensure_dir(resource_dir)
+        extension = os.path.splitext(urlsplit(url).path)[1].lower() or '.m4a'
+        file_path = os.path.join(resource_dir, f'audio{extension}')
+        if not nocache and os.path.isfile(file_path) and os.path.getsize(file_path) > 0:
+            logger.info(f"音频已下载，跳过: {resource.title}")
+            return DownloadResult(resource, True, "已下载，跳过", file_path)
+        
+        resource.download_status = DownloadStatus.DOWNLOADING
+        logger.info(f"开始下载音频: {resource.title}")
+        temp_file = file_path + '.tmp'
+        retry_count = 0
+        message = ''
+        while retry_count < max_retries:
+            retry_after = None
+            try:
+                response = self.session.get(url, timeout=60, stream=True)
+                try:
+                    if response.status_code == 200:
+                        size = 0
+                        with open(temp_file, 'wb') as f:
+                            for chunk in response.iter_content(self.FILE_CHUNK_SIZE):
+                                f.write(chunk)
+                                size += len(chunk)
+                        expected = response.headers.get('Content-Length')
+                        if expected is not None and expected.isdigit() and size != int(expected):
+                            message = f"文件不完整: 收到 {size}/{expected} 字节"
+                        elif not size:
+                            message = "文件为空"
+                        else:
+                            os.replace(temp_file, file_path)
+                            self.bytes_downloaded += size
+                            resource.download_status = DownloadStatus.COMPLETED
+                            logger.info(f"音频下载完成: {resource.title} ({size} 字节)")
+                            return DownloadResult(resource, True, "下载完成", file_path)
+                    else:
+                        message = f"HTTP {response.status_code}"
+                        if response.status_code not in self.RETRYABLE_STATUS:
+                            break
+                        retry_after = response.headers.get('Retry-After')
+                finally:
+                    response.close()
+            except requests.exceptions.RequestException as e:
+                message = str(e)
+            retry_count += 1
+            logger.warning(f"下载音频失败 ({retry_count}/{max_retries}): {message}")
+            self._wait_before_retry(retry_count, max_retries, retry_after)
+        
+        FileUtils.remove_file_safely(temp_file)
+        resource.download_status = DownloadStatus.FAILED
+        logger.error(f"音频下载失败: {resource.title}: {message}")
+        return DownloadResult(resource, False, f"下载失败: {message}")
+    
+    def _import_from_dedup(self, table: SegmentTable, index: int, store: SegmentStore,
+                           line_set: PlayLineSet) -> bool:
+        """从去重存储中复用其他资源已下载的同一片段"""
+        if not self.dedup:
+            return False
+        key = UrlUtils.stable_key(line_set.primary.segment_url(index))
+        size = self.dedup.link_into(key, store.segment_path(index))
+        if size <= 0:
+            return False
+        table.mark_completed(index, size)
+        logger.debug(f"[{index+1}/{len(table)}] 复用已有片段: {store.segment_name(index)}")
+        return True
     
-    def _download_segment(self, segment: dict, ts_file: str, url_prefix: str, 
-                         current: int, total: int, max_retries: int = 3) -> bool:
+    def _download_segment(self, table: SegmentTable, index: int, store: SegmentStore,
+                          line_set: PlayLineSet,
+                          refresh: Optional[Callable[[], List[PlayLine]]] = None,
+                          max_retries: int = 3) -> bool:
         """
         下载单个视频片段
         
         Args:
-            segment: 片段信息
-            ts_file: 本地文件路径
-            url_prefix: URL前缀
-            current: 当前片段序号
-            total: 总片段数
+            table: 片段表，记录下载状态、实际大小和重试次数
+            index: 片段序号
+            store: 片段存储
+            line_set: 播放线路，出错或变慢时切换线路
+            refresh: 重新解析播放线路的回调，HTTP 403时调用一次
             max_retries: 最大重试次数
             
         Returns:
             bool: 是否下载成功
         """
-        # 构建片段URL
-        segment_url = segment.get('uri')
-        if not segment_url.startswith('http'):
-            segment_url = url_prefix + segment_url
+        current = index + 1
+        total = len(table)
         
+        table.set_status(index, SegmentStatus.DOWNLOADING)
         retry_count = 0
+        refreshed = False
         while retry_count < max_retries:
+            line = line_set.current
+            alternate = line_set.alternate()
             try:
-                response = self.session.get(segment_url, timeout=30)
+                response = self.fetcher.get(line.segment_url(index),
+                                            alternate.segment_url(index) if alternate else None)
                 if response.status_code == 200:
-                    # 写入临时文件，下载完成后重命名
-                    temp_file = ts_file + '.tmp'
-                    with open(temp_file, 'wb') as f:
-                        f.write(response.content)
-                    os.rename(temp_file, ts_file)
-                    logger.info(f"[{current}/{total}] 下载成功: {os.path.basename(ts_file)}")
+                    expected = response.expected_length
+                    if expected is not None:
+                        table.expected_sizes[index] = expected
+                    if expected is not None and len(response.content) != expected:
+                        # 连接提前断开，响应体不完整
+                        logger.warning(f"[{current}/{total}] 片段不完整: "
+                                       f"收到 {len(response.content)}/{expected} 字节")
+                        line_set.record_failure(line)
+                        retry_count = table.add_retry(index)
+                        self._wait_before_retry(retry_count, max_retries)
+                        continue
+                    size = store.write(index, response.content)
+                    table.mark_completed(index, size)
+                    line_set.record_success(alternate if response.hedged and alternate else line,
+                                            size, response.elapsed)
+                    if self.dedup:
+                        self.dedup.add(UrlUtils.stable_key(line_set.primary.segment_url(index)),
+                                       store.segment_path(index))
+                    logger.debug(f"[{current}/{total}] 下载成功: {store.segment_name(index)}")
                     return True
-                else:
-                    logger.warning(f"[{current}/{total}] 下载失败: HTTP {response.status_code}")
-                    retry_count += 1
+                if response.status_code == 403 and refresh and not refreshed:
+                    # 签名过期，刷新后重试，不计入重试次数
+                    refreshed = True
+                    logger.warning(f"[{current}/{total}] HTTP 403，签名可能已过期，重新获取播放地址")
+                    if self._refresh_lines(line_set, refresh):
+                        continue
+                logger.warning(f"[{current}/{total}] 下载失败: HTTP {response.status_code}")
+                line_set.record_failure(line)
+                retry_count = table.add_retry(index)
+                if response.status_code in self.RETRYABLE_STATUS:
+                    self._wait_before_retry(retry_count, max_retries, response.header('Retry-After'))
             except requests.exceptions.RequestException as e:
                 logger.warning(f"[{current}/{total}] 下载出错: {str(e)}")
-                retry_count += 1
-                if retry_count < max_retries:
-                    time.sleep(1)  # 等待1秒后重试
+                line_set.record_failure(line)
+                retry_count = table.add_retry(index)
+                self._wait_before_retry(retry_count, max_retries)
         
+        table.mark_failed(index)
         logger.error(f"[{current}/{total}] 达到最大重试次数，下载失败")
-        return False
\ No newline at end of file
+        return False
+    
+    def _wait_before_retry(self, retry_count: int, max_retries: int,
+                           retry_after: Optional[str] = None) -> None:
+        """重试前等待：指数退避，服务器给出Retry-After时按其等待，都不超过MAX_BACKOFF"""
+        if retry_count >= max_retries:
+            return
+        delay = self.RETRY_DELAY * 2 ** (retry_count - 1)
+        if retry_after is not None:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                # HTTP日期格式的Retry-After按指数退避处理
+                pass
+        time.sleep(min(max(delay, 0.0), self.MAX_BACKOFF))
+    
+    def _refresh_lines(self, line_set: PlayLineSet, refresh: Callable[[], List[PlayLine]]) -> bool:
+        """重新解析播放线路，更新各线路片段URI的签名"""
+        try:
+            lines = refresh()
+        except AuthExpiredError:
+            raise
+        except Exception as e:
+            logger.warning(f"重新获取播放地址出错: {str(e)}")
+            return False
+        if lines and line_set.refresh(lines):
+            return True
+        logger.warning("重新获取播放地址失败")
+        return False
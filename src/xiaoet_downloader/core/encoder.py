@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import ffmpy
+
+from ..utils.file_utils import FileUtils
+from ..utils.logger import logger
+from ..utils.m3u8_utils import M3U8Utils
+
+
+@dataclass
+class EncodeProfile:
+    """重编码配置"""
+    video_codec: str = 'libx265'
+    crf: int = 28
+    preset: str = 'medium'
+    audio_codec: str = 'copy'
+    # 每个分块的目标时长（秒），分块边界对齐到片段边界
+    chunk_seconds: float = 300.0
+    # 并行编码的分块数，默认为CPU核数
+    jobs: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'EncodeProfile':
+        """从配置字典创建EncodeProfile实例"""
+        return cls(
+            video_codec=data.get('video_codec', 'libx265'),
+            crf=int(data.get('crf', 28)),
+            preset=data.get('preset', 'medium'),
+            audio_codec=data.get('audio_codec', 'copy'),
+            chunk_seconds=float(data.get('chunk_seconds', 300)),
+            jobs=data.get('jobs')
+        )
+
+    def output_options(self) -> List[str]:
+        """分块编码的ffmpeg输出参数"""
+        options = ['-c:v', self.video_codec, '-crf', str(self.crf), '-preset', self.preset,
+                   '-c:a', self.audio_codec]
+        if self.video_codec in ('libx265', 'hevc'):
+            # 并行编码多个分块时x265的日志会互相穿插，只保留错误
+            options += ['-x265-params', 'log-level=error']
+        return options
+
+
+@dataclass
+class PlaylistChunk:
+    """按时间切分的播放列表分块"""
+    index: int
+    lines: List[str]
+    duration: float = 0.0
+
+
+class ParallelEncoder:
+    """
+    分块并行重编码
+
+    把本地m3u8按片段边界切成若干时间段，每段写一个子播放列表，
+    多个ffmpeg进程并行编码各分块，最后用concat分离器无损拼接
+    """
+
+    # 需要在每个分块开头重复的“粘性”标签
+    STICKY_TAGS = ('#EXT-X-KEY:', '#EXT-X-MAP:')
+    # 只出现在播放列表头部的标签
+    HEADER_TAGS = ('#EXTM3U', '#EXT-X-VERSION:', '#EXT-X-TARGETDURATION:',
+                   '#EXT-X-MEDIA-SEQUENCE:', '#EXT-X-PLAYLIST-TYPE:', '#EXT-X-ALLOW-CACHE:')
+    MEDIA_SEQUENCE_TAG = '#EXT-X-MEDIA-SEQUENCE:'
+
+    def __init__(self, profile: EncodeProfile, runner: Callable[[ffmpy.FFmpeg], None],
+                 jobs: Optional[int] = None):
+        """
+        初始化并行编码器
+
+        Args:
+            profile: 重编码配置
+            runner: 执行ffmpeg命令的函数（可带优先级前缀）
+            jobs: 分块并发数上限（批量转码时为分给每个视频的CPU并发数），为空表示不限制
+        """
+        self.profile = profile
+        self.runner = runner
+        self.jobs = jobs
+
+    def split(self, playlist_file: str) -> List[PlaylistChunk]:
+        """
+        按目标时长在片段边界处切分播放列表
+
+        每个分块写入自己第一个片段的媒体序列号：AES-128没有显式IV时以序列号作为IV，
+        沿用原播放列表的序列号会使后续分块解密出错
+        """
+        header: List[str] = []
+        media_sequence = 0
+        segment_index = 0
+        sticky: Dict[str, str] = {}
+        chunks: List[PlaylistChunk] = []
+        current: Optional[PlaylistChunk] = None
+        pending: List[str] = []
+        segment_duration = 0.0
+
+        with open(playlist_file, 'r', encoding='utf8') as f:
+            for raw_line in f:
+                line = raw_line.strip()
+                if not line or line == '#EXT-X-ENDLIST':
+                    continue
+                if line.startswith(self.HEADER_TAGS):
+                    if line.startswith(self.MEDIA_SEQUENCE_TAG):
+                        try:
+                            media_sequence = int(line[len(self.MEDIA_SEQUENCE_TAG):])
+                        except ValueError:
+                            media_sequence = 0
+                    elif not chunks and current is None:
+                        header.append(line)
+                    continue
+                if not M3U8Utils.is_uri_line(line):
+                    for tag in self.STICKY_TAGS:
+                        if line.startswith(tag):
+                            sticky[tag] = line
+                    if line.startswith('#EXTINF:'):
+                        segment_duration = M3U8Utils.parse_extinf(line)
+                    pending.append(line)
+                    continue
+
+                # URI行：开始新分块时重复头部和粘性标签
+                if current is None or current.duration >= self.profile.chunk_seconds:
+                    current = PlaylistChunk(len(chunks), list(header))
+                    current.lines.append(f'{self.MEDIA_SEQUENCE_TAG}{media_sequence + segment_index}')
+                    current.lines += [tag_line for tag_line in sticky.values() if tag_line not in pending]
+                    chunks.append(current)
+                current.lines += pending
+                current.lines.append(self._resolve_uri(line, os.path.dirname(playlist_file)))
+                current.duration += segment_duration
+                segment_index += 1
+                pending = []
+                segment_duration = 0.0
+
+        for chunk in chunks:
+            chunk.lines.append('#EXT-X-ENDLIST')
+        return chunks
+
+    @staticmethod
+    def _resolve_uri(uri: str, base_dir: str) -> str:
+        """本地相对路径转为绝对路径，分块播放列表可以放在任意目录"""
+        if '://' in uri or os.path.isabs(uri):
+            return uri
+        return os.path.abspath(os.path.join(base_dir, uri))
+
+    def encode(self, playlist_file: str, output_file: str, work_dir: str) -> None:
+        """
+        分块并行重编码并拼接
+
+        Args:
+            playlist_file: 本地m3u8文件
+            output_file: 输出文件路径
+            work_dir: 存放分块文件的临时目录
+        """
+        chunks = self.split(playlist_file)
+        if not chunks:
+            raise ValueError("播放列表中没有片段")
+
+        FileUtils.ensure_dir(work_dir)
+        chunk_outputs = [os.path.join(work_dir, f'chunk_{chunk.index:04d}.ts') for chunk in chunks]
+        jobs = self.profile.jobs or os.cpu_count() or 1
+        if self.jobs:
+            jobs = max(1, min(jobs, self.jobs))
+        logger.info(f"分 {len(chunks)} 块并行重编码，并发数 {min(jobs, len(chunks))}")
+
+        try:
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                futures = [executor.submit(self._encode_chunk, chunk, chunk_output, work_dir)
+                           for chunk, chunk_output in zip(chunks, chunk_outputs)]
+                for future in futures:
+                    future.result()
+
+            # concat分离器流复制拼接，不再重新编码
+            list_file = os.path.join(work_dir, 'chunks.txt')
+            with open(list_file, 'w', encoding='utf8') as f:
+                for chunk_output in chunk_outputs:
+                    escaped = chunk_output.replace("'", "'\\''")
+                    f.write(f"file '{escaped}'\n")
+            output_options = ['-c', 'copy']
+            if self.profile.video_codec in ('libx265', 'hevc'):
+                output_options += ['-tag:v', 'hvc1']
+            self.runner(ffmpy.FFmpeg(
+                global_options='-y -loglevel error',
+                inputs={list_file: ['-f', 'concat', '-safe', '0']},
+                outputs={output_file: output_options}
+            ))
+        finally:
+            for name in os.listdir(work_dir):
+                FileUtils.remove_file_safely(os.path.join(work_dir, name))
+            try:
+                os.rmdir(work_dir)
+            except OSError:
+                pass
+
+    def _encode_chunk(self, chunk: PlaylistChunk, chunk_output: str, work_dir: str) -> None:
+        """编码单个分块"""
+        chunk_playlist = os.path.join(work_dir, f'chunk_{chunk.index:04d}.m3u8')
+        with open(chunk_playlist, 'w', encoding='utf8') as f:
+            f.write('\n'.join(chunk.lines))
+            f.write('\n')
+        self.runner(ffmpy.FFmpeg(
+            global_options='-y -loglevel error',
+            inputs={chunk_playlist: ['-protocol_whitelist', 'crypto,file,http,https,tcp,tls']},
+            outputs={chunk_output: self.profile.output_options() + ['-f', 'mpegts']}
+        ))
+        logger.info(f"分块 {chunk.index + 1} 编码完成 ({chunk.duration:.0f}s)")
@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+import socket
+import struct
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+
+from ..utils.url_utils import UrlUtils
+
+
+@dataclass(frozen=True)
+class FaultProfile:
+    """
+    故障注入配置
+
+    各比例为单次请求发生该故障的概率，按 重置、错误、签名过期、截断、缓慢 的顺序判定
+    """
+    name: str = 'none'
+    # 连接被重置（不返回任何响应）
+    reset_rate: float = 0.0
+    # 响应体缓慢地分块返回，slow_delay 为整个响应体的传输时间（秒）
+    slow_rate: float = 0.0
+    slow_delay: float = 0.2
+    # 响应头声明完整长度，但只返回一半响应体后断开
+    truncate_rate: float = 0.0
+    # 返回 error_codes 中的状态码，触发后接下来的 error_burst-1 个请求同样出错
+    error_rate: float = 0.0
+    error_burst: int = 1
+    error_codes: Tuple[int, ...] = (429, 503)
+    # 签名过期：返回HTTP 403，之后旧签名一直无效，直到重新获取播放地址
+    expire_rate: float = 0.0
+    # 同一URL最多连续出错的次数，保证在重试次数内能够完成
+    max_consecutive: int = 2
+    seed: int = 0
+
+
+# 测试和基准中使用的预设故障配置
+FAULT_PROFILES: Dict[str, FaultProfile] = {
+    profile.name: profile for profile in (
+        FaultProfile('none'),
+        FaultProfile('resets', reset_rate=0.3),
+        FaultProfile('slow', slow_rate=0.3, slow_delay=0.1),
+        FaultProfile('truncated', truncate_rate=0.3),
+        FaultProfile('bursts', error_rate=0.15, error_burst=3),
+        FaultProfile('expired', expire_rate=0.1),
+        FaultProfile('mixed', reset_rate=0.1, slow_rate=0.1, slow_delay=0.1, truncate_rate=0.1,
+                     error_rate=0.05, error_burst=2, expire_rate=0.05),
+    )
+}
+
+
+class FaultInjector:
+    """
+    确定性的故障决策
+
+    同一配置（包括seed）下，同一URL（去掉主机和签名参数）的第N次请求总是得到
+    相同的决策，与请求的先后顺序和线程调度无关；错误突发跨越多个请求，
+    只在顺序请求时可复现
+    """
+
+    RESET = 'reset'
+    SLOW = 'slow'
+    TRUNCATE = 'truncate'
+    ERROR = 'error'
+    EXPIRE = 'expire'
+
+    def __init__(self, profile: FaultProfile):
+        self.profile = profile
+        self.generation = 0
+        self.injected: Counter = Counter()
+        self.requests = 0
+        self._attempts: Counter = Counter()
+        self._consecutive: Counter = Counter()
+        self._burst = 0
+        self._lock = threading.Lock()
+
+    @property
+    def sign(self) -> str:
+        """当前有效的签名"""
+        return f'g{self.generation}'
+
+    def decide(self, url: str) -> Tuple[Optional[str], int]:
+        """
+        决定本次请求注入的故障
+
+        Returns:
+            Tuple[Optional[str], int]: (故障类型，没有故障时为None, 错误状态码)
+        """
+        profile = self.profile
+        key = UrlUtils.stable_path(url)
+        with self._lock:
+            self.requests += 1
+            attempt = self._attempts[key]
+            self._attempts[key] += 1
+            rng = random.Random(f'{profile.seed}:{key}:{attempt}')
+            rolls = [rng.random() for _ in range(5)]
+            status = profile.error_codes[rng.randrange(len(profile.error_codes))] if profile.error_codes else 503
+
+            fault = None
+            if self._consecutive[key] >= profile.max_consecutive:
+                fault = None
+            elif rolls[0] < profile.reset_rate:
+                fault = self.RESET
+            elif self._burst > 0 or rolls[1] < profile.error_rate:
+                fault = self.ERROR
+                self._burst = self._burst - 1 if self._burst > 0 else profile.error_burst - 1
+            elif rolls[2] < profile.expire_rate:
+                fault = self.EXPIRE
+                self.generation += 1
+            elif rolls[3] < profile.truncate_rate:
+                fault = self.TRUNCATE
+            elif rolls[4] < profile.slow_rate:
+                fault = self.SLOW
+
+            # 缓慢的响应最终是完整的，不计入连续出错
+            if fault and fault != self.SLOW:
+                self._consecutive[key] += 1
+            else:
+                self._consecutive[key] = 0
+            if fault:
+                self.injected[fault] += 1
+            return fault, status
+
+    def signature_valid(self, url: str) -> bool:
+        """URL中的签名是否仍然有效（没有签名参数的URL视为有效）"""
+        sign = dict(parse_qsl(urlsplit(url).query)).get('sign')
+        return sign is None or sign == self.sign
+
+
+class FaultInjectingServer:
+    """
+    本地替身CDN
+
+    提供一个m3u8播放列表和其中的片段，片段请求按故障配置注入故障。
+    播放列表和片段URI都带有当前签名，签名过期后旧URL返回HTTP 403，
+    重新请求播放列表即可得到新签名的URI
+    """
+
+    def __init__(self, segments: Sequence[bytes], profile: FaultProfile = FaultProfile(),
+                 segment_duration: float = 2.0, host: str = '127.0.0.1'):
+        """
+        初始化替身CDN
+
+        Args:
+            segments: 各片段的内容
+            profile: 故障配置
+            segment_duration: 播放列表中每个片段的时长（秒）
+            host: 监听地址
+        """
+        self.segments = list(segments)
+        self.injector = FaultInjector(profile)
+        self.segment_duration = segment_duration
+        self.host = host
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def __enter__(self) -> 'FaultInjectingServer':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def playlist_url(self) -> str:
+        """带当前签名的播放地址"""
+        return f'{self.base_url}/video.m3u8?sign={self.injector.sign}'
+
+    def playlist(self) -> str:
+        """带当前签名的播放列表"""
+        lines = ['#EXTM3U', '#EXT-X-VERSION:3',
+                 f'#EXT-X-TARGETDURATION:{int(self.segment_duration + 0.999)}', '#EXT-X-MEDIA-SEQUENCE:0']
+        for index in range(len(self.segments)):
+            lines.append(f'#EXTINF:{self.segment_duration:.3f},')
+            lines.append(f'seg_{index}.ts?sign={self.injector.sign}')
+        lines.append('#EXT-X-ENDLIST')
+        return '\n'.join(lines) + '\n'
+
+    def start(self) -> 'FaultInjectingServer':
+        """在后台线程中启动服务器（随机端口）"""
+        self._server = ThreadingHTTPServer((self.host, 0), self._handler_class())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='xiaoet-fault-server', daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _handler_class(self):
+        server = self
+        injector = self.injector
+
+        class FaultHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # 响应头和响应体分开写入，关闭Nagle算法避免延迟确认带来的固定等待
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                path = urlsplit(self.path).path
+                if not injector.signature_valid(self.path):
+                    self._respond(403, b'signature expired')
+                    return
+                if path == '/video.m3u8':
+                    self._respond(200, server.playlist().encode('utf-8'),
+                                  'application/vnd.apple.mpegurl')
+                    return
+                index = self._segment_index(path)
+                if index is None:
+                    self._respond(404, b'not found')
+                    return
+
+                body = server.segments[index]
+                fault, status = injector.decide(self.path)
+                if fault == FaultInjector.RESET:
+                    # SO_LINGER为0时关闭连接发送RST
+                    self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+                    self.close_connection = True
+                elif fault == FaultInjector.ERROR:
+                    self._respond(status, b'injected error', headers={'Retry-After': '0'})
+                elif fault == FaultInjector.EXPIRE:
+                    self._respond(403, b'signature expired')
+                elif fault == FaultInjector.TRUNCATE:
+                    self._send_headers(200, len(body))
+                    self._write(body[:len(body) // 2])
+                    self.close_connection = True
+                elif fault == FaultInjector.SLOW:
+                    self._send_headers(200, len(body))
+                    chunks = 8
+                    step = max(len(body) // chunks, 1)
+                    for offset in range(0, len(body), step):
+                        time.sleep(injector.profile.slow_delay / chunks)
+                        if not self._write(body[offset:offset + step]):
+                            return
+                else:
+                    self._respond(200, body)
+
+            def _segment_index(self, path: str) -> Optional[int]:
+                name = path.rsplit('/', 1)[-1]
+                if not (name.startswith('seg_') and name.endswith('.ts')):
+                    return None
+                try:
+                    index = int(name[4:-3])
+                except ValueError:
+                    return None
+                return index if 0 <= index < len(server.segments) else None
+
+            def _send_headers(self, status: int, length: int, content_type: str = 'video/mp2t',
+                              headers: Optional[Dict[str, str]] = None) -> None:
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(length))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+
+            def _respond(self, status: int, body: bytes, content_type: str = 'video/mp2t',
+                         headers: Optional[Dict[str, str]] = None) -> None:
+                self._send_headers(status, len(body), content_type, headers)
+                self._write(body)
+
+            def _write(self, data: bytes) -> bool:
+                try:
+                    self.wfile.write(data)
+                    self.wfile.flush()
+                    return True
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+                    return False
+
+        return FaultHandler
+
+
+class FaultInjectingSession:
+    """
+    HTTP会话包装，在客户端一侧注入故障
+
+    接口与 requests.Session 的 get 一致，可替换下载器的会话，对真实的CDN或
+    任意服务器注入故障。客户端一侧无法改变服务器的签名，签名过期表现为
+    单次的HTTP 403
+    """
+
+    def __init__(self, session, profile: FaultProfile = FaultProfile()):
+        self.session = session
+        self.injector = FaultInjector(profile)
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def get(self, url: str, **kwargs):
+        fault, status = self.injector.decide(url)
+        if fault == FaultInjector.RESET:
+            raise requests.exceptions.ConnectionError(f"注入故障: 连接被重置 {url}")
+        if fault == FaultInjector.ERROR:
+            return self._response(url, status, b'injected error', {'Retry-After': '0'})
+        if fault == FaultInjector.EXPIRE:
+            return self._response(url, 403, b'signature expired')
+        if fault == FaultInjector.SLOW:
+            time.sleep(self.injector.profile.slow_delay)
+        response = self.session.get(url, **kwargs)
+        if fault == FaultInjector.TRUNCATE and response.status_code == 200:
+            body = response.content
+            return self._response(url, 200, body[:len(body) // 2], {'Content-Length': str(len(body))})
+        return response
+
+    @staticmethod
+    def _response(url: str, status: int, body: bytes,
+                  headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        response = requests.Response()
+        response.status_code = status
+        response.url = url
+        response._content = body
+        response._content_consumed = True
+        response.headers.update(headers or {})
+        response.headers.setdefault('Content-Length', str(len(body)))
+        return response
+
+
+def fault_profiles(names: Optional[List[str]] = None, seed: int = 0) -> List[FaultProfile]:
+    """按名称获取预设故障配置（默认全部），替换随机种子"""
+    return [replace(FAULT_PROFILES[name], seed=seed) for name in (names or FAULT_PROFILES)]
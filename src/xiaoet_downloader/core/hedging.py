@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+
+@dataclass
+class FetchResult:
+    """一次完整读取的HTTP响应"""
+    status_code: int
+    content: bytes = b''
+    headers: Dict[str, str] = field(default_factory=dict)
+    url: str = ''
+    elapsed: float = 0.0
+    hedged: bool = False
+
+    def header(self, name: str) -> Optional[str]:
+        """获取响应头（不区分大小写）"""
+        lowered = name.lower()
+        for key, value in self.headers.items():
+            if key.lower() == lowered:
+                return value
+        return None
+
+    @property
+    def expected_length(self) -> Optional[int]:
+        """响应头声明的响应体长度，没有声明或内容经过压缩（长度不对应解压后的内容）时返回None"""
+        length = self.header('Content-Length')
+        if length is None or self.header('Content-Encoding') not in (None, 'identity'):
+            return None
+        try:
+            return int(length)
+        except ValueError:
+            return None
+
+
+class LatencyTracker:
+    """最近若干次请求耗时的滑动窗口，用于估计分位数"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        """
+        初始化耗时统计
+
+        Args:
+            window: 窗口大小
+            min_samples: 样本数不足时不给出分位数
+        """
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.min_samples = min_samples
+
+    def add(self, latency: float) -> None:
+        """记录一次耗时"""
+        with self._lock:
+            self._samples.append(latency)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """返回分位数（p取0~1），样本不足返回None"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            samples = sorted(self._samples)
+        return samples[min(int(p * len(samples)), len(samples) - 1)]
+
+
+class RequestCancel:
+    """
+    一次对冲中所有请求共用的取消信号
+
+    取消时除了让读取循环在块之间退出，还直接关闭已收到响应头的连接（shutdown套接字），
+    阻塞在recv中的请求立即返回，不必等到超时
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._responses: List[Any] = []
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    def attach(self, response: Any) -> None:
+        """登记进行中的响应，已取消时立即关闭"""
+        with self._lock:
+            if not self._event.is_set():
+                self._responses.append(response)
+                return
+        self._abort(response)
+
+    def detach(self, response: Any) -> None:
+        """响应读取结束，不再需要取消"""
+        with self._lock:
+            if response in self._responses:
+                self._responses.remove(response)
+
+    def set(self) -> None:
+        """取消所有进行中的请求"""
+        with self._lock:
+            self._event.set()
+            responses, self._responses = self._responses, []
+        for response in responses:
+            self._abort(response)
+
+    @staticmethod
+    def _abort(response: Any) -> None:
+        """关闭响应的连接；close() 不会唤醒其他线程中阻塞的recv，因此先shutdown套接字"""
+        sock = getattr(getattr(getattr(response, 'raw', None), 'connection', None), 'sock', None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        else:
+            try:
+                response.close()
+            except Exception:
+                pass
+
+
+class HedgedFetcher:
+    """
+    对冲请求
+
+    请求超过最近耗时的分位数（默认p95）仍未完成时，再发一个相同的请求
+    （有备用线路时发往备用线路），取先完整返回的结果，取消另一个。
+
+    每个请求在自己的线程中执行：落败的请求还在等待响应头时无法中止，只占用自己的线程
+    直到超时，不会像固定大小的线程池那样挤占后续请求；收到响应头之后取消时直接关闭连接
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, session: requests.Session, enabled: bool = True,
+                 percentile: float = 0.95, min_delay: float = 0.05,
+                 timeout: float = 30):
+        """
+        初始化对冲请求器
+
+        Args:
+            session: HTTP会话
+            enabled: 是否启用对冲，关闭时退化为普通请求
+            percentile: 触发对冲的耗时分位数
+            min_delay: 对冲等待的最短时间（秒）
+            timeout: 单个请求的超时时间（秒）
+        """
+        self.session = session
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.timeout = timeout
+        self.tracker = LatencyTracker()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def get(self, url: str, alternate_url: Optional[str] = None) -> FetchResult:
+        """
+        获取URL内容
+
+        Args:
+            url: 主请求URL
+            alternate_url: 对冲请求使用的备用URL，为空时重复请求主URL
+
+        Returns:
+            FetchResult: 先完整返回的结果
+
+        Raises:
+            requests.exceptions.RequestException: 所有请求都失败时抛出
+        """
+        with self._lock:
+            self.requests += 1
+
+        delay = self.tracker.percentile(self.percentile) if self.enabled else None
+        if delay is None:
+            # 没有足够的耗时样本（或未启用对冲）时直接请求
+            result = self._fetch(url, RequestCancel())
+            if result.status_code == 200:
+                self.tracker.add(result.elapsed)
+            return result
+
+        cancel = RequestCancel()
+        start = time.monotonic()
+        primary = self._submit(self._fetch, url, cancel)
+        done, _ = wait([primary], timeout=max(delay, self.min_delay))
+        futures = [primary]
+        if not done:
+            with self._lock:
+                self.hedges += 1
+            hedge = self._submit(self._fetch, alternate_url or url, cancel, True)
+            futures.append(hedge)
+
+        try:
+            result = self._first_success(futures)
+        finally:
+            # 取消仍在进行的请求
+            cancel.set()
+
+        if result.hedged:
+            with self._lock:
+                self.hedge_wins += 1
+        if result.status_code == 200:
+            # 记录从主请求开始的端到端耗时：对冲请求自身的耗时不含等待对冲的时间，会压低分位数
+            self.tracker.add(time.monotonic() - start)
+        return result
+
+    @staticmethod
+    def _submit(fn: Callable[..., FetchResult], *args: Any) -> Future:
+        """在新的后台线程中执行请求"""
+        future: Future = Future()
+        future.set_running_or_notify_cancel()
+
+        def run() -> None:
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name='xiaoet-hedge', daemon=True).start()
+        return future
+
+    def _first_success(self, futures: list) -> FetchResult:
+        """等待第一个成功（HTTP 200）的结果；都不成功时返回最后一个结果或抛出最后一个异常"""
+        pending = set(futures)
+        last_result: Optional[FetchResult] = None
+        last_error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is not None:
+                    last_error = error
+                    continue
+                result = future.result()
+                if result.status_code == 200:
+                    return result
+                last_result = result
+        if last_result is not None:
+            return last_result
+        raise last_error
+
+    def _fetch(self, url: str, cancel: RequestCancel, hedged: bool = False) -> FetchResult:
+        """流式读取完整响应，收到取消信号时中止"""
+        start = time.monotonic()
+        response = self.session.get(url, timeout=self.timeout, stream=True)
+        cancel.attach(response)
+        try:
+            if response.status_code != 200:
+                return FetchResult(response.status_code, b'', dict(response.headers), url,
+                                   time.monotonic() - start, hedged)
+            chunks = []
+            try:
+                for chunk in response.iter_content(self.CHUNK_SIZE):
+                    if cancel.is_set():
+                        break
+                    chunks.append(chunk)
+            except Exception:
+                if not cancel.is_set():
+                    raise
+            if cancel.is_set():
+                raise requests.exceptions.ConnectionError("对冲请求已被取消")
+            return FetchResult(200, b''.join(chunks), dict(response.headers), url,
+                               time.monotonic() - start, hedged)
+        finally:
+            cancel.detach(response)
+            response.close()
+
+    def summary(self) -> Dict[str, float]:
+        """对冲统计"""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'hedges': self.hedges,
+                'hedge_wins': self.hedge_wins,
+                'hedge_rate': self.hedges / self.requests if self.requests else 0.0,
+            }
@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import m3u8
+import requests
+
+from .hedging import FetchResult
+from .session_health import AuthExpiredError
+from ..models.segment import SegmentTable
+from ..utils.logger import logger
+from ..utils.m3u8_utils import M3U8Utils
+from ..utils.url_utils import UrlUtils
+
+
+def fetch_media_playlist(session: requests.Session, play_url: str, audio_only: bool = False,
+                         timeout: Optional[float] = None) -> Tuple[str, requests.Response]:
+    """
+    获取播放地址的媒体播放列表，返回的是主播放列表时再获取其中选择的码流或音轨
+
+    Args:
+        session: HTTP会话
+        play_url: 播放地址
+        audio_only: 是否只要音频（优先选择独立音轨）
+        timeout: 请求超时时间（秒）
+
+    Returns:
+        Tuple[str, requests.Response]: (媒体播放列表地址, 响应)，片段URI相对于该地址
+    """
+    response = session.get(play_url, timeout=timeout)
+    if response.status_code != 200:
+        return play_url, response
+    uri = M3U8Utils.select_rendition(response.text, audio_only)
+    if uri is None:
+        return play_url, response
+    media_url = UrlUtils.segment_url(play_url, UrlUtils.playlist_prefix(play_url), uri)
+    logger.debug(f"主播放列表选择{'音轨' if audio_only else '码流'}: {uri}")
+    return media_url, session.get(media_url, timeout=timeout)
+
+
+def stream_media_playlist(session: requests.Session, play_url: str, audio_only: bool = False,
+                          timeout: Optional[float] = None) -> Tuple[int, Iterator[str]]:
+    """
+    流式获取媒体播放列表，逐行返回，不把整个响应读入内存
+
+    开头几行就能区分主播放列表和媒体播放列表：主播放列表很小，读完后选择码流或音轨，
+    再流式获取其媒体播放列表
+
+    Returns:
+        Tuple[int, Iterator[str]]: (HTTP状态码, 播放列表的行迭代器)，读完后关闭响应
+    """
+    response = session.get(play_url, timeout=timeout, stream=True)
+    if response.status_code != 200:
+        response.close()
+        return response.status_code, iter(())
+    # 没有声明字符集时 iter_lines 会返回字节
+    response.encoding = response.encoding or 'utf-8'
+    lines = response.iter_lines(decode_unicode=True)
+    head = []
+    for line in lines:
+        head.append(line)
+        if line.startswith('#EXTINF:'):
+            break
+        if line.startswith(('#EXT-X-STREAM-INF:', '#EXT-X-MEDIA:')):
+            text = '\n'.join(head + list(lines))
+            response.close()
+            uri = M3U8Utils.select_rendition(text, audio_only)
+            if uri is None:
+                return 200, M3U8Utils.iter_lines(text)
+            media_url = UrlUtils.segment_url(play_url, UrlUtils.playlist_prefix(play_url), uri)
+            logger.debug(f"主播放列表选择{'音轨' if audio_only else '码流'}: {uri}")
+            return stream_media_playlist(session, media_url, audio_only, timeout)
+    return 200, _iter_response(response, head, lines)
+
+
+def _iter_response(response: requests.Response, head: List[str], rest: Iterable[str]) -> Iterator[str]:
+    """先返回已读取的行，再返回剩余的行，结束后关闭响应"""
+    with response:
+        yield from head
+        yield from rest
+
+
+@dataclass
+class PlayLine:
+    """一条播放线路（CDN）"""
+    name: str
+    play_url: str
+    quality: Optional[str] = None
+    # 该线路播放列表的原始内容和片段表，片段URI以各线路自己的播放列表为准
+    playlist_text: str = ''
+    table: Optional[SegmentTable] = None
+    # 基准测试及下载过程中估计的吞吐量（字节/秒），0表示未知
+    throughput: float = 0.0
+    # 基准测试下载的片段，下载时直接复用
+    samples: Dict[int, bytes] = field(default_factory=dict)
+    failures: int = 0
+    slow_count: int = 0
+    disabled: bool = False
+
+    def __post_init__(self):
+        self.url_prefix = UrlUtils.playlist_prefix(self.play_url)
+
+    def segment_url(self, index: int) -> str:
+        """该线路上第index个片段的完整URL"""
+        return UrlUtils.segment_url(self.play_url, self.url_prefix, self.table.uri(index))
+
+    def expires_at(self) -> Optional[float]:
+        """播放地址和片段签名中最早的过期时间，没有过期参数时返回None"""
+        urls = [self.play_url]
+        if self.table is not None and len(self.table):
+            urls.append(self.segment_url(0))
+        expiries = [expiry for expiry in map(UrlUtils.url_expiry, urls) if expiry]
+        return min(expiries) if expiries else None
+
+
+class PlayLineSet:
+    """
+    单个视频下载过程中的线路状态
+
+    当前线路连续出错，或连续多个片段的吞吐量明显低于该线路的平均水平时，
+    切换到其他可用线路（故障转移）。出错的线路不再使用，变慢的线路之后仍可切回
+    """
+
+    # 平均吞吐量的平滑系数
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, lines: List[PlayLine], max_failures: int = 2,
+                 slow_factor: float = 3.0, slow_limit: int = 3):
+        """
+        初始化线路状态
+
+        Args:
+            lines: 可用线路，第一条为首选线路
+            max_failures: 连续出错多少次后切换线路
+            slow_factor: 吞吐量低于平均值的多少分之一视为变慢
+            slow_limit: 连续变慢多少个片段后切换线路
+        """
+        self.lines = lines
+        self.max_failures = max_failures
+        self.slow_factor = slow_factor
+        self.slow_limit = slow_limit
+        self.current = lines[0]
+        self.switches = 0
+        self.refreshes = 0
+        self.expires_at = self._earliest_expiry()
+
+    @property
+    def primary(self) -> PlayLine:
+        """首选线路，本地播放列表以它为准"""
+        return self.lines[0]
+
+    def alternate(self) -> Optional[PlayLine]:
+        """当前线路之外吞吐量最高的可用线路，用于对冲请求"""
+        candidates = [line for line in self.lines if line is not self.current and not line.disabled]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda line: line.throughput)
+
+    def record_success(self, line: PlayLine, size: int, elapsed: float) -> None:
+        """记录一次成功下载，吞吐量持续偏低时切换线路"""
+        line.failures = 0
+        if elapsed <= 0 or size <= 0:
+            return
+        throughput = size / elapsed
+        if line.throughput and throughput * self.slow_factor < line.throughput:
+            line.slow_count += 1
+            if line is self.current and line.slow_count >= self.slow_limit:
+                alternate = self.alternate()
+                # 只有备用线路确实更快时才切换
+                if alternate and alternate.throughput > throughput:
+                    line.throughput = throughput
+                    line.slow_count = 0
+                    self._switch(alternate, f"吞吐量下降到 {throughput / 1024:.0f} KB/s")
+            return
+        line.slow_count = 0
+        if line.throughput:
+            line.throughput += self.EWMA_ALPHA * (throughput - line.throughput)
+        else:
+            line.throughput = throughput
+
+    def record_failure(self, line: PlayLine) -> None:
+        """记录一次下载失败，连续出错时停用该线路"""
+        line.failures += 1
+        if line is self.current and line.failures >= self.max_failures:
+            alternate = self.alternate()
+            if alternate:
+                line.disabled = True
+                self._switch(alternate, f"连续 {line.failures} 次出错")
+
+    def expiring(self, margin: float) -> bool:
+        """签名是否将在margin秒内过期"""
+        return self.expires_at is not None and self.expires_at - time.time() < margin
+
+    def refresh(self, lines: List[PlayLine]) -> bool:
+        """
+        用重新解析的线路替换各线路的播放地址和片段URI（新的签名）
+
+        Returns:
+            bool: 是否至少更新了一条线路
+        """
+        fresh = {line.name: line for line in lines}
+        updated = False
+        for line in self.lines:
+            new_line = fresh.get(line.name) or (lines[0] if not line.name and lines else None)
+            if new_line is None or new_line.table is None or len(new_line.table) != len(line.table):
+                continue
+            line.play_url = new_line.play_url
+            line.url_prefix = new_line.url_prefix
+            line.playlist_text = new_line.playlist_text
+            line.table = new_line.table
+            line.failures = 0
+            line.disabled = False
+            updated = True
+        if updated:
+            self.refreshes += 1
+            self.expires_at = self._earliest_expiry()
+        return updated
+
+    def _earliest_expiry(self) -> Optional[float]:
+        """所有线路中最早的过期时间"""
+        expiries = [expiry for expiry in (line.expires_at() for line in self.lines) if expiry]
+        return min(expiries) if expiries else None
+
+    def _switch(self, line: PlayLine, reason: str) -> None:
+        """切换当前线路"""
+        logger.warning(f"线路 {self.current.name} {reason}，切换到线路 {line.name}")
+        self.current = line
+        self.switches += 1
+
+
+class PlayLineSelector:
+    """
+    播放线路选择
+
+    分别用几条线路请求播放地址，每条线路下载开头几个片段测速，
+    按吞吐量排序，最快的作为该视频的首选线路，其余作为备用线路
+    """
+
+    DEFAULT_LINES = ('A', 'B', 'C')
+
+    def __init__(self, api_client, session: requests.Session,
+                 lines: Sequence[str] = DEFAULT_LINES, sample_segments: int = 2,
+                 timeout: float = 15, audio_only: bool = False):
+        """
+        初始化线路选择器
+
+        Args:
+            api_client: API客户端
+            session: 下载使用的HTTP会话
+            lines: 参与选择的线路名称
+            sample_segments: 每条线路测速下载的片段数
+            timeout: 测速请求的超时时间（秒）
+            audio_only: 是否只要音频（主播放列表中优先选择独立音轨）
+        """
+        self.api_client = api_client
+        self.session = session
+        self.lines = list(lines)
+        self.sample_segments = sample_segments
+        self.timeout = timeout
+        self.audio_only = audio_only
+
+    def select(self, user_id: str, play_sign: str) -> List[PlayLine]:
+        """
+        解析并测速所有线路
+
+        Returns:
+            List[PlayLine]: 按吞吐量从高到低排序的可用线路，第一条为首选线路
+        """
+        lines = [line for line in (self.resolve(user_id, play_sign, name) for name in self.lines) if line]
+        if not lines:
+            return []
+        for line in lines:
+            self._benchmark(line)
+
+        lines.sort(key=lambda line: line.throughput, reverse=True)
+        primary = lines[0]
+        # 备用线路必须是同一清晰度、同样切片的播放列表，片段才能互换
+        lines = [primary] + [line for line in lines[1:]
+                             if line.quality == primary.quality and len(line.table) == len(primary.table)]
+        for line in lines[1:]:
+            line.samples.clear()
+        logger.info("线路测速: " + ", ".join(
+            f"{line.name} {line.throughput / 1024:.0f} KB/s" for line in lines
+        ) + f"，选择线路 {primary.name}")
+        return lines
+
+    def resolve(self, user_id: str, play_sign: str, name: str) -> Optional[PlayLine]:
+        """获取一条线路的播放地址和播放列表（不测速）"""
+        try:
+            play_list_dict = self.api_client.get_play_url(user_id, play_sign, name)
+            play_url, quality = self.api_client.get_best_quality_url(play_list_dict)
+            if not play_url:
+                return None
+            play_url, response = fetch_media_playlist(self.session, play_url, self.audio_only, self.timeout)
+            if response.status_code != 200:
+                logger.warning(f"线路 {name} 获取m3u8失败: HTTP {response.status_code}")
+                return None
+            segments = m3u8.loads(response.text).data.get('segments')
+            if not segments:
+                logger.warning(f"线路 {name} 的m3u8中没有视频片段")
+                return None
+            return PlayLine(name, play_url, quality, response.text, SegmentTable.from_segments(segments))
+        except AuthExpiredError:
+            raise
+        except Exception as e:
+            logger.warning(f"线路 {name} 不可用: {str(e)}")
+            return None
+
+    def _benchmark(self, line: PlayLine) -> None:
+        """
+        下载开头几个片段测量吞吐量，失败的线路吞吐量记为0
+
+        下载的片段保存为样本，下载时直接写入存储，因此与正常下载一样校验长度：
+        响应体与Content-Length不一致时丢弃该片段并视为测速失败
+        """
+        total_bytes = 0
+        start = time.monotonic()
+        try:
+            for index in range(min(self.sample_segments, len(line.table))):
+                response = self.session.get(line.segment_url(index), timeout=self.timeout)
+                if response.status_code != 200:
+                    logger.warning(f"线路 {line.name} 测速失败: HTTP {response.status_code}")
+                    return
+                result = FetchResult(response.status_code, response.content, dict(response.headers))
+                expected = result.expected_length
+                if expected is not None and len(result.content) != expected:
+                    logger.warning(f"线路 {line.name} 测速片段不完整: 收到 {len(result.content)}/{expected} 字节")
+                    return
+                line.samples[index] = result.content
+                total_bytes += len(result.content)
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"线路 {line.name} 测速出错: {str(e)}")
+            return
+        elapsed = time.monotonic() - start
+        line.throughput = total_bytes / elapsed if elapsed > 0 else float(total_bytes)
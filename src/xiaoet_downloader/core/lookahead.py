@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from .session_health import AuthExpiredError
+from ..models.video import VideoResource
+from ..utils.logger import logger
+
+if TYPE_CHECKING:
+    from .line_selector import PlayLine
+
+
+@dataclass
+class ResolvedPlayback:
+    """已解析的资源播放线路"""
+    resource: VideoResource
+    lines: List['PlayLine'] = field(default_factory=list)
+    resolved_at: float = field(default_factory=time.time)
+
+    @property
+    def play_url(self) -> Optional[str]:
+        """首选线路的播放地址"""
+        return self.lines[0].play_url if self.lines else None
+
+    @property
+    def expires_at(self) -> Optional[float]:
+        """首选线路签名的过期时间，未知时返回None"""
+        return self.lines[0].expires_at() if self.lines else None
+
+    def expiring(self, margin: float) -> bool:
+        """签名是否将在margin秒内过期"""
+        expires_at = self.expires_at
+        return expires_at is not None and expires_at - time.time() < margin
+
+
+class LookaheadResolver:
+    """
+    播放地址预解析
+
+    下载当前资源时在后台解析队列中后续K个资源的播放地址（getPlayUrl签名URL），
+    下载阶段取用时不必等待API。取用时签名即将过期则重新解析；预解析因登录失效
+    而失败的资源在取用时重新解析，不把重新加载cookie之前的错误交给取用方
+    """
+
+    def __init__(self, resources: List[VideoResource],
+                 resolve: Callable[[VideoResource], List['PlayLine']],
+                 depth: int = 2, refresh_margin: float = 300):
+        """
+        初始化预解析器
+
+        Args:
+            resources: 按下载顺序排列的资源
+            resolve: 解析单个资源播放线路的回调，失败返回空列表
+            depth: 预先解析的资源数
+            refresh_margin: 距离过期不足多少秒时重新解析
+        """
+        self.resources = resources
+        self.resolve = resolve
+        self.depth = max(depth, 0)
+        self.refresh_margin = refresh_margin
+        # 单个后台线程，API请求依次进行
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._futures: Dict[int, Future] = {}
+        self.hits = 0
+        self.refreshes = 0
+
+    def get(self, position: int) -> ResolvedPlayback:
+        """
+        取得队列中第position个资源的播放线路，同时安排后续资源的预解析
+        """
+        future = self._futures.pop(position, None)
+        self._schedule(position + 1)
+        resource = self.resources[position]
+
+        playback = None
+        if future is not None:
+            try:
+                playback = future.result()
+            except AuthExpiredError:
+                # 预解析时登录已失效，取用前cookie可能已重新加载：用当前的cookie重新解析，
+                # 仍然失效时由取用方处理
+                pass
+            else:
+                if playback.lines:
+                    self.hits += 1
+        if playback is None:
+            playback = self._resolve(resource)
+
+        if playback.expiring(self.refresh_margin):
+            logger.info(f"播放地址即将过期，重新解析: {resource.title}")
+            self.refreshes += 1
+            playback = self._resolve(resource)
+        return playback
+
+    def close(self) -> None:
+        """取消尚未开始的预解析"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._futures.clear()
+
+    def _schedule(self, start: int) -> None:
+        """安排 [start, start+depth) 范围内资源的预解析"""
+        for position in range(start, min(start + self.depth, len(self.resources))):
+            if position not in self._futures:
+                self._futures[position] = self._executor.submit(self._resolve, self.resources[position])
+
+    def _resolve(self, resource: VideoResource) -> ResolvedPlayback:
+        """解析单个资源，异常转换为空结果"""
+        try:
+            return ResolvedPlayback(resource, self.resolve(resource) or [])
+        except AuthExpiredError:
+            # 登录失效由取用方处理（暂停下载）
+            raise
+        except Exception as e:
+            logger.error(f"解析播放地址时出错: {resource.title}: {str(e)}")
+            return ResolvedPlayback(resource)
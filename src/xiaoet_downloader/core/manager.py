@@ -2,123 +2,514 @@
 # -*- coding: utf-8 -*-
 
 import os
-from typing import List, Dict, Tuple, Optional
+import shutil
+import threading
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, Callable, Iterable, List, Dict, Tuple, Optional, TypeVar
 
 from ..models.config import XiaoetConfig
+from ..models.segment import SegmentTable
 from ..models.video import VideoResource, DownloadResult, ResourceType
-from ..api.client import XiaoetAPIClient
-from ..core.downloader import VideoDownloader
-from ..core.transcoder import VideoTranscoder
+from ..core.batch import BatchDownload, DownloadCancelled
+from ..core.dedup_store import SegmentDedupStore
+from ..core.lookahead import LookaheadResolver, ResolvedPlayback
+from ..core.checkpoint import CheckpointJournal, ResourcePhase, remove_stale_temp_files
+from ..core.progress import ProgressTracker, format_bytes
+from ..core.scheduler import CourseScheduler, SchedulePolicy
+from ..core.session_health import AuthExpiredError, SessionHealthMonitor
 from ..utils.file_utils import FileUtils
 from ..utils.logger import logger
+from ..utils.url_utils import UrlUtils
+
+if TYPE_CHECKING:
+    from ..api.client import XiaoetAPIClient
+    from ..core.batch import BatchDownload
+    from ..core.downloader import VideoDownloader
+    from ..core.line_selector import PlayLine, PlayLineSelector
+    from ..core.transcoder import VideoTranscoder
+
+T = TypeVar('T')
 
 
 class XiaoetDownloadManager:
     """小鹅通下载管理器"""
     
-    def __init__(self, config: XiaoetConfig):
-        """初始化下载管理器"""
+    # 下载的资源类型，其余（图文、直播等）跳过
+    DOWNLOADABLE_TYPES = (ResourceType.VIDEO, ResourceType.AUDIO)
+    
+    def __init__(self, config: XiaoetConfig, config_path: Optional[str] = None,
+                 auth_wait: Optional[float] = 0, progressive: bool = False):
+        """
+        初始化下载管理器
+
+        API客户端、下载器、转码器等组件在首次使用时才创建，
+        --check 等不需要网络的命令不必导入requests、m3u8
+
+        Args:
+            config: 配置
+            config_path: 配置文件路径，登录失效时从中重新加载cookie
+            auth_wait: 登录失效后等待cookie更新的秒数，0表示立即结束运行，None表示一直等待
+            progressive: 边下载边输出，下载完成即得到输出文件，不再合并
+        """
         self.config = config
-        self.api_client = XiaoetAPIClient(config)
-        self.downloader = VideoDownloader(config)
-        self.transcoder = VideoTranscoder(config.download_dir)
+        self.progressive = progressive
+        # 登录状态监控，cookie失效时暂停下载
+        self.health = SessionHealthMonitor(
+            config,
+            lambda: bool(self.api_client.get_micro_navigation_info().get('user_id')),
+            config_path,
+            auth_wait
+        )
+        # 下载课程期间的检查点
+        self.journal: Optional[CheckpointJournal] = None
+        # 下载进度回调，每处理完一个片段调用一次
+        self.progress_hooks: List[Callable[[VideoResource, SegmentTable, int], None]] = []
+        # 处理阶段回调，参数为 (资源ID, 阶段, 说明)
+        self.phase_hooks: List[Callable[[str, ResourcePhase, Optional[str]], None]] = []
+        # 预读播放列表时获取的播放地址，下载时直接使用，不再请求API
+        self._preread_urls: Dict[str, str] = {}
+        # 批量任务共用下载器（计数、对冲请求、线路状态）和资源目录，同一时间只处理一个资源
+        self._batch_lock = threading.Lock()
         
         # 确保下载目录存在
         FileUtils.ensure_dir(config.download_dir)
     
-    def download_course(self, nocache: bool = False, auto_transcode: bool = True) -> Dict[str, List[DownloadResult]]:
+    @cached_property
+    def api_client(self) -> 'XiaoetAPIClient':
+        """API客户端"""
+        from ..api.client import XiaoetAPIClient
+        return XiaoetAPIClient(self.config)
+    
+    @cached_property
+    def downloader(self) -> 'VideoDownloader':
+        """视频下载器"""
+        from ..core.downloader import VideoDownloader
+        return VideoDownloader(self.config)
+    
+    @cached_property
+    def transcoder(self) -> 'VideoTranscoder':
+        """视频转码器"""
+        from ..core.encoder import EncodeProfile
+        from ..core.output_storage import create_output_storage
+        from ..core.transcoder import VideoTranscoder
+        config = self.config
+        return VideoTranscoder(
+            config.download_dir,
+            create_output_storage(config.download_dir, config.output_storage),
+            config.segment_layout,
+            encode_profile=EncodeProfile.from_dict(config.encode_profile) if config.encode_profile else None,
+            audio_only=config.audio_only
+        )
+    
+    @cached_property
+    def line_selector(self) -> 'PlayLineSelector':
+        """播放线路选择器"""
+        from ..core.line_selector import PlayLineSelector
+        return PlayLineSelector(self.api_client, self.downloader.session, self.config.play_lines,
+                                audio_only=self.config.audio_only)
+    
+    def download_course(self, nocache: bool = False, auto_transcode: bool = True,
+                        policy: Optional[SchedulePolicy] = None,
+                        resume: bool = False,
+                        show_progress: bool = True) -> Dict[str, List[DownloadResult]]:
         """
         下载整个课程
         
         Args:
             nocache: 是否忽略缓存
             auto_transcode: 是否自动转码
+            policy: 资源排序策略，默认按课程目录顺序
+            resume: 是否从上次中断的检查点继续
+            show_progress: 是否显示汇总进度（终端中为进度条，否则定期输出一行）
             
         Returns:
             Dict[str, List[DownloadResult]]: 下载结果统计
         """
         results = {
             'success': [],
-            'failed': []
+            'failed': [],
+            # 登录失效时未处理的视频
+            'interrupted': []
         }
         
+        self.journal = CheckpointJournal(self.config.download_dir)
         try:
-            # 获取用户信息
-            navigation_info = self.api_client.get_micro_navigation_info()
-            user_id = navigation_info.get('user_id')
-            if not user_id:
-                logger.error("无法获取用户ID")
-                return results
+            resumed = resume and self.journal.load(self.config.product_id)
+            if resumed:
+                # 从检查点恢复：沿用课程目录快照，不再请求API
+                user_id = self.journal.user_id
+                resources = self.journal.catalogue()
+                logger.info(f"从检查点恢复，课程目录共 {len(resources)} 个资源")
+                self._reconcile_checkpoint(resources)
+            else:
+                if resume:
+                    logger.warning("没有可恢复的检查点，重新开始下载")
+                
+                # 获取用户信息
+                user_id = self._with_session(self._get_user_id)
+                
+                # 获取课程资源列表
+                resources = self._with_session(lambda: self.api_client.get_column_resources(self.config.product_id))
+                if not resources:
+                    logger.warning("未找到课程资源")
+                    return results
+                self.journal.start(self.config.product_id, user_id, resources)
             
-            # 获取课程资源列表
-            resource_items = self.api_client.get_column_items(self.config.product_id)
-            if not resource_items:
-                logger.warning("未找到课程资源")
-                return results
+            logger.info(f"找到 {len(resources)} 个视频资源")
             
-            logger.info(f"找到 {len(resource_items)} 个视频资源")
+            # 只处理视频和音频资源，输出索引中已完成的直接跳过
+            videos = []
+            for resource in resources:
+                if resource.resource_type not in self.DOWNLOADABLE_TYPES:
+                    logger.info(f"跳过不支持下载的资源: {resource.title}")
+                    continue
+                if auto_transcode and not nocache and self.transcoder.index.is_done(resource.resource_id):
+                    results['success'].append(self._skip_done(resource))
+                    continue
+                videos.append(resource)
             
-            # 处理每个资源
-            for index, (resource_id, resource_title) in enumerate(resource_items):
-                try:
-                    logger.info(f"[{index+1}/{len(resource_items)}] 处理视频: {resource_title} ({resource_id})")
-                    
-                    # 创建视频资源对象
-                    resource = VideoResource(
-                        resource_id=resource_id,
-                        title=resource_title,
-                        resource_type=ResourceType.VIDEO if resource_id.startswith('v_') else ResourceType.AUDIO
-                    )
-                    
-                    # 只处理视频资源
-                    if resource.resource_type != ResourceType.VIDEO:
-                        logger.info(f"跳过非视频资源: {resource_title}")
-                        continue
-                    
-                    # 获取播放URL
-                    play_url = self._get_play_url(resource, user_id)
-                    if not play_url:
-                        result = DownloadResult(resource, False, "无法获取播放地址")
-                        results['failed'].append(result)
-                        continue
-                    
-                    # 下载视频
-                    download_result = self.downloader.download_m3u8_video(
-                        resource, play_url, self.config.download_dir, nocache
-                    )
-                    
-                    if download_result.success and auto_transcode:
-                        # 自动转码
-                        transcode_result = self.transcoder.transcode_video(resource)
-                        if transcode_result.success:
-                            results['success'].append(transcode_result)
-                        else:
-                            results['failed'].append(transcode_result)
-                    elif download_result.success:
-                        results['success'].append(download_result)
+            if resumed and self.journal.queue:
+                # 沿用检查点中的队列顺序，不再预读播放列表
+                order = {resource_id: position for position, resource_id in enumerate(self.journal.queue)}
+                queue_resources = sorted(videos, key=lambda resource: order.get(resource.resource_id, len(order)))
+            else:
+                # 按策略排序下载队列
+                scheduler = CourseScheduler(policy)
+                self._preread_urls.clear()
+                queue = self._with_session(lambda: scheduler.plan(
+                    videos,
+                    lambda resource: self._preread_playlist(resource, user_id),
+                    self.config.download_dir
+                ))
+                queue_resources = [item.resource for item in queue]
+                self.journal.set_queue([resource.resource_id for resource in queue_resources])
+            
+            # 处理每个资源，后台预先解析后续资源的播放地址（检查点中已下载的不需要）
+            resolver = LookaheadResolver(
+                queue_resources,
+                lambda resource: [] if self._downloaded(resource) else self._resolve_lines(resource, user_id),
+                depth=self.config.lookahead
+            )
+            progress = ProgressTracker(len(queue_resources), render=show_progress)
+            self.progress_hooks.append(progress.update)
+            progress.start()
+            try:
+                for index, resource in enumerate(queue_resources):
+                    logger.info(f"[{index+1}/{len(queue_resources)}] 处理视频: {resource.title} ({resource.resource_id})")
+                    try:
+                        playback = self._with_session(lambda: resolver.get(index))
+                        result = self._with_session(lambda: self._process_resource(
+                            resource, user_id, nocache, auto_transcode, playback))
+                    except AuthExpiredError as e:
+                        # 登录失效且没有等到新的cookie：停止下载，不再逐个请求剩余视频
+                        results['interrupted'] = [DownloadResult(pending, False, "登录失效，未处理")
+                                                  for pending in queue_resources[index:]]
+                        logger.error(f"登录状态已失效（{e}），停止下载，剩余 {len(results['interrupted'])} 个视频未处理。"
+                                     f"更新配置文件中的cookie后使用 --resume 继续")
+                        break
+                    progress.finish_video(resource, result.success)
+                    if result.success:
+                        results['success'].append(result)
                     else:
-                        results['failed'].append(download_result)
-                        
-                except Exception as e:
-                    error_msg = f"处理视频 {resource_title} 时出错: {str(e)}"
-                    logger.error(error_msg)
-                    result = DownloadResult(
-                        VideoResource(resource_id, resource_title), 
-                        False, 
-                        error_msg
-                    )
-                    results['failed'].append(result)
+                        results['failed'].append(result)
+            finally:
+                resolver.close()
+                progress.stop()
+                self.progress_hooks.remove(progress.update)
             
             # 打印处理结果
             self._print_summary(results)
+            if progress.fetched_bytes:
+                logger.info(f"下载数据: {format_bytes(progress.fetched_bytes)}, "
+                            f"{progress.fetched_segments} 个片段")
+            if self.downloader.url_refreshes or resolver.refreshes:
+                logger.info(f"播放地址刷新: 下载中 {self.downloader.url_refreshes} 次, "
+                            f"取用前 {resolver.refreshes} 次")
+            hedge_stats = self.downloader.fetcher.summary()
+            if hedge_stats['hedges']:
+                logger.info(f"对冲请求: 片段请求 {hedge_stats['requests']} 次, "
+                            f"对冲 {hedge_stats['hedges']} 次 ({hedge_stats['hedge_rate']:.1%}), "
+                            f"对冲胜出 {hedge_stats['hedge_wins']} 次")
+            if self.downloader.line_switches:
+                logger.info(f"线路故障转移: {self.downloader.line_switches} 次")
+            if self.downloader.dedup and self.downloader.dedup.hits:
+                logger.info(f"片段去重: 复用 {self.downloader.dedup.hits} 个片段, "
+                            f"节省下载 {self.downloader.dedup.saved_bytes} 字节")
             
+            # 全部完成后不再需要检查点，有失败时保留以便 --resume 重试
+            if results['failed'] or results['interrupted']:
+                self.journal.flush(force=True)
+            else:
+                self.journal.remove()
+            
+        except KeyboardInterrupt:
+            # 把进行中的下载进度写入检查点后再退出
+            self.journal.flush(force=True)
+            logger.info("已保存检查点，使用 --resume 从中断处继续")
+            raise
+        except AuthExpiredError as e:
+            self.journal.flush(force=True)
+            logger.error(f"登录状态已失效（{e}），请更新配置文件中的cookie后重新运行")
         except Exception as e:
+            self.journal.flush(force=True)
             logger.error(f"下载课程时发生错误: {str(e)}")
+        finally:
+            self.journal = None
+        
+        return results
+    
+    def watch_course(self, interval: float = 600, auto_transcode: bool = True,
+                     status_port: Optional[int] = None) -> bool:
+        """
+        守护模式：常驻运行，按间隔检查课程更新并下载新增的视频
+        
+        Args:
+            interval: 检查间隔（秒）
+            auto_transcode: 是否自动转码
+            status_port: 本地状态接口端口，None表示不启动
+            
+        Returns:
+            bool: 是否正常启动（无法获取用户ID时返回False）
+        """
+        from ..core.watcher import CourseWatcher
+        
+        # 用户信息只获取一次，之后每次检查只请求一次课程目录
+        try:
+            user_id = self._with_session(self._get_user_id)
+        except AuthExpiredError as e:
+            logger.error(f"登录状态已失效（{e}），请更新配置文件中的cookie")
+            return False
+        
+        def list_resources() -> List[VideoResource]:
+            resources = self._with_session(lambda: self.api_client.get_column_resources(self.config.product_id))
+            return [resource for resource in resources
+                    if resource.resource_type in self.DOWNLOADABLE_TYPES
+                    and not (auto_transcode and self.transcoder.index.is_done(resource.resource_id))]
+        
+        watcher = CourseWatcher(
+            list_resources,
+            lambda resource: self._with_session(
+                lambda: self._process_resource(resource, user_id, False, auto_transcode)),
+            interval=interval,
+            status_port=status_port,
+            on_stop=self.health.cancel
+        )
+        self.progress_hooks.append(watcher.progress.update)
+        try:
+            watcher.run()
+        finally:
+            self.progress_hooks.remove(watcher.progress.update)
+        return True
+    
+    def transcode_all(self, jobs: Optional[int] = None, io_jobs: Optional[int] = None,
+                      nice: Optional[int] = None, ionice: bool = False) -> Dict[str, List[DownloadResult]]:
+        """
+        并行转码下载目录中所有已下载的视频，不访问网络
+        
+        Args:
+            jobs: CPU并发上限，默认为CPU核数
+            io_jobs: 磁盘并发上限
+            nice: ffmpeg进程的nice值
+            ionice: 是否以idle IO优先级运行ffmpeg
+            
+        Returns:
+            Dict[str, List[DownloadResult]]: 转码结果统计
+        """
+        from ..core.transcode_scheduler import TranscodeScheduler
+        scheduler = TranscodeScheduler(self.transcoder, jobs, io_jobs, nice, ionice)
+        results = scheduler.run()
+        if results['success'] or results['failed']:
+            self._print_summary(results)
+        return results
+    
+    def verify_all(self, jobs: Optional[int] = None, force: bool = False) -> Dict[str, List[DownloadResult]]:
+        """
+        并行校验输出索引中所有已合并的视频，结果写回输出索引
         
+        Args:
+            jobs: 并发数
+            force: 是否重新校验上次已通过且没有变化的文件
+            
+        Returns:
+            Dict[str, List[DownloadResult]]: 校验结果统计
+        """
+        results = {
+            'success': [],
+            'failed': []
+        }
+        if self.transcoder.storage.streaming:
+            logger.warning(f"输出存储为 {self.transcoder.storage.name}，只能校验本地输出文件")
+            return results
+        
+        from ..core.verifier import LibraryVerifier
+        verifier = LibraryVerifier(self.config.download_dir, self.transcoder.index,
+                                   self.transcoder.verifier, jobs)
+        for verification in verifier.run(force):
+            resource = VideoResource(verification.resource_id, os.path.basename(verification.path))
+            result = DownloadResult(resource, verification.ok, verification.message, verification.path)
+            results['success' if verification.ok else 'failed'].append(result)
+        if results['success'] or results['failed']:
+            self._print_summary(results)
+        else:
+            logger.warning("输出索引中没有已合并的视频")
         return results
     
+    def gc_segment_store(self) -> Tuple[int, int]:
+        """清理去重存储中没有被任何资源引用的片段"""
+        return SegmentDedupStore(self.config.download_dir).gc()
+    
+    def _process_resource(self, resource: VideoResource, user_id: str,
+                          nocache: bool, auto_transcode: bool,
+                          playback: Optional[ResolvedPlayback] = None) -> DownloadResult:
+        """下载（并转码）单个课程资源，playback为预先解析的播放线路"""
+        if auto_transcode and not nocache and self.transcoder.index.is_done(resource.resource_id):
+            return self._skip_done(resource)
+        
+        resource_id = resource.resource_id
+        try:
+            if not nocache and self._downloaded(resource):
+                # 检查点中已下载完成，不再访问网络
+                download_result = DownloadResult(resource, True, "已下载，跳过",
+                                                 os.path.join(self.config.download_dir, resource_id))
+            else:
+                lines = playback.lines if playback else self._resolve_lines(resource, user_id)
+                if not lines:
+                    self._set_phase(resource_id, ResourcePhase.FAILED, "无法获取播放地址")
+                    return DownloadResult(resource, False, "无法获取播放地址")
+                if resource.resource_type == ResourceType.AUDIO and not UrlUtils.is_playlist_url(lines[0].play_url):
+                    return self._process_audio_file(resource, lines[0].play_url, nocache)
+                
+                # 下载视频，签名过期时重新解析播放线路
+                self._set_phase(resource_id, ResourcePhase.DOWNLOADING)
+                # 视频课程只保留音频且没有独立音轨时片段中仍有视频，不能直接作为输出
+                progressive = self.progressive and not (
+                    self.config.audio_only and resource.resource_type == ResourceType.VIDEO)
+                download_result = self.downloader.download_m3u8_video(
+                    resource, lines[0].play_url, self.config.download_dir, nocache, lines,
+                    refresh=lambda: self._refresh_lines(resource, user_id),
+                    progress=lambda table, fetched: self._report_progress(resource, table, fetched),
+                    progressive=progressive,
+                    progressive_output=self.transcoder.claim_progressive_output(resource) if progressive else None,
+                    known_sizes=self.journal.segment_sizes(resource_id) if self.journal else None
+                )
+                if not download_result.success:
+                    self._set_phase(resource_id, ResourcePhase.FAILED, download_result.message)
+                    return download_result
+                self._set_phase(resource_id, ResourcePhase.DOWNLOADED)
+                if download_result.output_path:
+                    # 边下载边输出已生成完整的输出文件，不再合并
+                    result = self.transcoder.record_progressive_output(
+                        resource, download_result.output_path, download_result.segment_table.total_duration
+                    )
+                    self._set_phase(resource_id, ResourcePhase.TRANSCODED)
+                    return result
+            
+            if not auto_transcode:
+                return download_result
+            
+            # 自动转码
+            self._set_phase(resource_id, ResourcePhase.TRANSCODING)
+            result = self.transcoder.transcode_video(resource, download_result.segment_table)
+            if result.success:
+                self._set_phase(resource_id, ResourcePhase.TRANSCODED)
+            else:
+                self._set_phase(resource_id, ResourcePhase.FAILED, result.message)
+            return result
+            
+        except (AuthExpiredError, DownloadCancelled):
+            # 保留当前阶段，凭据更新后重试或 --resume 时继续
+            raise
+        except Exception as e:
+            error_msg = f"处理视频 {resource.title} 时出错: {str(e)}"
+            logger.error(error_msg)
+            self._set_phase(resource_id, ResourcePhase.FAILED, error_msg)
+            return DownloadResult(resource, False, error_msg)
+    
+    def _process_audio_file(self, resource: VideoResource, url: str, nocache: bool) -> DownloadResult:
+        """直接下载没有切片的音频文件并保存到输出存储"""
+        resource_id = resource.resource_id
+        self._set_phase(resource_id, ResourcePhase.DOWNLOADING)
+        download_result = self.downloader.download_file(resource, url, self.config.download_dir, nocache)
+        if not download_result.success:
+            self._set_phase(resource_id, ResourcePhase.FAILED, download_result.message)
+            return download_result
+        self._set_phase(resource_id, ResourcePhase.DOWNLOADED)
+        result = self.transcoder.store_audio_file(resource, download_result.file_path)
+        self._set_phase(resource_id, ResourcePhase.TRANSCODED)
+        return result
+    
+    def _report_progress(self, resource: VideoResource, table: SegmentTable, fetched: int) -> None:
+        """记录片段进度到检查点并通知进度回调"""
+        if self.journal:
+            self.journal.record_segments(resource.resource_id, table)
+        for hook in self.progress_hooks:
+            hook(resource, table, fetched)
+    
+    def _get_user_id(self) -> str:
+        """获取用户ID，获取不到说明cookie已失效"""
+        user_id = self.api_client.get_micro_navigation_info().get('user_id')
+        if not user_id:
+            raise AuthExpiredError("无法获取用户ID")
+        return user_id
+    
+    def _with_session(self, action: Callable[[], T]) -> T:
+        """执行需要登录的操作；登录失效时暂停，等到新的cookie后重试，否则抛出AuthExpiredError"""
+        while True:
+            try:
+                return action()
+            except AuthExpiredError as e:
+                if self.journal:
+                    self.journal.flush(force=True)
+                if not self.health.wait_for_credentials(e):
+                    raise
+    
+    def _downloaded(self, resource: VideoResource) -> bool:
+        """检查点中是否已下载完成（可能尚未转码）"""
+        return self.journal is not None and self.journal.phase(resource.resource_id) in (
+            ResourcePhase.DOWNLOADED, ResourcePhase.TRANSCODING)
+    
+    def _set_phase(self, resource_id: str, phase: ResourcePhase, message: Optional[str] = None) -> None:
+        """更新检查点中的资源阶段（下载课程期间）并通知阶段回调"""
+        if self.journal:
+            self.journal.set_phase(resource_id, phase, message)
+        for hook in self.phase_hooks:
+            hook(resource_id, phase, message)
+    
+    def _reconcile_checkpoint(self, resources: List[VideoResource]) -> None:
+        """恢复前清理要恢复的资源目录中遗留的临时文件和不完整的输出"""
+        by_id = {resource.resource_id: resource for resource in resources}
+        resumed = [resource_id for resource_id in by_id
+                   if self.journal.phase(resource_id) != ResourcePhase.TRANSCODED]
+        removed = remove_stale_temp_files(self.config.download_dir, resumed)
+        if removed:
+            logger.info(f"已清理 {removed} 个遗留的临时文件")
+        for resource_id in self.journal.resource_ids(ResourcePhase.TRANSCODING):
+            if resource_id in by_id:
+                self.transcoder.discard_partial_output(by_id[resource_id])
+        for resource_id in self.journal.resource_ids(ResourcePhase.DOWNLOADING):
+            completed = len(self.journal.completed_segments(resource_id))
+            if completed and resource_id in by_id:
+                logger.info(f"{by_id[resource_id].title}: 检查点记录已完成 {completed} 个片段，继续下载")
+    
+    def _skip_done(self, resource: VideoResource) -> DownloadResult:
+        """输出索引中已完成的资源，不再访问网络"""
+        entry = self.transcoder.index.get(resource.resource_id)
+        logger.info(f"已转码，跳过: {resource.title} -> {entry['location']}")
+        resource.file_path = entry['location']
+        return DownloadResult(resource, True, "文件已存在，跳过", entry['location'])
+    
+    def _preread_playlist(self, resource: VideoResource, user_id: str) -> Optional[Tuple[int, float]]:
+        """预读资源的播放列表，返回 (片段数, 总时长)"""
+        play_url = self._get_play_url(resource, user_id)
+        if not play_url:
+            return None
+        self._preread_urls[resource.resource_id] = play_url
+        if resource.resource_type == ResourceType.AUDIO and not UrlUtils.is_playlist_url(play_url):
+            return None
+        return self.downloader.probe_playlist(play_url)
+    
     def download_single_video(self, resource_id: str, nocache: bool = False, 
-                             auto_transcode: bool = True) -> DownloadResult:
+                             auto_transcode: bool = True, show_progress: bool = True) -> DownloadResult:
         """
         下载单个视频
         
@@ -126,43 +517,33 @@ class XiaoetDownloadManager:
             resource_id: 资源ID
             nocache: 是否忽略缓存
             auto_transcode: 是否自动转码
+            show_progress: 是否显示下载进度
             
         Returns:
             DownloadResult: 下载结果
         """
         try:
             # 获取用户信息
-            navigation_info = self.api_client.get_micro_navigation_info()
-            user_id = navigation_info.get('user_id')
-            if not user_id:
-                return DownloadResult(
-                    VideoResource(resource_id, "未知"), 
-                    False, 
-                    "无法获取用户ID"
-                )
+            user_id = self._with_session(self._get_user_id)
             
             # 创建视频资源对象（标题暂时未知）
             resource = VideoResource(
                 resource_id=resource_id,
                 title="未知",
-                resource_type=ResourceType.VIDEO if resource_id.startswith('v_') else ResourceType.AUDIO
+                resource_type=ResourceType.from_resource_id(resource_id)
             )
             
-            # 获取播放URL
-            play_url = self._get_play_url(resource, user_id)
-            if not play_url:
-                return DownloadResult(resource, False, "无法获取播放地址")
-            
-            # 下载视频
-            download_result = self.downloader.download_m3u8_video(
-                resource, play_url, self.config.download_dir, nocache
-            )
-            
-            if download_result.success and auto_transcode:
-                # 自动转码
-                return self.transcoder.transcode_video(resource)
-            
-            return download_result
+            progress = ProgressTracker(1, render=show_progress)
+            self.progress_hooks.append(progress.update)
+            progress.start()
+            try:
+                result = self._with_session(
+                    lambda: self._process_resource(resource, user_id, nocache, auto_transcode))
+                progress.finish_video(resource, result.success)
+            finally:
+                progress.stop()
+                self.progress_hooks.remove(progress.update)
+            return result
             
         except Exception as e:
             error_msg = f"下载视频 {resource_id} 时出错: {str(e)}"
@@ -173,22 +554,145 @@ class XiaoetDownloadManager:
                 error_msg
             )
     
+    def download_many(self, resource_ids: Iterable[str], nocache: bool = False,
+                      auto_transcode: bool = True, max_events: int = 1000) -> 'BatchDownload':
+        """
+        在后台批量下载多个资源，立即返回任务句柄
+        
+        供其他服务嵌入使用：通过句柄读取结构化事件（解析完成、片段进度、下载完成、
+        合并完成、失败），事件队列有上限，读取跟不上时下载暂停等待（背压），
+        可以随时取消。可以同时提交多个批量任务，同一个下载管理器的任务轮流处理资源，
+        不会同时写入同一个资源目录
+        
+        Args:
+            resource_ids: 资源ID
+            nocache: 是否忽略缓存
+            auto_transcode: 是否自动转码
+            max_events: 事件队列上限，0表示不限制
+            
+        Returns:
+            BatchDownload: 任务句柄
+        """
+        resources = [VideoResource(resource_id, resource_id, ResourceType.from_resource_id(resource_id))
+                     for resource_id in resource_ids]
+        # 用户ID和课程目录中的标题在后台线程处理第一个资源时获取
+        context: Dict[str, Any] = {}
+        
+        def process(resource: VideoResource) -> DownloadResult:
+            with self._batch_lock:
+                # 等待其他任务期间被取消
+                if batch.cancelled:
+                    return DownloadResult(resource, False, "已取消")
+                if 'user_id' not in context:
+                    context['user_id'] = self._with_session(self._get_user_id)
+                    context['titles'] = self._catalogue_titles()
+                resource.title = context['titles'].get(resource.resource_id) or resource.title
+                return self._with_session(lambda: self._process_resource(
+                    resource, context['user_id'], nocache, auto_transcode))
+        
+        batch = BatchDownload(resources, process, max_events, auto_transcode)
+        self.progress_hooks.append(batch.on_progress)
+        self.phase_hooks.append(batch.on_phase)
+        
+        def remove_hooks() -> None:
+            self.progress_hooks.remove(batch.on_progress)
+            self.phase_hooks.remove(batch.on_phase)
+        
+        batch.on_finish = remove_hooks
+        return batch.start()
+    
+    def _catalogue_titles(self) -> Dict[str, str]:
+        """课程目录中各资源的标题，获取失败时返回空字典（使用资源ID作为标题）"""
+        try:
+            resources = self._with_session(lambda: self.api_client.get_column_resources(self.config.product_id))
+        except AuthExpiredError:
+            raise
+        except Exception as e:
+            logger.warning(f"获取课程目录失败，使用资源ID作为标题: {str(e)}")
+            return {}
+        return {resource.resource_id: resource.title for resource in resources}
+    
+    def _get_play_sign(self, resource: VideoResource) -> Optional[str]:
+        """获取视频的播放标识"""
+        if resource.play_sign:
+            return resource.play_sign
+        
+        if resource.resource_type == ResourceType.AUDIO:
+            details = self.api_client.get_audio_detail_info(resource.resource_id)
+            play_sign = details.get('play_sign')
+            if not play_sign and details.get('audio_url'):
+                # 没有播放标识的音频直接下载详情中的音频地址
+                resource.play_url = details['audio_url']
+                return None
+        else:
+            # 获取视频详情
+            details = self.api_client.get_video_detail_info(resource.resource_id)
+            play_sign = details.get('play_sign')
+        
+        if not play_sign:
+            # cookie失效时接口返回空数据，确认登录状态
+            self.health.suspect(f"视频详情中没有播放标识: {resource.title}")
+            logger.warning(f"无法获取视频 {resource.title} 的播放标识")
+            return None
+        
+        # 更新资源的play_sign
+        resource.play_sign = play_sign
+        return play_sign
+    
+    def _resolve_lines(self, resource: VideoResource, user_id: str) -> List['PlayLine']:
+        """
+        解析资源的播放线路，配置了多条线路时测速排序（音频不测速）
+
+        只有一条线路时复用预读播放列表时获取的地址；多条线路需要重新解析并测速
+        """
+        if len(self.config.play_lines) > 1 and resource.resource_type != ResourceType.AUDIO:
+            # 多条线路测速，选择最快的线路，其余线路用于故障转移
+            return self._select_lines(resource, user_id)
+        from ..core.line_selector import PlayLine
+        # 预读时获取的地址只用一次：即将过期时预解析器会再次调用本方法，此时重新请求API
+        play_url = self._preread_urls.pop(resource.resource_id, None) or self._get_play_url(resource, user_id)
+        return [PlayLine(self.config.play_lines[0], play_url)] if play_url else []
+    
+    def _refresh_lines(self, resource: VideoResource, user_id: str) -> List['PlayLine']:
+        """重新解析资源的所有线路（不测速），用于刷新过期的签名"""
+        play_sign = self._get_play_sign(resource)
+        if not play_sign:
+            return []
+        lines = []
+        for name in self.config.play_lines:
+            line = self.line_selector.resolve(user_id, play_sign, name)
+            if line:
+                lines.append(line)
+        return lines
+    
+    def _select_lines(self, resource: VideoResource, user_id: str) -> List['PlayLine']:
+        """解析并测速所有配置的播放线路"""
+        try:
+            play_sign = self._get_play_sign(resource)
+            if not play_sign:
+                return []
+            lines = self.line_selector.select(user_id, play_sign)
+            if lines:
+                resource.play_url = lines[0].play_url
+            else:
+                self.health.suspect(f"没有可用的播放线路: {resource.title}")
+                logger.warning(f"视频 {resource.title} 没有可用的播放线路")
+            return lines
+        except AuthExpiredError:
+            raise
+        except Exception as e:
+            logger.error(f"选择播放线路时出错: {str(e)}")
+            return []
+    
     def _get_play_url(self, resource: VideoResource, user_id: str) -> Optional[str]:
         """获取播放URL"""
         try:
-            # 获取视频详情
-            video_details = self.api_client.get_video_detail_info(resource.resource_id)
-            play_sign = video_details.get('play_sign')
-            
+            play_sign = self._get_play_sign(resource)
             if not play_sign:
-                logger.warning(f"无法获取视频 {resource.title} 的播放标识")
-                return None
-            
-            # 更新资源的play_sign
-            resource.play_sign = play_sign
+                return resource.play_url if resource.resource_type == ResourceType.AUDIO else None
             
             # 获取播放URL列表
-            play_list_dict = self.api_client.get_play_url(user_id, play_sign)
+            play_list_dict = self.api_client.get_play_url(user_id, play_sign, self.config.play_lines[0])
             
             # 获取最佳质量的播放URL
             play_url, quality = self.api_client.get_best_quality_url(play_list_dict)
@@ -198,16 +702,20 @@ class XiaoetDownloadManager:
                 resource.play_url = play_url
                 return play_url
             else:
+                self.health.suspect(f"没有播放地址: {resource.title}")
                 logger.warning(f"无法获取视频 {resource.title} 的播放地址")
                 return None
                 
+        except AuthExpiredError:
+            raise
         except Exception as e:
             logger.error(f"获取播放URL时出错: {str(e)}")
             return None
     
     def _print_summary(self, results: Dict[str, List[DownloadResult]]) -> None:
         """打印处理结果摘要"""
-        total = len(results['success']) + len(results['failed'])
+        interrupted = results.get('interrupted', [])
+        total = len(results['success']) + len(results['failed']) + len(interrupted)
         success_count = len(results['success'])
         failed_count = len(results['failed'])
         
@@ -215,6 +723,8 @@ class XiaoetDownloadManager:
         logger.info("处理完成:")
         logger.info(f"成功: {success_count}/{total}")
         logger.info(f"失败: {failed_count}/{total}")
+        if interrupted:
+            logger.info(f"未处理（登录失效）: {len(interrupted)}/{total}")
         
         if results['failed']:
             logger.info("\n失败的视频:")
@@ -240,8 +750,8 @@ class XiaoetDownloadManager:
             logger.error(f"✗ 配置验证失败: {str(e)}")
             return False
         
-        # 检查ffmpeg
-        if self.transcoder.check_ffmpeg_availability():
+        # 检查ffmpeg：只查找PATH，不创建转码器（避免导入ffmpy和转码相关模块）
+        if shutil.which('ffmpeg') is not None:
             logger.info("✓ ffmpeg 可用")
         else:
             logger.warning("⚠ ffmpeg 不可用，将无法进行视频转码")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from ..utils.file_utils import FileUtils
+
+
+class OutputIndex:
+    """
+    输出索引：resource_id -> 输出文件名、位置、大小和内容哈希
+
+    持久化在下载目录的 .output_index.json 中。是否已转码直接查索引，
+    不再对每个输出文件做 stat；输出文件名按资源确定且不会在同名课程之间冲突
+    """
+
+    FILE_NAME = '.output_index.json'
+
+    def __init__(self, download_dir: str):
+        """加载输出索引"""
+        self.index_file = os.path.join(download_dir, self.FILE_NAME)
+        self._lock = threading.Lock()
+        data = FileUtils.load_json(self.index_file) or {}
+        self._entries: Dict[str, Dict[str, Any]] = data.get('outputs', {})
+        self._names = {entry['name']: resource_id for resource_id, entry in self._entries.items()}
+
+    def get(self, resource_id: str) -> Optional[Dict[str, Any]]:
+        """获取资源的输出记录"""
+        with self._lock:
+            entry = self._entries.get(resource_id)
+            return dict(entry) if entry else None
+
+    def is_done(self, resource_id: str) -> bool:
+        """资源是否已经输出"""
+        with self._lock:
+            return resource_id in self._entries
+
+    def claim_name(self, resource_id: str, safe_title: str, extension: str) -> str:
+        """
+        为资源分配输出文件名
+
+        已有记录时沿用记录的文件名；标题对应的文件名已被其他资源占用时
+        追加 resource_id 后缀。尚未建立索引的旧输出文件（没有其他资源占用）
+        视为该资源的输出，保持与索引建立前的行为一致
+
+        Args:
+            resource_id: 资源ID
+            safe_title: 清理后的标题
+            extension: 扩展名，例如 '.mp4'
+
+        Returns:
+            str: 输出文件名
+        """
+        with self._lock:
+            entry = self._entries.get(resource_id)
+            if entry:
+                return entry['name']
+
+            name = safe_title + extension
+            owner = self._names.get(name)
+            if owner is not None and owner != resource_id:
+                name = f'{safe_title}_{resource_id}{extension}'
+            self._names[name] = resource_id
+            return name
+
+    def entries(self) -> Dict[str, Dict[str, Any]]:
+        """所有输出记录的副本"""
+        with self._lock:
+            return {resource_id: dict(entry) for resource_id, entry in self._entries.items()}
+
+    def record(self, resource_id: str, name: str, location: str, size: int,
+               sha256: Optional[str] = None, duration: Optional[float] = None) -> None:
+        """记录资源的输出并持久化，duration为播放列表的总时长（用于校验输出）"""
+        with self._lock:
+            previous = self._entries.get(resource_id)
+            if previous and previous['name'] != name:
+                self._names.pop(previous['name'], None)
+            self._entries[resource_id] = {
+                'name': name,
+                'location': location,
+                'size': size,
+                'sha256': sha256,
+                'duration': duration,
+                'updated_at': time.strftime('%Y-%m-%d %H:%M:%S')
+            }
+            self._names[name] = resource_id
+            FileUtils.save_json_atomic({'outputs': self._entries}, self.index_file)
+
+    def update_verification(self, results: Dict[str, Dict[str, Any]]) -> None:
+        """批量写入校验结果（一次持久化），输出重新生成时记录随之清除"""
+        with self._lock:
+            for resource_id, result in results.items():
+                entry = self._entries.get(resource_id)
+                if entry is not None:
+                    entry['verification'] = result
+            if results:
+                FileUtils.save_json_atomic({'outputs': self._entries}, self.index_file)
+
+    def remove(self, resource_id: str) -> None:
+        """删除资源的输出记录"""
+        with self._lock:
+            entry = self._entries.pop(resource_id, None)
+            if entry:
+                self._names.pop(entry['name'], None)
+                FileUtils.save_json_atomic({'outputs': self._entries}, self.index_file)
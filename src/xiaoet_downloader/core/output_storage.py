@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from ..utils.file_utils import FileUtils
+from ..utils.logger import logger
+
+
+class OutputStorage:
+    """
+    输出存储：合并后的视频写入本地下载目录
+
+    streaming 为 False 表示 ffmpeg 直接写本地文件
+    """
+
+    name = 'local'
+    streaming = False
+
+    def __init__(self, download_dir: str, delete_local_segments: bool = False):
+        """初始化本地输出存储"""
+        self.download_dir = download_dir
+        self.delete_local_segments = delete_local_segments
+
+    def local_path(self, filename: str) -> str:
+        """输出文件在本地的路径"""
+        return os.path.join(self.download_dir, filename)
+
+    def uri(self, filename: str) -> str:
+        """输出文件的位置描述"""
+        return self.local_path(filename)
+
+    def exists(self, filename: str) -> bool:
+        """输出文件是否已存在"""
+        return os.path.exists(self.local_path(filename))
+
+    def size(self, filename: str) -> int:
+        """输出文件大小"""
+        return FileUtils.get_file_size(self.local_path(filename))
+
+    def open_writer(self, filename: str) -> 'OutputWriter':
+        """打开流式写入器"""
+        return LocalOutputWriter(self.local_path(filename))
+
+
+class OutputWriter:
+    """流式输出写入器基类"""
+
+    def write(self, data: bytes) -> None:
+        raise NotImplementedError
+
+    def commit(self) -> int:
+        """提交写入，返回总字节数"""
+        raise NotImplementedError
+
+    def abort(self) -> None:
+        """放弃写入并清理"""
+        raise NotImplementedError
+
+
+class LocalOutputWriter(OutputWriter):
+    """写入本地临时文件，提交时原子重命名"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.temp_path = path + '.tmp'
+        self._file = open(self.temp_path, 'wb')
+        self._size = 0
+
+    def write(self, data: bytes) -> None:
+        self._file.write(data)
+        self._size += len(data)
+
+    def commit(self) -> int:
+        self._file.close()
+        os.replace(self.temp_path, self.path)
+        return self._size
+
+    def abort(self) -> None:
+        self._file.close()
+        FileUtils.remove_file_safely(self.temp_path)
+
+
+class S3OutputStorage(OutputStorage):
+    """
+    S3兼容对象存储（AWS S3、MinIO等）
+
+    ffmpeg 的输出通过管道直接写入分片上传，多个分片并行上传，
+    不在本地落地完整的输出文件
+    """
+
+    name = 's3'
+    streaming = True
+    # S3要求除最后一个分片外每个分片不小于5MB
+    MIN_PART_SIZE = 5 * 1024 * 1024
+
+    def __init__(self, download_dir: str, bucket: str, prefix: str = '',
+                 part_size: int = 8 * 1024 * 1024, concurrency: int = 4,
+                 delete_local_segments: bool = False, client: Any = None,
+                 **client_options: Any):
+        """
+        初始化S3输出存储
+
+        Args:
+            download_dir: 本地下载目录（片段所在位置）
+            bucket: 存储桶
+            prefix: 对象键前缀
+            part_size: 分片大小（字节）
+            concurrency: 并行上传的分片数
+            delete_local_segments: 上传提交后是否删除本地片段
+            client: 已创建的S3客户端，为空时使用boto3创建
+            client_options: 传给 boto3.client 的参数（endpoint_url、region_name等）
+        """
+        super().__init__(download_dir, delete_local_segments)
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.part_size = max(part_size, self.MIN_PART_SIZE)
+        self.concurrency = max(concurrency, 1)
+        if client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise Exception("使用S3输出存储需要安装boto3: pip install boto3")
+            client = boto3.client('s3', **client_options)
+        self.client = client
+
+    def key(self, filename: str) -> str:
+        """输出文件的对象键"""
+        return f'{self.prefix}/{filename}' if self.prefix else filename
+
+    def uri(self, filename: str) -> str:
+        return f's3://{self.bucket}/{self.key(filename)}'
+
+    def exists(self, filename: str) -> bool:
+        return self.size(filename) > 0
+
+    def size(self, filename: str) -> int:
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=self.key(filename))
+            return int(response.get('ContentLength', 0))
+        except Exception:
+            return 0
+
+    def open_writer(self, filename: str) -> OutputWriter:
+        return S3MultipartWriter(self.client, self.bucket, self.key(filename),
+                                 self.part_size, self.concurrency)
+
+
+class S3MultipartWriter(OutputWriter):
+    """
+    S3分片上传写入器
+
+    缓冲满一个分片就提交到线程池上传，同时上传的分片数受 concurrency 限制，
+    超出时 write 阻塞，从而对 ffmpeg 管道形成背压
+    """
+
+    def __init__(self, client: Any, bucket: str, key: str, part_size: int, concurrency: int):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self._buffer = bytearray()
+        self._size = 0
+        self._futures: List[Future] = []
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        response = client.create_multipart_upload(Bucket=bucket, Key=key)
+        self.upload_id = response['UploadId']
+
+    def write(self, data: bytes) -> None:
+        self._buffer += data
+        self._size += len(data)
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            self._submit(part)
+
+    def _submit(self, data: bytes) -> None:
+        """提交一个分片上传任务"""
+        # 先检查已完成的分片是否出错，尽早失败
+        for future in self._futures:
+            if future.done() and future.exception():
+                raise future.exception()
+        part_number = len(self._futures) + 1
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._upload_part, part_number, data)
+        except Exception:
+            self._slots.release()
+            raise
+        self._futures.append(future)
+
+    def _upload_part(self, part_number: int, data: bytes) -> Dict[str, Any]:
+        """上传单个分片"""
+        try:
+            response = self.client.upload_part(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                PartNumber=part_number, Body=data
+            )
+            return {'PartNumber': part_number, 'ETag': response['ETag']}
+        finally:
+            self._slots.release()
+
+    def commit(self) -> int:
+        try:
+            if self._buffer or not self._futures:
+                self._submit(bytes(self._buffer))
+                self._buffer = bytearray()
+            parts = [future.result() for future in self._futures]
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                MultipartUpload={'Parts': parts}
+            )
+            logger.info(f"分片上传完成: s3://{self.bucket}/{self.key} ({len(parts)} 个分片)")
+            return self._size
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def abort(self) -> None:
+        self._executor.shutdown(wait=True)
+        try:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+        except Exception as e:
+            logger.warning(f"取消分片上传失败: {str(e)}")
+
+
+def create_output_storage(download_dir: str, options: Optional[Dict[str, Any]] = None) -> OutputStorage:
+    """
+    根据配置创建输出存储
+
+    Args:
+        download_dir: 下载目录
+        options: 配置中的 output_storage 字段，为空时使用本地存储
+    """
+    options = dict(options or {})
+    storage_type = options.pop('type', 'local')
+    delete_local_segments = bool(options.pop('delete_local_segments', False))
+
+    if storage_type == 'local':
+        return OutputStorage(download_dir, delete_local_segments)
+    if storage_type == 's3':
+        bucket = options.pop('bucket', '')
+        if not bucket:
+            raise ValueError("output_storage.bucket 不能为空")
+        client_options = {}
+        for option, client_option in (('endpoint_url', 'endpoint_url'),
+                                      ('region', 'region_name'),
+                                      ('access_key', 'aws_access_key_id'),
+                                      ('secret_key', 'aws_secret_access_key')):
+            if options.get(option):
+                client_options[client_option] = options[option]
+        return S3OutputStorage(
+            download_dir, bucket,
+            prefix=options.get('prefix', ''),
+            part_size=int(options.get('part_size_mb', 8)) * 1024 * 1024,
+            concurrency=int(options.get('concurrency', 4)),
+            delete_local_segments=delete_local_segments,
+            **client_options
+        )
+    raise ValueError(f"未知的输出存储类型: {storage_type}")
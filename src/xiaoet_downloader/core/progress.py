@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, TextIO
+
+from ..models.segment import SegmentTable
+from ..models.video import VideoResource
+from ..utils.logger import logger
+
+
+def format_bytes(size: float) -> str:
+    """把字节数格式化为易读的字符串"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{int(size)} B"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    """把秒数格式化为 H:MM:SS，未知时返回 --:--"""
+    if seconds is None:
+        return '--:--'
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+@dataclass
+class VideoProgress:
+    """单个视频的下载进度"""
+    resource_id: str
+    title: str
+    total_segments: int
+    done_segments: int = 0
+    fetched_segments: int = 0
+    fetched_bytes: int = 0
+    # 平滑后的下载速度（字节/秒），在刷新时更新
+    rate: float = 0.0
+    sampled_bytes: int = 0
+    sampled: bool = False
+
+    @property
+    def remaining_segments(self) -> int:
+        return max(self.total_segments - self.done_segments, 0)
+
+    def eta(self, bytes_per_segment: float, rate: float) -> Optional[float]:
+        """预计剩余时间（秒），没有速度数据时返回None"""
+        if not self.remaining_segments:
+            return 0.0
+        if self.fetched_segments:
+            bytes_per_segment = self.fetched_bytes / self.fetched_segments
+        rate = self.rate or rate
+        if rate <= 0 or bytes_per_segment <= 0:
+            return None
+        return self.remaining_segments * bytes_per_segment / rate
+
+    def to_dict(self, bytes_per_segment: float = 0.0, rate: float = 0.0) -> Dict[str, Any]:
+        return {
+            'resource_id': self.resource_id,
+            'title': self.title,
+            'completed_segments': self.done_segments,
+            'total_segments': self.total_segments,
+            'downloaded_bytes': self.fetched_bytes,
+            'throughput': round(self.rate, 1),
+            'eta': self.eta(bytes_per_segment, rate),
+        }
+
+
+class ProgressTracker:
+    """
+    下载进度汇总
+
+    汇总所有下载线程的字节数、片段数和视频数。每个片段的进度更新只修改
+    几个计数器（O(1)，与线程数和片段数无关），吞吐量（指数加权平滑）和
+    预计剩余时间在后台线程中按固定间隔计算；终端中显示进度条，
+    输出不是终端时（如重定向到文件）定期输出一行日志
+    """
+
+    def __init__(self, total_videos: int = 0, stream: Optional[TextIO] = None,
+                 interval: Optional[float] = None, render: bool = True, alpha: float = 0.3):
+        """
+        初始化进度汇总
+
+        Args:
+            total_videos: 预计处理的视频总数
+            stream: 进度条输出流，默认为标准错误
+            interval: 刷新间隔（秒），默认终端中0.5秒，否则30秒
+            render: 是否输出进度，False时只计算（如守护模式的状态接口）
+            alpha: 吞吐量平滑系数
+        """
+        self.stream = stream or sys.stderr
+        self.tty = render and hasattr(self.stream, 'isatty') and self.stream.isatty()
+        self.interval = interval or (0.5 if self.tty else 30.0)
+        self.render = render
+        self.alpha = alpha
+
+        self.total_videos = total_videos
+        self.finished_videos = 0
+        self.failed_videos = 0
+        self.started_videos = 0
+        self.known_segments = 0
+        self.done_segments = 0
+        self.abandoned_segments = 0
+        self.fetched_segments = 0
+        self.fetched_bytes = 0
+        self.rate = 0.0
+
+        self._videos: Dict[str, VideoProgress] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._sampled_at: Optional[float] = None
+        self._sampled_bytes = 0
+        self._rated = False
+        self._rendered_bytes = -1
+        self._bar_visible = False
+
+    def update(self, resource: VideoResource, table: SegmentTable, fetched: int = 0) -> None:
+        """
+        记录一个片段处理完成
+
+        Args:
+            resource: 视频资源
+            table: 视频的片段表
+            fetched: 本片段从网络下载的字节数，缓存或去重复用时为0
+        """
+        with self._lock:
+            video = self._videos.get(resource.resource_id)
+            if video is None:
+                video = VideoProgress(resource.resource_id, resource.title, len(table))
+                self._videos[resource.resource_id] = video
+                self.started_videos += 1
+                self.known_segments += len(table)
+            done = table.completed_count
+            self.done_segments += done - video.done_segments
+            video.done_segments = done
+            if fetched:
+                video.fetched_segments += 1
+                video.fetched_bytes += fetched
+                self.fetched_segments += 1
+                self.fetched_bytes += fetched
+
+    def finish_video(self, resource: VideoResource, success: bool) -> None:
+        """记录一个视频处理结束"""
+        with self._lock:
+            video = self._videos.pop(resource.resource_id, None)
+            if video is not None:
+                # 未完成的片段不再计入剩余量
+                self.abandoned_segments += video.remaining_segments
+            self.finished_videos += 1
+            if not success:
+                self.failed_videos += 1
+
+    def add_videos(self, count: int) -> None:
+        """增加预计处理的视频数（守护模式发现新资源时）"""
+        with self._lock:
+            self.total_videos += count
+
+    @property
+    def bytes_per_segment(self) -> float:
+        """已下载片段的平均大小"""
+        return self.fetched_bytes / self.fetched_segments if self.fetched_segments else 0.0
+
+    def course_eta(self) -> Optional[float]:
+        """整个队列的预计剩余时间（秒），没有足够数据时返回None"""
+        with self._lock:
+            return self._course_eta()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """当前进度"""
+        with self._lock:
+            bytes_per_segment = self.bytes_per_segment
+            return {
+                'total_videos': self.total_videos,
+                'finished_videos': self.finished_videos,
+                'failed_videos': self.failed_videos,
+                'completed_segments': self.done_segments,
+                'downloaded_bytes': self.fetched_bytes,
+                'throughput': round(self.rate, 1),
+                'eta': self._course_eta(),
+                'active': [video.to_dict(bytes_per_segment, self.rate) for video in self._videos.values()],
+            }
+
+    def sample(self, now: Optional[float] = None) -> None:
+        """按距上次采样的字节增量更新平滑吞吐量（由刷新线程定期调用）"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self._sampled_at is None:
+                self._sampled_at = now
+                self._sampled_bytes = self.fetched_bytes
+                for video in self._videos.values():
+                    video.sampled_bytes = video.fetched_bytes
+                return
+            elapsed = now - self._sampled_at
+            if elapsed <= 0:
+                return
+            self.rate = self._smooth(self.rate, (self.fetched_bytes - self._sampled_bytes) / elapsed,
+                                     self._rated)
+            self._rated = True
+            self._sampled_at = now
+            self._sampled_bytes = self.fetched_bytes
+            for video in self._videos.values():
+                video.rate = self._smooth(video.rate, (video.fetched_bytes - video.sampled_bytes) / elapsed,
+                                          video.sampled)
+                video.sampled = True
+                video.sampled_bytes = video.fetched_bytes
+
+    def start(self) -> 'ProgressTracker':
+        """启动后台刷新线程"""
+        if self._thread is None:
+            if self.tty:
+                logger.add_console_filter(self._clear_bar)
+            self._thread = threading.Thread(target=self._run, name='xiaoet-progress', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """停止刷新，终端中保留最后一次的进度条"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.sample()
+        self._render(final=True)
+        if self.tty:
+            logger.remove_console_filter(self._clear_bar)
+
+    def format_line(self) -> str:
+        """格式化一行进度"""
+        snapshot = self.snapshot()
+        parts = [
+            f"视频 {snapshot['finished_videos']}/{snapshot['total_videos']}",
+            f"片段 {snapshot['completed_segments']}",
+            format_bytes(snapshot['downloaded_bytes']),
+            f"{format_bytes(snapshot['throughput'])}/s",
+        ]
+        for video in snapshot['active'][:1]:
+            parts.append(f"当前 {video['completed_segments']}/{video['total_segments']} "
+                         f"剩余 {format_duration(video['eta'])}")
+        parts.append(f"总剩余 {format_duration(snapshot['eta'])}")
+        return ' | '.join(parts)
+
+    def _course_eta(self) -> Optional[float]:
+        remaining = self.known_segments - self.done_segments - self.abandoned_segments
+        pending = self.total_videos - self.finished_videos - len(self._videos)
+        if pending > 0:
+            if not self.started_videos:
+                return None
+            remaining += pending * self.known_segments / self.started_videos
+        if remaining <= 0:
+            return 0.0
+        if self.rate <= 0 or not self.fetched_segments:
+            return None
+        return remaining * self.bytes_per_segment / self.rate
+
+    def _smooth(self, current: float, sample: float, initialized: bool) -> float:
+        return self.alpha * sample + (1 - self.alpha) * current if initialized else sample
+
+    def _run(self) -> None:
+        self.sample()
+        while not self._stop.wait(self.interval):
+            self.sample()
+            self._render()
+
+    def _render(self, final: bool = False) -> None:
+        if not self.render:
+            return
+        if self.tty:
+            line = self._bar() + ' ' + self.format_line()
+            self.stream.write('\r\x1b[K' + line + ('\n' if final else ''))
+            self.stream.flush()
+            self._bar_visible = not final
+        elif final or self.fetched_bytes != self._rendered_bytes:
+            # 没有新进度时不重复输出
+            self._rendered_bytes = self.fetched_bytes
+            logger.info(f"进度: {self.format_line()}")
+
+    def _bar(self, width: int = 20) -> str:
+        with self._lock:
+            total = self.known_segments - self.abandoned_segments
+            pending = self.total_videos - self.finished_videos - len(self._videos)
+            if pending > 0 and self.started_videos:
+                total += pending * self.known_segments / self.started_videos
+            ratio = min(self.done_segments / total, 1.0) if total > 0 else 0.0
+        filled = int(ratio * width)
+        return f"[{'#' * filled}{'.' * (width - filled)}] {ratio:4.0%}"
+
+    def _clear_bar(self, record) -> bool:
+        """输出日志前清除终端中的进度条，下次刷新时重新绘制"""
+        if self._bar_visible:
+            self.stream.write('\r\x1b[K')
+            self._bar_visible = False
+        return True
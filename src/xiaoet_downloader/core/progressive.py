@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+from typing import List, Optional, TextIO
+
+from .segment_store import SegmentStore
+from ..utils.m3u8_utils import M3U8Utils
+from ..utils.logger import logger
+
+
+# 属于单个片段的标签，出现在该片段的URI之前
+SEGMENT_TAGS = ('#EXTINF', '#EXT-X-BYTERANGE', '#EXT-X-DISCONTINUITY', '#EXT-X-KEY',
+                '#EXT-X-PROGRAM-DATE-TIME', '#EXT-X-MAP', '#EXT-X-GAP')
+
+
+class ProgressiveOutput:
+    """
+    边下载边输出
+
+    从第一个片段开始，每当连续的一段片段下载完成就立即追加到输出：
+    - live.m3u8：EVENT类型的本地播放列表，播放器可以边下载边播放，
+      全部完成后追加 #EXT-X-ENDLIST
+    - 输出TS文件：按顺序拼接片段。TS流拼接后仍然是有效的TS，
+      文件在下载过程中始终可以播放，完成后不需要再合并一次。
+      加密的播放列表（EXT-X-KEY）片段需要解密，只输出live.m3u8
+    """
+
+    LIVE_PLAYLIST = 'live.m3u8'
+
+    def __init__(self, resource_dir: str, playlist_text: str, store: SegmentStore,
+                 output_path: Optional[str] = None):
+        """
+        初始化边下载边输出
+
+        Args:
+            resource_dir: 资源目录
+            playlist_text: 原始播放列表
+            store: 片段存储（已打开）
+            output_path: 输出TS文件路径，为空时只输出live.m3u8
+        """
+        self.store = store
+        self.live_path = os.path.join(resource_dir, self.LIVE_PLAYLIST)
+        self.header: List[str] = []
+        self.blocks: List[List[str]] = []
+        self.uris: List[str] = []
+        self._parse(playlist_text)
+        self.encrypted = any(line.startswith('#EXT-X-KEY') and 'METHOD=NONE' not in line
+                             for line in self.header + [tag for block in self.blocks for tag in block])
+        if output_path and self.encrypted:
+            logger.info("播放列表已加密，边下载边输出只生成live.m3u8，下载完成后再合并")
+            output_path = None
+        self.output_path = output_path
+        self.next_index = 0
+        self.output_size = 0
+        self._ready = bytearray(len(self.uris))
+        self._live: Optional[TextIO] = None
+        self._output = None
+
+    @property
+    def complete(self) -> bool:
+        """是否所有片段都已输出"""
+        return self.next_index >= len(self.uris)
+
+    def open(self) -> None:
+        """创建live.m3u8和输出文件（重新开始，已缓存的片段会依次重新追加）"""
+        self._live = open(self.live_path, 'w', encoding='utf-8')
+        self._live.write('\n'.join(self.header + ['#EXT-X-PLAYLIST-TYPE:EVENT']) + '\n')
+        self._live.flush()
+        if self.output_path:
+            self._output = open(self.output_path, 'wb')
+
+    def segment_ready(self, index: int) -> int:
+        """
+        记录片段已写入存储，把从当前位置开始连续可用的片段追加到输出
+
+        Returns:
+            int: 本次追加的片段数
+        """
+        self._ready[index] = 1
+        appended = 0
+        while self.next_index < len(self.uris) and self._ready[self.next_index]:
+            self._append(self.next_index)
+            self.next_index += 1
+            appended += 1
+        if appended:
+            self._live.flush()
+            if self._output:
+                self._output.flush()
+        return appended
+
+    def close(self) -> Optional[str]:
+        """
+        结束输出，全部片段都已输出时结束播放列表
+
+        Returns:
+            Optional[str]: 完整的输出TS文件路径，没有输出或不完整时返回None
+        """
+        if self._live:
+            if self.complete:
+                self._live.write('#EXT-X-ENDLIST\n')
+            self._live.close()
+            self._live = None
+        if self._output:
+            self._output.close()
+            self._output = None
+            if self.complete:
+                return self.output_path
+        return None
+
+    def _append(self, index: int) -> None:
+        lines = self.blocks[index] + [self.store.playlist_entry(index, self.uris[index])]
+        self._live.write('\n'.join(lines) + '\n')
+        if self._output:
+            data = self.store.read(index)
+            self._output.write(data)
+            self.output_size += len(data)
+        if index == 0:
+            logger.info(f"可以开始播放: {self.output_path or self.live_path}")
+
+    def _parse(self, playlist_text: str) -> None:
+        """把播放列表拆分为头部标签和每个片段的标签块"""
+        block: List[str] = []
+        for raw_line in playlist_text.splitlines():
+            line = raw_line.strip()
+            if not line or line.startswith(('#EXT-X-ENDLIST', '#EXT-X-PLAYLIST-TYPE')):
+                continue
+            if M3U8Utils.is_uri_line(line):
+                self.blocks.append(block)
+                self.uris.append(line)
+                block = []
+            elif self.uris or line.startswith(SEGMENT_TAGS):
+                block.append(line)
+            else:
+                self.header.append(line)
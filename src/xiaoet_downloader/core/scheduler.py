@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from ..models.video import VideoResource
+from ..utils.file_utils import FileUtils
+from ..utils.logger import logger
+
+
+@dataclass
+class ScheduleItem:
+    """调度队列中的一项"""
+    position: int
+    resource: VideoResource
+    segment_count: Optional[int] = None
+    duration: float = 0.0
+    cached_segments: int = 0
+
+    @property
+    def remaining_duration(self) -> Optional[float]:
+        """估算剩余需要下载的时长（按已缓存片段比例折算）"""
+        if not self.segment_count:
+            return None
+        remaining = max(self.segment_count - self.cached_segments, 0)
+        return self.duration * remaining / self.segment_count
+
+
+class SchedulePolicy:
+    """资源排序策略基类，默认保持课程目录顺序"""
+
+    name = 'catalogue'
+    # 是否需要预读播放列表（片段数、时长）
+    needs_preread = False
+
+    def order(self, items: List[ScheduleItem]) -> List[ScheduleItem]:
+        """返回排序后的队列"""
+        return sorted(items, key=lambda item: item.position)
+
+
+class ShortestFirstPolicy(SchedulePolicy):
+    """按片段数从少到多排序，预读失败的资源排在最后"""
+
+    name = 'shortest'
+    needs_preread = True
+
+    def order(self, items: List[ScheduleItem]) -> List[ScheduleItem]:
+        return sorted(items, key=lambda item: (
+            item.segment_count is None, item.segment_count or 0, item.position
+        ))
+
+
+class NewestFirstPolicy(SchedulePolicy):
+    """按发布时间从新到旧排序，没有发布时间的资源保持目录顺序排在最后"""
+
+    name = 'newest'
+
+    def order(self, items: List[ScheduleItem]) -> List[ScheduleItem]:
+        dated = [item for item in items if item.resource.published_at]
+        undated = [item for item in items if not item.resource.published_at]
+        dated.sort(key=lambda item: item.position)
+        dated.sort(key=lambda item: item.resource.published_at, reverse=True)
+        return dated + sorted(undated, key=lambda item: item.position)
+
+
+class PriorityListPolicy(SchedulePolicy):
+    """按显式给定的资源ID优先级排序，未列出的资源保持目录顺序排在后面"""
+
+    name = 'priority'
+
+    def __init__(self, priority_ids: Sequence[str]):
+        self.ranks = {resource_id: rank for rank, resource_id in enumerate(priority_ids)}
+
+    def order(self, items: List[ScheduleItem]) -> List[ScheduleItem]:
+        unlisted = len(self.ranks)
+        return sorted(items, key=lambda item: (
+            self.ranks.get(item.resource.resource_id, unlisted), item.position
+        ))
+
+
+class ThroughputPolicy(SchedulePolicy):
+    """
+    最大化单位时间内完成的视频数
+
+    按估算的剩余下载量（总时长扣除已缓存片段）从小到大排序，
+    即最短剩余处理时间优先
+    """
+
+    name = 'throughput'
+    needs_preread = True
+
+    def order(self, items: List[ScheduleItem]) -> List[ScheduleItem]:
+        def key(item: ScheduleItem) -> Tuple[bool, float, int]:
+            remaining = item.remaining_duration
+            return remaining is None, remaining or 0.0, item.position
+        return sorted(items, key=key)
+
+
+POLICIES = {
+    policy.name: policy
+    for policy in (SchedulePolicy, ShortestFirstPolicy, NewestFirstPolicy, ThroughputPolicy)
+}
+POLICY_NAMES = list(POLICIES) + [PriorityListPolicy.name]
+
+
+def create_policy(name: str, priority_ids: Optional[Sequence[str]] = None) -> SchedulePolicy:
+    """根据名称创建排序策略"""
+    if name == PriorityListPolicy.name:
+        return PriorityListPolicy(priority_ids or [])
+    if name not in POLICIES:
+        raise ValueError(f"未知的排序策略: {name}")
+    return POLICIES[name]()
+
+
+class CourseScheduler:
+    """课程资源调度器"""
+
+    def __init__(self, policy: Optional[SchedulePolicy] = None):
+        """初始化调度器"""
+        self.policy = policy or SchedulePolicy()
+
+    def plan(self, resources: List[VideoResource],
+             prereader: Callable[[VideoResource], Optional[Tuple[int, float]]],
+             download_dir: str) -> List[ScheduleItem]:
+        """
+        生成下载队列
+
+        Args:
+            resources: 按课程目录顺序排列的资源
+            prereader: 预读播放列表的回调，返回 (片段数, 总时长)，失败返回None
+            download_dir: 下载目录，用于统计已缓存的片段
+
+        Returns:
+            List[ScheduleItem]: 排序后的下载队列
+        """
+        items = [ScheduleItem(position, resource) for position, resource in enumerate(resources)]
+
+        if self.policy.needs_preread:
+            logger.info(f"预读播放列表以按 {self.policy.name} 策略排序...")
+            for item in items:
+                summary = prereader(item.resource)
+                if summary:
+                    item.segment_count, item.duration = summary
+                item.cached_segments = self._count_cached_segments(
+                    os.path.join(download_dir, item.resource.resource_id)
+                )
+
+        return self.policy.order(items)
+
+    @staticmethod
+    def _count_cached_segments(resource_dir: str) -> int:
+        """统计资源目录中已下载的片段数（只用于排序，不逐个获取文件大小）"""
+        return len(FileUtils.scan_dir(resource_dir, suffix='.ts'))
@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import mmap
+import os
+import threading
+from array import array
+from typing import Dict, Iterator, Optional, Tuple
+
+from ..utils.file_utils import FileUtils
+
+
+class SegmentStore:
+    """
+    片段存储：每个片段一个 v_N.ts 文件
+
+    写入时先写临时文件再重命名，目录中的 v_N.ts 总是完整的片段。缓存检查使用
+    一次目录扫描建立的 {文件名: 大小} 索引，复用片段时不再逐个获取文件大小
+    """
+
+    layout = 'files'
+
+    def __init__(self, resource_dir: str, total_segments: int):
+        """初始化片段存储"""
+        self.resource_dir = resource_dir
+        self.total_segments = total_segments
+        self._cached: Dict[str, int] = {}
+
+    def open(self, nocache: bool = False) -> None:
+        """打开存储并加载已缓存片段的索引"""
+        self._cached = {} if nocache else FileUtils.scan_file_sizes(self.resource_dir, suffix='.ts')
+
+    def close(self) -> None:
+        """关闭存储，持久化索引"""
+
+    def segment_name(self, index: int) -> str:
+        """片段的显示名称"""
+        return f'v_{index}.ts'
+
+    def cached_size(self, index: int) -> int:
+        """已缓存片段的大小，未缓存返回0"""
+        return self._cached.get(self.segment_name(index), 0)
+
+    def has_segment(self, index: int) -> bool:
+        """片段是否已缓存"""
+        return self.segment_name(index) in self._cached
+
+    def segment_path(self, index: int) -> Optional[str]:
+        """片段的独立文件路径，没有独立文件时返回None"""
+        return os.path.join(self.resource_dir, self.segment_name(index))
+
+    def write(self, index: int, data: bytes) -> int:
+        """写入片段数据，返回写入的字节数"""
+        ts_file = self.segment_path(index)
+        # 写入临时文件，下载完成后重命名
+        temp_file = ts_file + '.tmp'
+        with open(temp_file, 'wb') as f:
+            f.write(data)
+        os.replace(temp_file, ts_file)
+        return len(data)
+
+    def read(self, index: int) -> bytes:
+        """读取已写入的片段数据"""
+        with open(self.segment_path(index), 'rb') as f:
+            return f.read()
+
+    def playlist_entry(self, index: int, uri: str) -> str:
+        """本地m3u8中代替原始URI的条目"""
+        return self.segment_name(index)
+
+    def remove(self) -> None:
+        """删除所有片段数据"""
+        for name in FileUtils.scan_dir(self.resource_dir, suffix='.ts'):
+            FileUtils.remove_file_safely(os.path.join(self.resource_dir, name))
+
+
+class PackedSegmentStore(SegmentStore):
+    """
+    打包片段存储：每个视频一个预分配的容器文件加一个偏移索引
+
+    片段按到达顺序分配偏移后用 pwrite 写入 segments.pack，
+    索引 segments.idx 为 (偏移, 长度) 的 int64 数组，未写入的片段为 -1。
+    本地m3u8使用 #EXT-X-BYTERANGE 引用容器文件，
+    按顺序写入时合并就是对容器文件的一次顺序读取。
+    """
+
+    layout = 'packed'
+    PACK_FILE = 'segments.pack'
+    INDEX_FILE = 'segments.idx'
+    # 写入多少个片段后持久化一次索引
+    FLUSH_INTERVAL = 32
+
+    def __init__(self, resource_dir: str, total_segments: int):
+        super().__init__(resource_dir, total_segments)
+        self.pack_file = os.path.join(resource_dir, self.PACK_FILE)
+        self.index_file = os.path.join(resource_dir, self.INDEX_FILE)
+        self._entries = array('q', [-1]) * (2 * total_segments)
+        self._fd: Optional[int] = None
+        self._lock = threading.Lock()
+        self._cursor = 0
+        self._preallocated = 0
+        self._written = 0
+        self._unflushed = 0
+
+    def open(self, nocache: bool = False) -> None:
+        """打开容器文件并加载偏移索引"""
+        self._fd = os.open(self.pack_file, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+        if nocache:
+            os.ftruncate(self._fd, 0)
+            FileUtils.remove_file_safely(self.index_file)
+            return
+
+        entries = array('q')
+        try:
+            with open(self.index_file, 'rb') as f:
+                entries.frombytes(f.read())
+        except (OSError, ValueError):
+            return
+        if len(entries) != len(self._entries):
+            return
+
+        pack_size = os.fstat(self._fd).st_size
+        for index in range(self.total_segments):
+            offset, length = entries[2 * index], entries[2 * index + 1]
+            if offset >= 0 and length > 0 and offset + length <= pack_size:
+                self._entries[2 * index] = offset
+                self._entries[2 * index + 1] = length
+                self._cursor = max(self._cursor, offset + length)
+                self._written += 1
+        self._preallocated = pack_size
+
+    def close(self) -> None:
+        """持久化索引并关闭容器文件"""
+        if self._fd is None:
+            return
+        self.flush()
+        # 去掉预分配但未使用的尾部空间
+        if self._preallocated > self._cursor:
+            os.ftruncate(self._fd, self._cursor)
+            self._preallocated = self._cursor
+        os.close(self._fd)
+        self._fd = None
+
+    def flush(self) -> None:
+        """原子地持久化偏移索引"""
+        with self._lock:
+            data = self._entries.tobytes()
+            self._unflushed = 0
+        temp_file = self.index_file + '.tmp'
+        with open(temp_file, 'wb') as f:
+            f.write(data)
+        os.replace(temp_file, self.index_file)
+
+    def segment_name(self, index: int) -> str:
+        return f'{self.PACK_FILE}#{index}'
+
+    def segment_path(self, index: int) -> Optional[str]:
+        return None
+
+    def cached_size(self, index: int) -> int:
+        length = self._entries[2 * index + 1]
+        return length if length > 0 else 0
+
+    def has_segment(self, index: int) -> bool:
+        return self._entries[2 * index + 1] > 0
+
+    def entry(self, index: int) -> Tuple[int, int]:
+        """片段在容器文件中的 (偏移, 长度)"""
+        return self._entries[2 * index], self._entries[2 * index + 1]
+
+    def read(self, index: int) -> bytes:
+        """从容器文件中读取片段数据（存储打开期间）"""
+        offset, length = self.entry(index)
+        if length <= 0:
+            raise FileNotFoundError(f"片段 {index} 尚未写入")
+        if hasattr(os, 'pread'):
+            return os.pread(self._fd, length, offset)
+        with self._lock:
+            os.lseek(self._fd, offset, os.SEEK_SET)
+            return os.read(self._fd, length)
+
+    def write(self, index: int, data: bytes) -> int:
+        """在新分配的偏移处写入片段数据"""
+        length = len(data)
+        with self._lock:
+            offset = self._cursor
+            self._cursor += length
+            if self._cursor > self._preallocated:
+                self._preallocate(length)
+
+        self._pwrite(data, offset)
+
+        with self._lock:
+            self._entries[2 * index] = offset
+            self._entries[2 * index + 1] = length
+            self._written += 1
+            self._unflushed += 1
+            need_flush = self._unflushed >= self.FLUSH_INTERVAL
+        if need_flush:
+            self.flush()
+        return length
+
+    def _preallocate(self, segment_size: int) -> None:
+        """按当前片段大小估算剩余片段所需空间并预分配（调用方持有锁）"""
+        remaining = self.total_segments - self._written - 1
+        target = self._cursor + segment_size * max(remaining, 0)
+        if hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(self._fd, self._preallocated, target - self._preallocated)
+            except OSError:
+                os.ftruncate(self._fd, target)
+        else:
+            os.ftruncate(self._fd, target)
+        self._preallocated = target
+
+    def _pwrite(self, data: bytes, offset: int) -> None:
+        """在指定偏移写入数据"""
+        view = memoryview(data)
+        while view:
+            if hasattr(os, 'pwrite'):
+                written = os.pwrite(self._fd, view, offset)
+            else:
+                with self._lock:
+                    os.lseek(self._fd, offset, os.SEEK_SET)
+                    written = os.write(self._fd, view)
+            view = view[written:]
+            offset += written
+
+    def playlist_entry(self, index: int, uri: str) -> str:
+        """使用字节范围引用容器文件，未下载的片段保留原始URI"""
+        offset, length = self.entry(index)
+        if length <= 0:
+            return uri
+        return f'#EXT-X-BYTERANGE:{length}@{offset}\n{self.PACK_FILE}'
+
+    def iter_segments(self) -> Iterator[Tuple[int, memoryview]]:
+        """通过内存映射按序遍历已写入的片段数据"""
+        if not os.path.exists(self.pack_file) or FileUtils.get_file_size(self.pack_file) == 0:
+            return
+        with open(self.pack_file, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for index in range(self.total_segments):
+                        offset, length = self.entry(index)
+                        if length > 0:
+                            segment = view[offset:offset + length]
+                            try:
+                                yield index, segment
+                            finally:
+                                segment.release()
+                finally:
+                    view.release()
+
+    def remove(self) -> None:
+        """删除容器文件和索引"""
+        FileUtils.remove_file_safely(self.pack_file)
+        FileUtils.remove_file_safely(self.index_file)
+
+
+SEGMENT_LAYOUTS = {
+    SegmentStore.layout: SegmentStore,
+    PackedSegmentStore.layout: PackedSegmentStore,
+}
+
+
+def create_segment_store(layout: str, resource_dir: str, total_segments: int) -> SegmentStore:
+    """根据存储布局创建片段存储"""
+    if layout not in SEGMENT_LAYOUTS:
+        raise ValueError(f"未知的片段存储布局: {layout}")
+    return SEGMENT_LAYOUTS[layout](resource_dir, total_segments)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from ..models.config import XiaoetConfig
+from ..utils.logger import logger
+
+
+class AuthExpiredError(Exception):
+    """登录状态（cookie）已失效"""
+
+
+# 接口返回消息中表示未登录的关键字
+LOGIN_KEYWORDS = ('登录', '登陆', 'login', '未授权', 'unauthorized')
+
+
+def check_auth_response(response: Any, body: Optional[dict] = None) -> None:
+    """
+    检查API响应是否表示登录状态已失效，是则抛出AuthExpiredError
+
+    判断依据：HTTP 401/403、被重定向到登录页、业务错误消息中包含登录相关的关键字
+    """
+    status_code = getattr(response, 'status_code', 200)
+    if status_code in (401, 403):
+        raise AuthExpiredError(f"HTTP {status_code}")
+    url = str(getattr(response, 'url', '') or '')
+    history = getattr(response, 'history', None) or []
+    if history and 'login' in url.lower():
+        raise AuthExpiredError(f"请求被重定向到登录页: {url}")
+    location = str((getattr(response, 'headers', None) or {}).get('location', ''))
+    if 300 <= status_code < 400 and 'login' in location.lower():
+        raise AuthExpiredError(f"请求被重定向到登录页: {location}")
+    if isinstance(body, dict) and body.get('code') not in (0, None, '0'):
+        message = str(body.get('msg') or body.get('message') or '')
+        if any(keyword in message.lower() for keyword in LOGIN_KEYWORDS):
+            raise AuthExpiredError(f"{message} (code={body.get('code')})")
+
+
+class SessionHealthMonitor:
+    """
+    登录状态监控
+
+    API响应明确表示未登录时由客户端直接抛出AuthExpiredError；接口返回空数据
+    （cookie失效的常见表现，但也可能只是单个资源没有数据）时用一次导航接口
+    请求确认。确认失效后下载流程暂停：没有配置等待时间时立即结束运行，
+    否则等待配置文件中的cookie被更新，重新加载并验证后继续
+    """
+
+    def __init__(self, config: XiaoetConfig, probe: Callable[[], bool],
+                 config_path: Optional[str] = None, reload_timeout: Optional[float] = 0,
+                 poll_interval: float = 5.0):
+        """
+        初始化登录状态监控
+
+        Args:
+            config: 运行中使用的配置，重新加载时原地更新cookie
+            probe: 检查登录状态的回调，登录有效时返回True
+            config_path: 配置文件路径，用于重新加载cookie
+            reload_timeout: 登录失效后等待配置文件更新的秒数，0表示不等待，None表示一直等待
+            poll_interval: 检查配置文件的间隔（秒）
+        """
+        self.config = config
+        self.probe = probe
+        self.config_path = config_path
+        self.reload_timeout = reload_timeout
+        self.poll_interval = poll_interval
+        self.expirations = 0
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+
+    def suspect(self, reason: str) -> None:
+        """
+        接口返回了空数据，确认登录状态，已失效时抛出AuthExpiredError
+        """
+        try:
+            healthy = self.probe()
+        except AuthExpiredError:
+            healthy = False
+        except Exception as e:
+            # 网络错误等不能说明登录失效
+            logger.debug(f"检查登录状态时出错: {str(e)}")
+            return
+        if not healthy:
+            raise AuthExpiredError(reason)
+
+    def wait_for_credentials(self, error: AuthExpiredError) -> bool:
+        """
+        登录失效后等待配置文件中的cookie被更新
+
+        Returns:
+            bool: 新的cookie已加载并验证有效时返回True
+        """
+        generation = self.reloads
+        with self._lock:
+            self.expirations += 1
+            if self.reloads != generation:
+                # 其他线程等待期间已经更新了凭据
+                return True
+            if not self.config_path or self.reload_timeout == 0:
+                return False
+
+            logger.warning(f"登录状态已失效（{error}），请更新 {self.config_path} 中的cookie，"
+                           f"更新后自动继续")
+            deadline = None if self.reload_timeout is None else time.monotonic() + self.reload_timeout
+            # 配置文件可能已经更新过，先尝试一次
+            last_mtime = self._mtime()
+            reloaded = self._reload()
+            while not reloaded and (deadline is None or time.monotonic() < deadline):
+                if self._cancel.wait(self.poll_interval):
+                    return False
+                mtime = self._mtime()
+                if mtime != last_mtime:
+                    last_mtime = mtime
+                    reloaded = self._reload()
+            if reloaded:
+                self.reloads += 1
+                logger.info("已重新加载cookie，登录状态有效，继续运行")
+                return True
+            logger.error("等待cookie更新超时")
+            return False
+
+    def cancel(self) -> None:
+        """停止等待（进程退出时）"""
+        self._cancel.set()
+
+    def _mtime(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.config_path)
+        except OSError:
+            return None
+
+    def _reload(self) -> bool:
+        """从配置文件加载新的cookie并验证"""
+        try:
+            fresh = XiaoetConfig.from_file(self.config_path)
+        except Exception as e:
+            logger.warning(f"重新加载配置失败: {str(e)}")
+            return False
+        if fresh.cookie == self.config.cookie:
+            return False
+        self.config.cookie = fresh.cookie
+        try:
+            if self.probe():
+                return True
+        except Exception as e:
+            logger.debug(f"验证新的cookie时出错: {str(e)}")
+        logger.warning("新的cookie仍然无效，继续等待")
+        return False
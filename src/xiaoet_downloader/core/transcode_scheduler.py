@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import copy
+import os
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from .transcoder import VideoTranscoder
+from ..models.video import DownloadResult, VideoResource
+from ..utils.logger import logger
+
+
+def build_priority_prefix(nice: Optional[int] = None, ionice: bool = False) -> List[str]:
+    """
+    构建降低ffmpeg进程优先级的命令前缀
+
+    Args:
+        nice: CPU调度优先级（nice值），为空表示不调整
+        ionice: 是否把IO调度类设为idle（仅Linux）
+
+    Returns:
+        List[str]: 命令前缀，系统不支持时对应部分为空
+    """
+    prefix = []
+    if sys.platform.startswith('win'):
+        return prefix
+    if ionice:
+        if shutil.which('ionice'):
+            prefix += ['ionice', '-c', '3']
+        else:
+            logger.warning("未找到ionice命令，忽略IO优先级设置")
+    if nice is not None:
+        if shutil.which('nice'):
+            prefix += ['nice', '-n', str(nice)]
+        else:
+            logger.warning("未找到nice命令，忽略CPU优先级设置")
+    return prefix
+
+
+class TranscodeScheduler:
+    """
+    批量转码调度器
+
+    多个ffmpeg任务并行执行。流复制合并主要受磁盘带宽限制，重编码主要受CPU限制，
+    因此并发数取CPU核数与IO并发上限中的较小值；重编码时每个视频再分块并行，
+    CPU并发在同时转码的视频之间平分
+    """
+
+    # 默认同时读写磁盘的任务数
+    DEFAULT_IO_JOBS = 4
+
+    def __init__(self, transcoder: VideoTranscoder, max_jobs: Optional[int] = None,
+                 io_jobs: Optional[int] = None, nice: Optional[int] = None,
+                 ionice: bool = False):
+        """
+        初始化批量转码调度器
+
+        Args:
+            transcoder: 转码器，复制其设置（输出存储、片段布局、只保留音频等）
+            max_jobs: CPU并发上限，默认为CPU核数
+            io_jobs: 磁盘并发上限
+            nice: ffmpeg进程的nice值
+            ionice: 是否以idle IO优先级运行ffmpeg
+        """
+        cpu_jobs = max_jobs or os.cpu_count() or 1
+        self.jobs = max(1, min(cpu_jobs, io_jobs or self.DEFAULT_IO_JOBS))
+        # 复制转码器保留其全部设置，并共享同一个输出存储和输出索引
+        self.transcoder = copy.copy(transcoder)
+        self.transcoder.command_prefix = transcoder.command_prefix + build_priority_prefix(nice, ionice)
+        self.transcoder.encode_jobs = max(1, cpu_jobs // self.jobs)
+
+    def run(self, resources: Optional[List[VideoResource]] = None) -> Dict[str, List[DownloadResult]]:
+        """
+        并行转码
+
+        Args:
+            resources: 要转码的资源，默认扫描下载目录中所有已下载的资源
+
+        Returns:
+            Dict[str, List[DownloadResult]]: 转码结果统计
+        """
+        if resources is None:
+            resources = self.transcoder.find_downloaded_resources()
+
+        results = {
+            'success': [],
+            'failed': []
+        }
+        if not resources:
+            logger.warning("没有找到可转码的资源")
+            return results
+
+        logger.info(f"开始批量转码 {len(resources)} 个视频，并发数 {self.jobs}")
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            for result in executor.map(self._transcode, resources):
+                if result.success:
+                    results['success'].append(result)
+                else:
+                    results['failed'].append(result)
+        return results
+
+    def _transcode(self, resource: VideoResource) -> DownloadResult:
+        """转码单个资源，异常转换为失败结果"""
+        try:
+            return self.transcoder.transcode_video(resource)
+        except Exception as e:
+            error_msg = f"转码视频 {resource.title} 时出错: {str(e)}"
+            logger.error(error_msg)
+            return DownloadResult(resource, False, error_msg)
@@ -1,11 +1,22 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import hashlib
 import os
+import shlex
+import shutil
+import subprocess
+import tempfile
 import ffmpy
-from typing import Optional
+from typing import List, Optional, Tuple
 
-from ..models.video import VideoResource, VideoMetadata, DownloadResult, DownloadStatus
+from .encoder import EncodeProfile, ParallelEncoder
+from .output_index import OutputIndex
+from .output_storage import OutputStorage
+from .segment_store import create_segment_store
+from .verifier import OutputVerifier, playlist_duration
+from ..models.segment import SegmentTable
+from ..models.video import VideoResource, VideoMetadata, DownloadResult, DownloadStatus, ResourceType
 from ..utils.file_utils import FileUtils
 from ..utils.logger import logger
 
@@ -13,20 +24,53 @@ from ..utils.logger import logger
 class VideoTranscoder:
     """视频转码器"""
     
-    def __init__(self, download_dir: str):
-        """初始化转码器"""
+    # 管道读取块大小
+    PIPE_CHUNK_SIZE = 1024 * 1024
+    
+    def __init__(self, download_dir: str, storage: Optional[OutputStorage] = None,
+                 segment_layout: str = 'files', command_prefix: Optional[List[str]] = None,
+                 encode_profile: Optional[EncodeProfile] = None, audio_only: bool = False,
+                 encode_jobs: Optional[int] = None):
+        """
+        初始化转码器
+        
+        Args:
+            download_dir: 下载目录
+            storage: 输出存储，默认写入下载目录
+            segment_layout: 片段存储布局
+            command_prefix: ffmpeg命令前缀，例如 ['nice', '-n', '10']
+            encode_profile: 重编码配置，为空时只做流复制合并
+            audio_only: 视频课程是否只输出音频（合并时去掉视频流）
+            encode_jobs: 重编码时每个视频的分块并发数上限，为空表示不限制
+        """
         self.download_dir = download_dir
+        self.storage = storage or OutputStorage(download_dir)
+        self.segment_layout = segment_layout
+        self.command_prefix = list(command_prefix or [])
+        self.encode_profile = encode_profile
+        self.audio_only = audio_only
+        self.encode_jobs = encode_jobs
+        self.index = OutputIndex(download_dir)
+        self.verifier = OutputVerifier()
     
-    def transcode_video(self, resource: VideoResource) -> DownloadResult:
+    def transcode_video(self, resource: VideoResource,
+                        segment_table: Optional[SegmentTable] = None) -> DownloadResult:
         """
         转码视频
         
         Args:
             resource: 视频资源对象
+            segment_table: 本次下载的片段表，提供时用其中的片段时长校验输出，不再读取本地播放列表
             
         Returns:
             DownloadResult: 转码结果
         """
+        # 输出索引中已有记录则直接跳过
+        entry = self.index.get(resource.resource_id)
+        if entry:
+            logger.info(f"文件 {entry['location']} 已存在，跳过合并")
+            return DownloadResult(resource, True, "文件已存在，跳过合并", entry['location'])
+        
         resource_dir = os.path.join(self.download_dir, resource.resource_id)
         metadata_file = os.path.join(resource_dir, 'metadata.json')
         
@@ -45,39 +89,69 @@ class VideoTranscoder:
                 return DownloadResult(resource, False, "视频下载不完整，无法合并")
             
             # 处理文件名，替换非法字符
-            safe_title = FileUtils.sanitize_filename(metadata.title)
-            if not safe_title:
-                safe_title = resource.resource_id
+            safe_title = self._safe_title(resource, metadata.title)
             
-            output_file = os.path.join(self.download_dir, safe_title + '.mp4')
+            # 分配输出文件名，同名课程不会互相覆盖
+            audio = self._audio_output(resource)
+            output_name = self.index.claim_name(resource.resource_id, safe_title, '.m4a' if audio else '.mp4')
+            output_file = self.storage.uri(output_name)
             
-            # 检查输出文件是否已存在
-            if os.path.exists(output_file):
-                logger.info(f"文件 {output_file} 已存在，跳过合并")
-                return DownloadResult(resource, True, "文件已存在，跳过合并", output_file)
+            input_file = os.path.join(resource_dir, 'video.m3u8')
+            if segment_table is not None and len(segment_table):
+                duration = segment_table.total_duration
+            else:
+                duration = playlist_duration(resource_dir)
+            
+            # 建立索引前生成的输出文件：校验通过则补录到索引后跳过，
+            # 否则是中断的合并留下的不完整文件，删除后重新合并
+            if self.storage.exists(output_name):
+                verified, reason = self._verify_output(resource, output_name, duration)
+                if verified:
+                    logger.info(f"文件 {output_file} 已存在，跳过合并")
+                    self._record_output(resource, output_name, None, duration)
+                    return DownloadResult(resource, True, "文件已存在，跳过合并", output_file)
+                logger.warning(f"已存在的文件 {output_file} 不完整（{reason}），重新合并")
+                if not self.storage.streaming:
+                    FileUtils.remove_file_safely(self.storage.local_path(output_name))
             
             # 更新资源状态
             resource.download_status = DownloadStatus.TRANSCODING
             logger.info(f"开始合并视频: {safe_title}")
             
-            # 使用ffmpy进行视频合并
-            input_file = os.path.join(resource_dir, 'video.m3u8')
-            ff = ffmpy.FFmpeg(
-                inputs={input_file: ['-protocol_whitelist', 'crypto,file,http,https,tcp,tls']}, 
-                outputs={output_file: "-c:v copy -c:a copy"}
-            )
-            
-            logger.info(f"执行命令: {ff.cmd}")
-            ff.run()
+            sha256 = None
+            if self.encode_profile and not audio:
+                # 分块并行重编码
+                sha256 = self._encode(input_file, resource_dir, output_name)
+            elif self.storage.streaming:
+                # ffmpeg输出通过管道直接写入输出存储
+                sha256 = self._mux_to_stream(input_file, output_name, audio)
+            else:
+                # 使用ffmpy进行视频合并
+                ff = ffmpy.FFmpeg(
+                    inputs={input_file: ['-protocol_whitelist', 'crypto,file,http,https,tcp,tls']}, 
+                    outputs={self.storage.local_path(output_name): self._stream_options(audio)}
+                )
+                
+                logger.info(f"执行命令: {ff.cmd}")
+                self._run(ff)
             
             # 验证输出文件
-            if os.path.exists(output_file) and FileUtils.get_file_size(output_file) > 0:
+            verified, reason = self._verify_output(resource, output_name, duration)
+            reason = f"合并后的文件校验失败: {reason}"
+            if verified:
                 resource.download_status = DownloadStatus.COMPLETED
                 resource.file_path = output_file
                 logger.info(f"视频合并完成: {output_file}")
+                self._record_output(resource, output_name, sha256, duration)
+                if self.storage.delete_local_segments:
+                    create_segment_store(self.segment_layout, resource_dir, metadata.total_segments).remove()
+                    logger.info(f"已删除本地片段: {resource_dir}")
                 return DownloadResult(resource, True, "合并完成", output_file)
             else:
-                return DownloadResult(resource, False, "合并后文件不存在或为空")
+                logger.error(f"{reason}: {output_file}")
+                if not self.storage.streaming:
+                    FileUtils.remove_file_safely(self.storage.local_path(output_name))
+                return DownloadResult(resource, False, reason)
                 
         except ffmpy.FFExecutableNotFoundError:
             error_msg = "未找到ffmpeg可执行文件，请确保已正确安装ffmpeg"
@@ -87,9 +161,10 @@ class VideoTranscoder:
             error_msg = f"视频合并过程中出错: {str(e)}"
             logger.error(error_msg)
             # 如果输出文件已部分创建但不完整，删除它
-            if os.path.exists(output_file):
-                FileUtils.remove_file_safely(output_file)
-                logger.info(f"已删除不完整的输出文件: {output_file}")
+            local_file = self.storage.local_path(output_name)
+            if os.path.exists(local_file):
+                FileUtils.remove_file_safely(local_file)
+                logger.info(f"已删除不完整的输出文件: {local_file}")
             return DownloadResult(resource, False, error_msg)
         except Exception as e:
             error_msg = f"合并视频时发生未知错误: {str(e)}"
@@ -100,11 +175,220 @@ class VideoTranscoder:
             if resource.download_status == DownloadStatus.TRANSCODING:
                 resource.download_status = DownloadStatus.FAILED
     
+    def claim_progressive_output(self, resource: VideoResource) -> Optional[str]:
+        """
+        分配边下载边输出的TS文件路径
+        
+        Returns:
+            Optional[str]: 本地输出路径，输出存储不是本地（无法追加写入）时返回None
+        """
+        if self.storage.streaming:
+            return None
+        name = self.index.claim_name(resource.resource_id, self._safe_title(resource, resource.title), '.ts')
+        return self.storage.local_path(name)
+    
+    def record_progressive_output(self, resource: VideoResource, output_path: str,
+                                  duration: Optional[float] = None) -> DownloadResult:
+        """把下载时直接生成的输出文件记入输出索引，不再合并"""
+        output_name = os.path.basename(output_path)
+        self._record_output(resource, output_name, None, duration)
+        resource.download_status = DownloadStatus.COMPLETED
+        resource.file_path = self.storage.uri(output_name)
+        logger.info(f"视频已边下载边输出: {resource.file_path}")
+        return DownloadResult(resource, True, "边下载边输出完成", resource.file_path)
+    
+    def store_audio_file(self, resource: VideoResource, file_path: str) -> DownloadResult:
+        """
+        把直接下载的音频文件移入输出存储并记入输出索引，不经过ffmpeg
+        
+        Args:
+            resource: 资源
+            file_path: 下载的音频文件
+        """
+        extension = os.path.splitext(file_path)[1] or '.m4a'
+        output_name = self.index.claim_name(resource.resource_id, self._safe_title(resource, resource.title), extension)
+        sha256 = None
+        if self.storage.streaming:
+            digest = hashlib.sha256()
+            writer = self.storage.open_writer(output_name)
+            try:
+                with open(file_path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(self.PIPE_CHUNK_SIZE), b''):
+                        digest.update(chunk)
+                        writer.write(chunk)
+            except BaseException:
+                writer.abort()
+                raise
+            writer.commit()
+            sha256 = digest.hexdigest()
+            if self.storage.delete_local_segments:
+                FileUtils.remove_file_safely(file_path)
+        else:
+            os.replace(file_path, self.storage.local_path(output_name))
+        self._record_output(resource, output_name, sha256)
+        resource.download_status = DownloadStatus.COMPLETED
+        resource.file_path = self.storage.uri(output_name)
+        logger.info(f"音频已保存: {resource.file_path}")
+        return DownloadResult(resource, True, "音频下载完成", resource.file_path)
+    
+    def discard_partial_output(self, resource: VideoResource) -> bool:
+        """
+        删除中断的合并留下的不完整输出文件及其临时文件
+        
+        输出索引中已有记录的资源不受影响
+        
+        Returns:
+            bool: 是否删除了文件
+        """
+        if self.index.is_done(resource.resource_id):
+            return False
+        metadata_dict = FileUtils.load_json(os.path.join(self.download_dir, resource.resource_id, 'metadata.json'))
+        if not metadata_dict:
+            return False
+        safe_title = self._safe_title(resource, metadata_dict.get('title', ''))
+        extension = '.m4a' if self._audio_output(resource) else '.mp4'
+        local_file = self.storage.local_path(self.index.claim_name(resource.resource_id, safe_title, extension))
+        removed = False
+        for path in (local_file, local_file + '.tmp'):
+            if FileUtils.remove_file_safely(path):
+                logger.info(f"已删除不完整的输出文件: {path}")
+                removed = True
+        return removed
+    
+    def _verify_output(self, resource: VideoResource, output_name: str,
+                       duration: Optional[float]) -> Tuple[bool, str]:
+        """
+        校验输出文件：本地输出比较容器时长与播放列表时长并抽查关键帧，流式输出只能检查大小
+        
+        Returns:
+            Tuple[bool, str]: (是否通过, 失败原因)
+        """
+        if self.storage.streaming:
+            return self.storage.size(output_name) > 0, "文件不存在或为空"
+        verification = self.verifier.verify_file(self.storage.local_path(output_name), duration,
+                                                 resource.resource_id)
+        return verification.ok, verification.message
+    
+    def _audio_output(self, resource: VideoResource) -> bool:
+        """是否只输出音频：音频课程，或视频课程开启了只保留音频"""
+        return self.audio_only or resource.resource_type == ResourceType.AUDIO
+    
+    @staticmethod
+    def _stream_options(audio: bool) -> str:
+        """ffmpeg流复制参数，只输出音频时去掉视频流"""
+        return "-vn -c:a copy" if audio else "-c:v copy -c:a copy"
+    
+    @staticmethod
+    def _safe_title(resource: VideoResource, title: str) -> str:
+        """清理后的标题，为空时使用资源ID"""
+        return FileUtils.sanitize_filename(title) or resource.resource_id
+    
+    def _run(self, ff: ffmpy.FFmpeg) -> None:
+        """执行ffmpeg命令，设置了命令前缀时自行启动进程"""
+        if not self.command_prefix:
+            ff.run()
+            return
+        try:
+            exit_code = subprocess.call(self.command_prefix + shlex.split(ff.cmd))
+        except FileNotFoundError:
+            raise ffmpy.FFExecutableNotFoundError(f"Executable '{self.command_prefix[0]}' not found")
+        if exit_code != 0:
+            raise ffmpy.FFRuntimeError(ff.cmd, exit_code, None, None)
+    
+    def _record_output(self, resource: VideoResource, output_name: str, sha256: Optional[str],
+                       duration: Optional[float] = None) -> None:
+        """把输出写入索引，本地输出未提供哈希时计算文件哈希"""
+        if sha256 is None and not self.storage.streaming:
+            sha256 = FileUtils.hash_file(self.storage.local_path(output_name))
+        self.index.record(resource.resource_id, output_name, self.storage.uri(output_name),
+                          self.storage.size(output_name), sha256, duration)
+    
+    def _encode(self, input_file: str, resource_dir: str, output_name: str) -> Optional[str]:
+        """分块并行重编码，输出存储为流式时编码到本地临时文件后上传，返回上传内容的哈希"""
+        encoder = ParallelEncoder(self.encode_profile, self._run, self.encode_jobs)
+        work_dir = os.path.join(resource_dir, 'encode')
+        if not self.storage.streaming:
+            encoder.encode(input_file, self.storage.local_path(output_name), work_dir)
+            return None
+        
+        temp_file = os.path.join(resource_dir, 'encoded.mp4')
+        digest = hashlib.sha256()
+        try:
+            encoder.encode(input_file, temp_file, work_dir)
+            writer = self.storage.open_writer(output_name)
+            try:
+                with open(temp_file, 'rb') as f:
+                    for chunk in iter(lambda: f.read(self.PIPE_CHUNK_SIZE), b''):
+                        digest.update(chunk)
+                        writer.write(chunk)
+            except BaseException:
+                writer.abort()
+                raise
+            writer.commit()
+        finally:
+            FileUtils.remove_file_safely(temp_file)
+        return digest.hexdigest()
+    
+    def find_downloaded_resources(self) -> List[VideoResource]:
+        """扫描下载目录，找出已下载（有元数据）的视频和音频资源，不访问网络"""
+        resources = []
+        try:
+            with os.scandir(self.download_dir) as entries:
+                for entry in sorted(entries, key=lambda e: e.name):
+                    resource_type = ResourceType.from_resource_id(entry.name)
+                    if resource_type not in (ResourceType.VIDEO, ResourceType.AUDIO) or not entry.is_dir():
+                        continue
+                    metadata_dict = FileUtils.load_json(os.path.join(entry.path, 'metadata.json'))
+                    if metadata_dict:
+                        resources.append(VideoResource(
+                            entry.name, metadata_dict.get('title') or entry.name, resource_type
+                        ))
+        except FileNotFoundError:
+            pass
+        return resources
+    
+    def _mux_to_stream(self, input_file: str, output_name: str, audio: bool = False) -> str:
+        """
+        合并视频并把ffmpeg的输出流式写入输出存储，返回输出内容的哈希
+        
+        管道输出不可回写，使用分片MP4（moov前置、按关键帧分片）
+        """
+        ff = ffmpy.FFmpeg(
+            global_options='-loglevel error',
+            inputs={input_file: ['-protocol_whitelist', 'crypto,file,http,https,tcp,tls']},
+            outputs={'pipe:1': f'{self._stream_options(audio)} -f mp4 -movflags frag_keyframe+empty_moov'}
+        )
+        logger.info(f"执行命令: {ff.cmd} -> {self.storage.uri(output_name)}")
+        
+        writer = self.storage.open_writer(output_name)
+        # stderr写入临时文件：边读stdout边读stderr管道时，错误输出超过管道缓冲区会使双方互相等待
+        with tempfile.TemporaryFile() as stderr_file:
+            try:
+                process = subprocess.Popen(self.command_prefix + shlex.split(ff.cmd),
+                                           stdout=subprocess.PIPE, stderr=stderr_file)
+            except FileNotFoundError:
+                writer.abort()
+                raise ffmpy.FFExecutableNotFoundError(f"Executable '{ff.executable}' not found")
+            
+            digest = hashlib.sha256()
+            try:
+                with process.stdout:
+                    for chunk in iter(lambda: process.stdout.read(self.PIPE_CHUNK_SIZE), b''):
+                        digest.update(chunk)
+                        writer.write(chunk)
+                exit_code = process.wait()
+                if exit_code != 0:
+                    stderr_file.seek(0)
+                    raise ffmpy.FFRuntimeError(ff.cmd, exit_code, b'', stderr_file.read())
+            except BaseException:
+                process.kill()
+                process.wait()
+                writer.abort()
+                raise
+        writer.commit()
+        return digest.hexdigest()
+    
     def check_ffmpeg_availability(self) -> bool:
         """检查ffmpeg是否可用"""
-        try:
-            ff = ffmpy.FFmpeg(inputs={'dummy': None}, outputs={'dummy': None})
-            # 只是检查ffmpeg是否存在，不实际运行
-            return True
-        except ffmpy.FFExecutableNotFoundError:
-            return False
\ No newline at end of file
+        # 只检查PATH中是否有ffmpeg，不实际运行
+        return shutil.which('ffmpeg') is not None
\ No newline at end of file
@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import codecs
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterator, Optional
+from urllib.parse import quote, urlsplit
+
+import requests
+
+from ..utils.logger import logger
+
+
+def create_http_session(http2: bool = False, headers: Optional[Dict[str, str]] = None):
+    """
+    创建HTTP会话
+
+    Args:
+        http2: 是否使用HTTP/2（需要安装 httpx[http2]，未安装时退回HTTP/1.1）
+        headers: 默认请求头
+
+    Returns:
+        requests.Session 或接口兼容的 Http2Session
+    """
+    session = requests.Session()
+    session.headers.update(headers or {})
+    if not http2:
+        return session
+    try:
+        import httpx  # noqa: F401
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("未安装httpx[http2]，使用HTTP/1.1: pip install 'httpx[http2]'")
+        return session
+    return Http2Session(session)
+
+
+class Http2Response:
+    """
+    httpx响应的包装，提供与requests.Response一致的常用接口
+
+    包括调用方使用的 status_code、headers、url、encoding、content、text、json、
+    iter_content、iter_lines、raise_for_status、close 和上下文管理
+    """
+
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = requests.structures.CaseInsensitiveDict(response.headers.multi_items())
+        self.url = str(response.url)
+        self.http_version = response.http_version
+        # 与requests一致：响应头没有声明字符集时为None，调用方可以设置
+        self.encoding: Optional[str] = response.charset_encoding
+
+    def __enter__(self) -> 'Http2Response':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def content(self) -> bytes:
+        return self._response.read()
+
+    @property
+    def text(self) -> str:
+        self._response.read()
+        return self._response.text
+
+    def json(self) -> Any:
+        self._response.read()
+        return self._response.json()
+
+    def raise_for_status(self) -> None:
+        """状态码为4xx/5xx时抛出 requests.exceptions.HTTPError"""
+        if 400 <= self.status_code < 600:
+            raise requests.exceptions.HTTPError(
+                f"{self.status_code} Error: {self._response.reason_phrase} for url: {self.url}",
+                response=self
+            )
+
+    def iter_content(self, chunk_size: int = 1) -> Iterator[bytes]:
+        """流式读取响应体，传输错误转换为requests的异常"""
+        import httpx
+        try:
+            yield from self._response.iter_bytes(chunk_size)
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e))
+        except httpx.HTTPError as e:
+            raise requests.exceptions.ConnectionError(str(e))
+
+    def iter_lines(self, chunk_size: int = 512, decode_unicode: bool = False) -> Iterator[Any]:
+        """逐行读取响应体（去掉换行符）；decode_unicode 且已知字符集时返回字符串，否则返回字节"""
+        chunks = self.iter_content(chunk_size)
+        if decode_unicode and self.encoding:
+            chunks = self._decode(chunks, self.encoding)
+        pending = None
+        for chunk in chunks:
+            if pending is not None:
+                chunk = pending + chunk
+            lines = chunk.splitlines()
+            # 最后一行没有换行符时可能不完整，与下一块拼接
+            if lines and chunk[-1:] not in ('\n', '\r', b'\n', b'\r'):
+                pending = lines.pop()
+            else:
+                pending = None
+            yield from lines
+        if pending:
+            yield pending
+
+    @staticmethod
+    def _decode(chunks: Iterator[bytes], encoding: str) -> Iterator[str]:
+        """增量解码，多字节字符可以跨块"""
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        for chunk in chunks:
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        text = decoder.decode(b'', final=True)
+        if text:
+            yield text
+
+    def close(self) -> None:
+        self._response.close()
+
+
+class Http2Session:
+    """
+    基于httpx的HTTP/2会话，接口与requests.Session的常用部分一致
+
+    同一CDN主机的并发请求在少量连接上多路复用。服务器不支持HTTP/2时
+    httpx通过ALPN协商自动使用HTTP/1.1；出现HTTP/2协议错误的主机之后改用requests
+    """
+
+    def __init__(self, fallback: requests.Session, max_connections: int = 10):
+        """
+        初始化HTTP/2会话
+
+        Args:
+            fallback: 退回HTTP/1.1时使用的requests会话，默认请求头与之共享
+            max_connections: 连接池的最大连接数
+        """
+        import httpx
+        self._httpx = httpx
+        self._fallback = fallback
+        self.headers = fallback.headers
+        self._client = httpx.Client(
+            http2=True,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections)
+        )
+        self._lock = threading.Lock()
+        self._http1_hosts = set()
+        # 各协议版本的请求数
+        self.protocols = Counter()
+
+    def get(self, url: str, **kwargs) -> Any:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> Any:
+        return self.request('POST', url, **kwargs)
+
+    def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None,
+                data: Any = None, timeout: Optional[float] = None, stream: bool = False) -> Any:
+        """
+        发送请求
+
+        Raises:
+            requests.exceptions.RequestException: 传输错误
+        """
+        host = urlsplit(url).netloc
+        if host in self._http1_hosts:
+            return self._fallback.request(method, url, headers=headers, data=data,
+                                          timeout=timeout, stream=stream)
+
+        httpx = self._httpx
+        request_headers = dict(self.headers)
+        request_headers.update(headers or {})
+        body = {'data': data} if isinstance(data, dict) else {'content': data}
+        try:
+            request = self._client.build_request(method, url, headers=request_headers,
+                                                 timeout=timeout, **body)
+            response = self._client.send(request, stream=stream)
+        except (httpx.RemoteProtocolError, httpx.LocalProtocolError) as e:
+            logger.warning(f"{host} HTTP/2协议错误，改用HTTP/1.1: {str(e)}")
+            with self._lock:
+                self._http1_hosts.add(host)
+            return self._fallback.request(method, url, headers=headers, data=data,
+                                          timeout=timeout, stream=stream)
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e))
+        except httpx.HTTPError as e:
+            raise requests.exceptions.ConnectionError(str(e))
+
+        with self._lock:
+            self.protocols[response.http_version] += 1
+        return Http2Response(response)
+
+    def close(self) -> None:
+        self._client.close()
+        self._fallback.close()
+
+
+class ProxiedSession:
+    """
+    通过局域网缓存代理（python main.py --serve-cache）请求CDN
+
+    请求改写为 <代理地址>/fetch?url=<原URL>，由代理按稳定CDN路径缓存。
+    CDN使用HTTPS，普通的HTTP代理看不到内容也就无法缓存，因此不使用代理协议而是改写URL
+    """
+
+    def __init__(self, session: Any, proxy_url: str):
+        """
+        初始化代理会话
+
+        Args:
+            session: 实际发送请求的会话
+            proxy_url: 缓存代理地址，例如 http://192.168.1.10:8800
+        """
+        self.session = session
+        self.proxy_url = proxy_url.rstrip('/')
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def proxied_url(self, url: str) -> str:
+        """原URL对应的代理URL"""
+        return f'{self.proxy_url}/fetch?url={quote(url, safe="")}'
+
+    def get(self, url: str, **kwargs) -> Any:
+        return self.session.get(self.proxied_url(url), **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
@@ -0,0 +1,470 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import struct
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from .output_index import OutputIndex
+from ..utils.m3u8_utils import M3U8Utils
+from ..utils.logger import logger
+
+
+# 需要进入内部查找的容器box
+CONTAINER_BOXES = frozenset({b'moov', b'trak', b'mdia', b'minf', b'stbl', b'mvex', b'edts'})
+# 样本为长度前缀NAL单元（4字节长度）的视频编码
+NAL_CODECS = frozenset({b'avc1', b'avc3', b'hvc1', b'hev1'})
+# 按MP4结构校验的扩展名，其余（直接下载的mp3等音频文件）只检查文件不为空
+MP4_EXTENSIONS = ('.mp4', '.m4a', '.m4v', '.mov')
+# TS包长度和同步字节
+TS_PACKET_SIZE = 188
+TS_SYNC_BYTE = 0x47
+
+
+class Mp4FormatError(Exception):
+    """MP4结构错误"""
+
+
+def iter_boxes(data: bytes, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[bytes, int, int]]:
+    """
+    遍历内存中一段数据里的box
+
+    Yields:
+        Tuple[bytes, int, int]: (box类型, 内容起始偏移, box结束偏移)
+    """
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, offset)
+        header = 8
+        if size == 1:
+            if offset + 16 > end:
+                raise Mp4FormatError(f"{box_type!r} box头不完整")
+            size = struct.unpack_from('>Q', data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise Mp4FormatError(f"{box_type!r} box超出范围")
+        yield box_type, offset + header, offset + size
+        offset += size
+
+
+def find_box(data: bytes, path: List[bytes], start: int = 0, end: Optional[int] = None) -> Optional[Tuple[int, int]]:
+    """按路径查找第一个匹配的box，返回 (内容起始偏移, 结束偏移)"""
+    for box_type, payload, box_end in iter_boxes(data, start, end):
+        if box_type == path[0]:
+            if len(path) == 1:
+                return payload, box_end
+            found = find_box(data, path[1:], payload, box_end)
+            if found:
+                return found
+    return None
+
+
+@dataclass
+class TrackIndex:
+    """视频轨道的样本表（只保存校验需要的部分）"""
+    codec: bytes = b''
+    sample_sizes: List[int] = field(default_factory=list)
+    sync_samples: Optional[List[int]] = None
+    chunk_offsets: List[int] = field(default_factory=list)
+    # (首个chunk序号, 每个chunk的样本数)，chunk序号从1开始
+    sample_to_chunk: List[Tuple[int, int]] = field(default_factory=list)
+
+    def keyframes(self) -> List[int]:
+        """关键帧的样本序号（从0开始），没有stss时所有样本都是关键帧"""
+        if self.sync_samples is None:
+            return list(range(len(self.sample_sizes)))
+        return [number - 1 for number in self.sync_samples if 0 < number <= len(self.sample_sizes)]
+
+    def sample_ranges(self, samples: List[int]) -> Dict[int, Tuple[int, int]]:
+        """计算指定样本在文件中的 (偏移, 大小)"""
+        wanted = sorted(set(samples))
+        ranges: Dict[int, Tuple[int, int]] = {}
+        sample = 0
+        position = 0
+        for entry_index, (first_chunk, per_chunk) in enumerate(self.sample_to_chunk):
+            last_chunk = (self.sample_to_chunk[entry_index + 1][0] - 1
+                          if entry_index + 1 < len(self.sample_to_chunk) else len(self.chunk_offsets))
+            for chunk in range(first_chunk, last_chunk + 1):
+                if position >= len(wanted):
+                    return ranges
+                if sample + per_chunk <= wanted[position]:
+                    sample += per_chunk
+                    continue
+                offset = self.chunk_offsets[chunk - 1]
+                for current in range(sample, min(sample + per_chunk, len(self.sample_sizes))):
+                    if position < len(wanted) and current == wanted[position]:
+                        ranges[current] = (offset, self.sample_sizes[current])
+                        position += 1
+                    offset += self.sample_sizes[current]
+                sample += per_chunk
+        return ranges
+
+
+@dataclass
+class Mp4Info:
+    """从MP4结构中读取的信息"""
+    size: int
+    duration: Optional[float] = None
+    fragmented: bool = False
+    video: Optional[TrackIndex] = None
+
+
+def read_mp4_info(path: str) -> Mp4Info:
+    """
+    读取MP4的顶层结构和moov
+
+    只读取各顶层box的头和moov本身（不读取媒体数据），
+    box声明的大小超出文件末尾时说明文件被截断
+
+    Raises:
+        Mp4FormatError: 文件结构不完整或缺少moov
+    """
+    size = os.path.getsize(path)
+    info = Mp4Info(size)
+    moov = None
+    with open(path, 'rb') as f:
+        offset = 0
+        while offset < size:
+            box_type, box_size, header = _read_box_header(f, offset, size)
+            if offset + box_size > size:
+                raise Mp4FormatError(f"文件被截断: {box_type.decode('latin-1')} box声明 {box_size} 字节，"
+                                     f"实际只有 {size - offset} 字节")
+            if box_type == b'moov':
+                f.seek(offset)
+                moov = f.read(box_size)
+            elif box_type == b'moof':
+                info.fragmented = True
+            offset += box_size
+    if moov is None:
+        raise Mp4FormatError("缺少moov box")
+    _parse_moov(moov, info)
+    return info
+
+
+def _read_box_header(f: BinaryIO, offset: int, file_size: int) -> Tuple[bytes, int, int]:
+    f.seek(offset)
+    header = f.read(16)
+    if len(header) < 8:
+        raise Mp4FormatError(f"文件被截断: 偏移 {offset} 处的box头不完整")
+    size, box_type = struct.unpack_from('>I4s', header)
+    if size == 1:
+        if len(header) < 16:
+            raise Mp4FormatError(f"文件被截断: 偏移 {offset} 处的box头不完整")
+        return box_type, struct.unpack_from('>Q', header, 8)[0], 16
+    if size == 0:
+        return box_type, file_size - offset, 8
+    if size < 8:
+        raise Mp4FormatError(f"偏移 {offset} 处的box大小无效: {size}")
+    return box_type, size, 8
+
+
+def _parse_moov(moov: bytes, info: Mp4Info) -> None:
+    """从moov中读取时长和视频轨道的样本表"""
+    mvhd = find_box(moov, [b'moov', b'mvhd'])
+    if mvhd is None:
+        raise Mp4FormatError("缺少mvhd box")
+    timescale, duration = _read_header_duration(moov, mvhd[0])
+    if info.fragmented or duration == 0:
+        # 分片MP4的总时长记录在mehd中（可选）
+        mehd = find_box(moov, [b'moov', b'mvex', b'mehd'])
+        if mehd:
+            version = moov[mehd[0]]
+            duration = struct.unpack_from('>Q' if version == 1 else '>I', moov, mehd[0] + 4)[0]
+    if timescale and duration:
+        info.duration = duration / timescale
+
+    moov_payload, moov_end = find_box(moov, [b'moov'])
+    for box_type, payload, box_end in iter_boxes(moov, moov_payload, moov_end):
+        if box_type != b'trak':
+            continue
+        hdlr = find_box(moov, [b'mdia', b'hdlr'], payload, box_end)
+        if hdlr and moov[hdlr[0] + 8:hdlr[0] + 12] == b'vide':
+            stbl = find_box(moov, [b'mdia', b'minf', b'stbl'], payload, box_end)
+            if stbl:
+                info.video = _parse_stbl(moov, *stbl)
+            break
+
+
+def _read_header_duration(data: bytes, payload: int) -> Tuple[int, int]:
+    """读取mvhd的 (timescale, duration)"""
+    if data[payload] == 1:
+        return struct.unpack_from('>IQ', data, payload + 20)
+    return struct.unpack_from('>II', data, payload + 12)
+
+
+def _parse_stbl(data: bytes, start: int, end: int) -> TrackIndex:
+    track = TrackIndex()
+    for box_type, payload, _ in iter_boxes(data, start, end):
+        if box_type == b'stsd':
+            track.codec = data[payload + 12:payload + 16]
+        elif box_type == b'stsz':
+            sample_size, count = struct.unpack_from('>II', data, payload + 4)
+            track.sample_sizes = (list(struct.unpack_from(f'>{count}I', data, payload + 12))
+                                  if sample_size == 0 else [sample_size] * count)
+        elif box_type == b'stss':
+            count = struct.unpack_from('>I', data, payload + 4)[0]
+            track.sync_samples = list(struct.unpack_from(f'>{count}I', data, payload + 8))
+        elif box_type == b'stsc':
+            count = struct.unpack_from('>I', data, payload + 4)[0]
+            values = struct.unpack_from(f'>{count * 3}I', data, payload + 8)
+            track.sample_to_chunk = [(values[i], values[i + 1]) for i in range(0, len(values), 3)]
+        elif box_type in (b'stco', b'co64'):
+            count = struct.unpack_from('>I', data, payload + 4)[0]
+            track.chunk_offsets = list(struct.unpack_from(
+                f'>{count}{"Q" if box_type == b"co64" else "I"}', data, payload + 8))
+    return track
+
+
+@dataclass
+class VerifyResult:
+    """单个输出文件的校验结果"""
+    resource_id: str
+    path: str
+    ok: bool
+    message: str
+    expected_duration: Optional[float] = None
+    duration: Optional[float] = None
+    keyframes_checked: int = 0
+    size: int = 0
+    mtime: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class OutputVerifier:
+    """
+    输出文件校验
+
+    用moov中的时长（分片MP4没有记录总时长时用ffprobe）和播放列表 #EXTINF
+    时长之和比较，再抽查几个关键帧：按样本表算出关键帧在文件中的位置，
+    检查数据没有超出文件末尾、NAL单元长度能完整拼出整个样本。
+    只读取文件头、moov和被抽查的几个样本，不解码
+    """
+
+    # 时长允许的误差：绝对值（秒）和相对比例，取较大者
+    DURATION_TOLERANCE = 1.0
+    DURATION_TOLERANCE_RATIO = 0.005
+
+    def __init__(self, samples: int = 3, probe: bool = True):
+        """
+        初始化校验器
+
+        Args:
+            samples: 抽查的关键帧数量
+            probe: 容器中没有总时长时是否用ffprobe读取
+        """
+        self.samples = samples
+        self.probe = probe and shutil.which('ffprobe') is not None
+
+    def verify_file(self, path: str, expected_duration: Optional[float] = None,
+                    resource_id: str = '') -> VerifyResult:
+        """
+        校验单个MP4文件
+
+        Args:
+            path: 文件路径
+            expected_duration: 期望时长（播放列表 #EXTINF 之和），为空时不比较时长
+            resource_id: 资源ID，只用于结果记录
+        """
+        result = VerifyResult(resource_id, path, False, '', expected_duration)
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            result.message = f"无法读取文件: {str(e)}"
+            return result
+        result.size = stat.st_size
+        result.mtime = stat.st_mtime
+        if not stat.st_size:
+            result.message = "文件为空"
+            return result
+
+        if path.endswith('.ts'):
+            return self._verify_ts(path, expected_duration, result)
+        if not path.lower().endswith(MP4_EXTENSIONS):
+            result.ok = True
+            result.message = "校验通过（只检查文件不为空）"
+            return result
+
+        try:
+            info = read_mp4_info(path)
+            result.duration = info.duration
+            if result.duration is None and self.probe:
+                result.duration = self._probe_duration(path)
+            if expected_duration and result.duration is None:
+                result.message = "无法读取时长"
+                return result
+            if expected_duration and result.duration is not None:
+                tolerance = max(self.DURATION_TOLERANCE, expected_duration * self.DURATION_TOLERANCE_RATIO)
+                if abs(result.duration - expected_duration) > tolerance:
+                    result.message = f"时长不一致: {result.duration:.2f}s，播放列表 {expected_duration:.2f}s"
+                    return result
+            if info.video is not None and not info.fragmented:
+                result.keyframes_checked = self._check_keyframes(path, info)
+        except (Mp4FormatError, struct.error, OSError) as e:
+            result.message = str(e) if isinstance(e, Mp4FormatError) else f"MP4结构错误: {str(e)}"
+            return result
+
+        result.ok = True
+        result.message = "校验通过"
+        return result
+
+    def _verify_ts(self, path: str, expected_duration: Optional[float], result: VerifyResult) -> VerifyResult:
+        """
+        校验边下载边输出的TS文件：长度是整数个TS包，抽查的包以同步字节开头。
+        TS没有记录总时长，只有能用ffprobe读取时才比较时长
+        """
+        if result.size % TS_PACKET_SIZE:
+            result.message = f"TS文件长度不是 {TS_PACKET_SIZE} 的整数倍（文件被截断）"
+            return result
+        packets = result.size // TS_PACKET_SIZE
+        picked = sorted({0, packets - 1, *(packets * i // (self.samples + 1) for i in range(1, self.samples + 1))})
+        with open(path, 'rb') as f:
+            for packet in picked:
+                f.seek(packet * TS_PACKET_SIZE)
+                if f.read(1) != bytes([TS_SYNC_BYTE]):
+                    result.message = f"TS包 {packet} 缺少同步字节"
+                    return result
+        result.duration = self._probe_duration(path) if self.probe else None
+        if expected_duration and result.duration is not None:
+            tolerance = max(self.DURATION_TOLERANCE, expected_duration * self.DURATION_TOLERANCE_RATIO)
+            if abs(result.duration - expected_duration) > tolerance:
+                result.message = f"时长不一致: {result.duration:.2f}s，播放列表 {expected_duration:.2f}s"
+                return result
+        result.ok = True
+        result.message = "校验通过"
+        return result
+
+    def _check_keyframes(self, path: str, info: Mp4Info) -> int:
+        """抽查均匀分布的几个关键帧（包括最后一个），返回检查的数量"""
+        track = info.video
+        keyframes = track.keyframes()
+        if not keyframes or not self.samples:
+            return 0
+        if len(keyframes) <= self.samples:
+            picked = keyframes
+        else:
+            step = (len(keyframes) - 1) / (self.samples - 1) if self.samples > 1 else 0
+            picked = [keyframes[round(i * step)] for i in range(self.samples)] if step else [keyframes[-1]]
+        ranges = track.sample_ranges(picked)
+        with open(path, 'rb') as f:
+            for sample in picked:
+                if sample not in ranges:
+                    raise Mp4FormatError(f"样本表不完整: 找不到样本 {sample}")
+                offset, size = ranges[sample]
+                if offset + size > info.size:
+                    raise Mp4FormatError(f"关键帧 {sample} 超出文件末尾（文件被截断）")
+                if track.codec in NAL_CODECS:
+                    f.seek(offset)
+                    self._check_nal_units(f.read(size), sample)
+        return len(picked)
+
+    @staticmethod
+    def _check_nal_units(data: bytes, sample: int) -> None:
+        """长度前缀的NAL单元应当正好拼出整个样本"""
+        position = 0
+        while position + 4 <= len(data):
+            length = struct.unpack_from('>I', data, position)[0]
+            if length == 0 or position + 4 + length > len(data):
+                raise Mp4FormatError(f"关键帧 {sample} 数据损坏: NAL单元长度 {length} 无效")
+            position += 4 + length
+        if position != len(data):
+            raise Mp4FormatError(f"关键帧 {sample} 数据损坏: 样本末尾有 {len(data) - position} 字节多余数据")
+
+    @staticmethod
+    def _probe_duration(path: str) -> Optional[float]:
+        """用ffprobe读取容器时长（只读格式信息，不解码）"""
+        try:
+            output = subprocess.run(
+                ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+                 '-of', 'default=noprint_wrappers=1:nokey=1', path],
+                capture_output=True, text=True, timeout=60
+            ).stdout.strip()
+            return float(output) if output else None
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            return None
+
+
+def playlist_duration(resource_dir: str) -> Optional[float]:
+    """本地播放列表中 #EXTINF 时长之和，没有播放列表时返回None"""
+    try:
+        with open(os.path.join(resource_dir, 'video.m3u8'), 'r', encoding='utf-8') as f:
+            count, duration = M3U8Utils.summarize(f)
+    except OSError:
+        return None
+    return duration if count else None
+
+
+class LibraryVerifier:
+    """
+    批量校验输出索引中的所有本地输出文件
+
+    多个文件并行校验，结果写回输出索引。大小和修改时间与上次校验通过时
+    相同的文件不再重复校验
+    """
+
+    def __init__(self, download_dir: str, index: OutputIndex, verifier: Optional[OutputVerifier] = None,
+                 jobs: Optional[int] = None):
+        """
+        初始化批量校验
+
+        Args:
+            download_dir: 下载目录（输出文件和各资源的播放列表所在位置）
+            index: 输出索引
+            verifier: 单文件校验器
+            jobs: 并发数，默认为CPU核数的2倍（校验主要是随机读）
+        """
+        self.download_dir = download_dir
+        self.index = index
+        self.verifier = verifier or OutputVerifier()
+        self.jobs = max(1, jobs or 2 * (os.cpu_count() or 1))
+
+    def run(self, force: bool = False) -> List[VerifyResult]:
+        """
+        校验所有输出
+
+        Args:
+            force: 是否忽略上次的校验结果
+
+        Returns:
+            List[VerifyResult]: 本次校验（及沿用上次通过）的结果
+        """
+        entries = self.index.entries()
+        pending = []
+        results = []
+        for resource_id, entry in entries.items():
+            path = os.path.join(self.download_dir, entry['name'])
+            previous = entry.get('verification')
+            if not force and previous and previous.get('ok') and self._unchanged(path, previous):
+                results.append(VerifyResult(**{**previous, 'resource_id': resource_id, 'path': path}))
+                continue
+            pending.append((resource_id, path, entry.get('duration')))
+
+        logger.info(f"开始校验 {len(pending)} 个输出文件（{len(results)} 个未变化，跳过），并发数 {self.jobs}")
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            checked = list(executor.map(lambda item: self._verify(*item), pending))
+        self.index.update_verification({result.resource_id: result.to_dict() for result in checked})
+        return results + checked
+
+    def _verify(self, resource_id: str, path: str, duration: Optional[float]) -> VerifyResult:
+        if duration is None:
+            duration = playlist_duration(os.path.join(self.download_dir, resource_id))
+        result = self.verifier.verify_file(path, duration, resource_id)
+        if not result.ok:
+            logger.warning(f"校验失败: {path}: {result.message}")
+        return result
+
+    @staticmethod
+    def _unchanged(path: str, previous: Dict[str, Any]) -> bool:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return stat.st_size == previous.get('size') and stat.st_mtime == previous.get('mtime')
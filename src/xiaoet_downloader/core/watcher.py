@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import queue
+import signal
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .progress import ProgressTracker
+from ..models.video import DownloadResult, VideoResource
+from ..utils.logger import logger
+
+
+class CourseWatcher:
+    """
+    课程监视器（守护模式）
+
+    常驻进程按间隔轮询课程目录，目录指纹没有变化时不做任何处理，
+    有变化时只把之前没有见过的资源加入下载队列，由后台线程依次下载。
+    下载管理器和连接池在整个运行期间复用。可选地在本地提供HTTP状态接口
+    （GET /status），返回队列深度、进行中的传输、吞吐量和预计剩余时间
+    """
+
+    def __init__(self, list_resources: Callable[[], List[VideoResource]],
+                 process: Callable[[VideoResource], DownloadResult],
+                 interval: float = 600, status_port: Optional[int] = None,
+                 status_host: str = '127.0.0.1',
+                 on_stop: Optional[Callable[[], None]] = None):
+        """
+        初始化课程监视器
+
+        Args:
+            list_resources: 获取课程目录的回调（一次API请求），返回待处理的资源
+            process: 下载（并转码）单个资源的回调
+            interval: 轮询间隔（秒）
+            status_port: 状态接口端口，None表示不启动，0表示随机端口
+            status_host: 状态接口监听地址
+            on_stop: 停止时调用的回调（如取消正在进行的等待）
+        """
+        self.list_resources = list_resources
+        self.process = process
+        self.interval = interval
+        self.status_port = status_port
+        self.status_host = status_host
+        self.on_stop = on_stop
+
+        self._queue: 'queue.Queue[VideoResource]' = queue.Queue()
+        self._queued: List[str] = []
+        self._known: Set[str] = set()
+        self._fingerprint: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._active: Dict[str, VideoResource] = {}
+        # 下载进度，由下载管理器的进度回调更新（progress.update）
+        self.progress = ProgressTracker(render=False, interval=5.0)
+
+        self.started_at = time.time()
+        self.polls = 0
+        self.last_poll: Optional[float] = None
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def status_address(self) -> Optional[Tuple[str, int]]:
+        """状态接口实际监听的地址"""
+        return self._server.server_address[:2] if self._server else None
+
+    def run(self) -> None:
+        """运行直到 stop() 或收到中断信号"""
+        self._install_signal_handler()
+        self._start_status_server()
+        self.progress.start()
+        worker = threading.Thread(target=self._worker, name='xiaoet-watch-worker', daemon=True)
+        worker.start()
+        logger.info(f"守护模式已启动，每 {self.interval:g} 秒检查一次课程更新")
+        try:
+            while not self._stop.is_set():
+                self.poll()
+                self._stop.wait(self.interval)
+        finally:
+            self.stop()
+            worker.join()
+            self.progress.stop()
+            if self._server:
+                self._server.shutdown()
+                self._server.server_close()
+            logger.info("守护模式已停止")
+
+    def stop(self) -> None:
+        """停止轮询，当前资源处理完后退出"""
+        self._stop.set()
+        if self.on_stop:
+            self.on_stop()
+
+    def poll(self) -> List[VideoResource]:
+        """
+        获取一次课程目录，把新增的资源加入下载队列
+
+        Returns:
+            List[VideoResource]: 本次新加入队列的资源
+        """
+        try:
+            resources = self.list_resources()
+        except Exception as e:
+            logger.error(f"获取课程目录失败: {str(e)}")
+            return []
+        finally:
+            self.polls += 1
+            self.last_poll = time.time()
+
+        fingerprint = hashlib.sha1(
+            '\n'.join(resource.resource_id for resource in resources).encode('utf-8')
+        ).hexdigest()
+        with self._lock:
+            if fingerprint == self._fingerprint:
+                logger.debug("课程目录没有变化")
+                return []
+            self._fingerprint = fingerprint
+            added = [resource for resource in resources if resource.resource_id not in self._known]
+            for resource in added:
+                self._known.add(resource.resource_id)
+                self._queued.append(resource.resource_id)
+                self._queue.put(resource)
+        self.progress.add_videos(len(added))
+        if added:
+            logger.info(f"发现 {len(added)} 个新资源，已加入下载队列")
+        return added
+
+    def status(self) -> Dict[str, Any]:
+        """当前运行状态"""
+        progress = self.progress.snapshot()
+        transfers = {video['resource_id']: video for video in progress['active']}
+        with self._lock:
+            active = [transfers.get(resource_id) or {'resource_id': resource_id, 'title': resource.title}
+                      for resource_id, resource in self._active.items()]
+            return {
+                'queue_depth': len(self._queued),
+                'queued': list(self._queued),
+                'active': active,
+                'throughput': progress['throughput'],
+                'eta': progress['eta'],
+                'downloaded_bytes': progress['downloaded_bytes'],
+                'completed': self.completed,
+                'failed': self.failed,
+                'polls': self.polls,
+                'last_poll': self.last_poll,
+                'interval': self.interval,
+                'uptime': round(time.time() - self.started_at, 1),
+            }
+
+    def _worker(self) -> None:
+        """依次处理队列中的资源"""
+        while not self._stop.is_set():
+            try:
+                resource = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            resource_id = resource.resource_id
+            with self._lock:
+                self._queued.remove(resource_id)
+                self._active[resource_id] = resource
+            try:
+                result = self.process(resource)
+            except Exception as e:
+                logger.error(f"处理资源 {resource.title} 时出错: {str(e)}")
+                result = DownloadResult(resource, False, str(e))
+            self.progress.finish_video(resource, result.success)
+            with self._lock:
+                self._active.pop(resource_id, None)
+                if result.success:
+                    self.completed += 1
+                else:
+                    # 失败的资源在下一次轮询时重新加入队列
+                    self.failed += 1
+                    self._known.discard(resource_id)
+                    self._fingerprint = None
+            if result.success:
+                logger.info(f"新资源已同步: {resource.title}")
+            else:
+                logger.warning(f"新资源同步失败，下次轮询时重试: {resource.title}: {result.message}")
+
+    def _start_status_server(self) -> None:
+        """启动本地HTTP状态接口"""
+        if self.status_port is None:
+            return
+        watcher = self
+
+        class StatusHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/status'):
+                    self.send_error(404)
+                    return
+                body = json.dumps(watcher.status(), ensure_ascii=False).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(f"状态接口: {format % args}")
+
+        try:
+            self._server = ThreadingHTTPServer((self.status_host, self.status_port), StatusHandler)
+        except OSError as e:
+            logger.warning(f"无法启动状态接口 {self.status_host}:{self.status_port}: {str(e)}")
+            return
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='xiaoet-status', daemon=True).start()
+        host, port = self.status_address
+        logger.info(f"状态接口: http://{host}:{port}/status")
+
+    def _install_signal_handler(self) -> None:
+        """收到SIGTERM时正常停止（只能在主线程中设置）"""
+        if threading.current_thread() is threading.main_thread() and hasattr(signal, 'SIGTERM'):
+            signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
@@ -3,8 +3,8 @@
 
 import json
 import os
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
 
 
 @dataclass
@@ -14,6 +14,16 @@ class XiaoetConfig:
     cookie: str
     product_id: str
     download_dir: str = 'download'
+    segment_layout: str = 'files'
+    segment_dedup: bool = False
+    hedge_requests: bool = False
+    play_lines: List[str] = field(default_factory=lambda: ['A'])
+    http2: bool = False
+    lookahead: int = 2
+    output_storage: Optional[Dict[str, Any]] = None
+    encode_profile: Optional[Dict[str, Any]] = None
+    cache_proxy: Optional[str] = None
+    audio_only: bool = False
     
     @classmethod
     def from_file(cls, config_path: str) -> 'XiaoetConfig':
@@ -26,7 +36,17 @@ class XiaoetConfig:
                 app_id=config_data.get('app_id', ''),
                 cookie=config_data.get('cookie', ''),
                 product_id=config_data.get('product_id', ''),
-                download_dir=config_data.get('download_dir', 'download')
+                download_dir=config_data.get('download_dir', 'download'),
+                segment_layout=config_data.get('segment_layout', 'files'),
+                segment_dedup=bool(config_data.get('segment_dedup', False)),
+                hedge_requests=bool(config_data.get('hedge_requests', False)),
+                play_lines=list(config_data.get('play_lines') or ['A']),
+                http2=bool(config_data.get('http2', False)),
+                lookahead=int(config_data.get('lookahead', 2)),
+                output_storage=config_data.get('output_storage'),
+                encode_profile=config_data.get('encode_profile'),
+                cache_proxy=config_data.get('cache_proxy') or None,
+                audio_only=bool(config_data.get('audio_only', False))
             )
         except FileNotFoundError:
             raise FileNotFoundError(f"配置文件 {config_path} 不存在")
@@ -43,6 +63,12 @@ class XiaoetConfig:
             raise ValueError("cookie 不能为空")
         if not self.product_id:
             raise ValueError("product_id 不能为空")
+        if self.segment_layout not in ('files', 'packed'):
+            raise ValueError("segment_layout 只能是 files 或 packed")
+        if self.segment_dedup and self.segment_layout != 'files':
+            raise ValueError("segment_dedup 通过硬链接片段文件去重，只能与 files 片段布局一起使用")
+        if not self.play_lines:
+            raise ValueError("play_lines 不能为空")
         return True
     
     def to_dict(self) -> dict:
@@ -51,5 +77,15 @@ class XiaoetConfig:
             'app_id': self.app_id,
             'cookie': self.cookie,
             'product_id': self.product_id,
-            'download_dir': self.download_dir
+            'download_dir': self.download_dir,
+            'segment_layout': self.segment_layout,
+            'segment_dedup': self.segment_dedup,
+            'hedge_requests': self.hedge_requests,
+            'play_lines': self.play_lines,
+            'http2': self.http2,
+            'lookahead': self.lookahead,
+            'output_storage': self.output_storage,
+            'encode_profile': self.encode_profile,
+            'cache_proxy': self.cache_proxy,
+            'audio_only': self.audio_only
         }
\ No newline at end of file
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from array import array
+from enum import IntEnum
+from typing import Any, Dict, Iterable, Iterator, List
+
+
+class SegmentStatus(IntEnum):
+    """片段状态枚举"""
+    PENDING = 0
+    DOWNLOADING = 1
+    COMPLETED = 2
+    FAILED = 3
+
+
+class SegmentTable:
+    """
+    单个视频的片段表
+
+    用并行数组保存每个片段的URI偏移、时长、期望/实际大小、状态和重试次数，
+    所有URI拼接存放在一个字符串中。下载器、校验器和合并器共享同一张表，
+    各状态的片段数量随状态变更增量维护，查询为O(1)。
+    """
+
+    __slots__ = ('_uris', 'uri_offsets', 'durations', 'expected_sizes',
+                 'actual_sizes', 'statuses', 'retries', '_status_counts')
+
+    def __init__(self, uris: Iterable[str], durations: Iterable[float] = ()):
+        """根据片段URI（及可选的时长）创建片段表"""
+        uri_list = list(uris)
+        self._uris = ''.join(uri_list)
+        self.uri_offsets = array('Q', [0])
+        for uri in uri_list:
+            self.uri_offsets.append(self.uri_offsets[-1] + len(uri))
+
+        count = len(uri_list)
+        self.durations = array('d', durations)
+        if len(self.durations) != count:
+            self.durations = array('d', bytes(8 * count))
+        self.expected_sizes = array('q', bytes(8 * count))
+        self.actual_sizes = array('q', bytes(8 * count))
+        self.statuses = array('b', bytes(count))
+        self.retries = array('H', bytes(2 * count))
+        self._status_counts = [0] * len(SegmentStatus)
+        self._status_counts[SegmentStatus.PENDING] = count
+
+    @classmethod
+    def from_segments(cls, segments: List[Dict[str, Any]]) -> 'SegmentTable':
+        """从m3u8解析结果 media.data['segments'] 创建片段表"""
+        return cls(
+            (segment.get('uri') or '' for segment in segments),
+            (segment.get('duration') or 0.0 for segment in segments)
+        )
+
+    def __len__(self) -> int:
+        return len(self.statuses)
+
+    def uri(self, index: int) -> str:
+        """获取片段的原始URI"""
+        return self._uris[self.uri_offsets[index]:self.uri_offsets[index + 1]]
+
+    def status(self, index: int) -> SegmentStatus:
+        """获取片段状态"""
+        return SegmentStatus(self.statuses[index])
+
+    def set_status(self, index: int, status: SegmentStatus) -> None:
+        """设置片段状态"""
+        self._status_counts[self.statuses[index]] -= 1
+        self._status_counts[status] += 1
+        self.statuses[index] = status
+
+    def mark_completed(self, index: int, size: int) -> None:
+        """标记片段已完成并记录实际大小"""
+        self.actual_sizes[index] = size
+        self.set_status(index, SegmentStatus.COMPLETED)
+
+    def mark_failed(self, index: int) -> None:
+        """标记片段下载失败"""
+        self.set_status(index, SegmentStatus.FAILED)
+
+    def add_retry(self, index: int) -> int:
+        """记录一次重试，返回该片段的累计重试次数"""
+        if self.retries[index] < 0xFFFF:
+            self.retries[index] += 1
+        return self.retries[index]
+
+    def count(self, status: SegmentStatus) -> int:
+        """获取指定状态的片段数量"""
+        return self._status_counts[status]
+
+    @property
+    def completed_count(self) -> int:
+        """已完成的片段数量"""
+        return self._status_counts[SegmentStatus.COMPLETED]
+
+    @property
+    def is_complete(self) -> bool:
+        """是否所有片段都已完成"""
+        return self._status_counts[SegmentStatus.COMPLETED] == len(self.statuses)
+
+    @property
+    def total_duration(self) -> float:
+        """所有片段的总时长（秒）"""
+        return sum(self.durations)
+
+    @property
+    def total_size(self) -> int:
+        """已完成片段的总大小（字节）"""
+        return sum(self.actual_sizes)
+
+    def indices(self, status: SegmentStatus) -> Iterator[int]:
+        """遍历指定状态的片段序号"""
+        for index, value in enumerate(self.statuses):
+            if value == status:
+                yield index
@@ -5,12 +5,21 @@ from dataclasses import dataclass
 from typing import Optional, Dict, Any
 from enum import Enum
 
+from .segment import SegmentTable
+
 
 class ResourceType(Enum):
     """资源类型枚举"""
     VIDEO = 'video'
     AUDIO = 'audio'
     PRODUCT = 'product'
+    OTHER = 'other'
+    
+    @classmethod
+    def from_resource_id(cls, resource_id: str) -> 'ResourceType':
+        """根据资源ID前缀判断类型：v_视频、a_音频、p_专栏，其余（图文、直播等）不支持下载"""
+        prefixes = {'v_': cls.VIDEO, 'a_': cls.AUDIO, 'p_': cls.PRODUCT}
+        return prefixes.get(resource_id[:2], cls.OTHER)
 
 
 class DownloadStatus(Enum):
@@ -34,6 +43,18 @@ class VideoResource:
     download_status: DownloadStatus = DownloadStatus.PENDING
     file_path: Optional[str] = None
     error_message: Optional[str] = None
+    published_at: Optional[str] = None
+    
+    @classmethod
+    def from_column_item(cls, item: Dict[str, Any]) -> 'VideoResource':
+        """从专栏项目列表接口的条目创建VideoResource实例"""
+        resource_id = item.get('resource_id') or ''
+        return cls(
+            resource_id=resource_id,
+            title=item.get('resource_title') or '',
+            resource_type=ResourceType.from_resource_id(resource_id),
+            published_at=item.get('start_at') or item.get('created_at')
+        )
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'VideoResource':
@@ -41,7 +62,7 @@ class VideoResource:
         return cls(
             resource_id=data.get('id', ''),
             title=data.get('title', ''),
-            resource_type=ResourceType.VIDEO if data.get('id', '').startswith('v_') else ResourceType.AUDIO,
+            resource_type=ResourceType.from_resource_id(data.get('id', '')),
             is_available=data.get('is_available', 1) == 1
         )
     
@@ -56,7 +77,8 @@ class VideoResource:
             'is_available': self.is_available,
             'download_status': self.download_status.value,
             'file_path': self.file_path,
-            'error_message': self.error_message
+            'error_message': self.error_message,
+            'published_at': self.published_at
         }
 
 
@@ -101,6 +123,9 @@ class DownloadResult:
     success: bool
     message: str
     file_path: Optional[str] = None
+    segment_table: Optional[SegmentTable] = None
+    # 边下载边输出时直接生成的完整输出文件
+    output_path: Optional[str] = None
     
     def __str__(self) -> str:
         status = "成功" if self.success else "失败"
@@ -4,9 +4,11 @@
 import os
 import re
 import json
+import hashlib
 import subprocess
 import sys
-from typing import Optional
+import threading
+from typing import Dict, Optional, Set
 from pathlib import Path
 
 
@@ -49,6 +51,53 @@ class FileUtils:
         except (OSError, FileNotFoundError):
             return 0
     
+    @staticmethod
+    def scan_dir(directory: str, suffix: Optional[str] = None) -> Set[str]:
+        """
+        扫描目录，返回其中的文件名集合
+
+        只做一次 os.scandir 读取目录项，不对文件做 stat（在NFS等网络存储上代价很高）；
+        文件类型取自目录项本身，需要大小时由调用方只对用到的文件单独获取
+        """
+        names = set()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if suffix and not entry.name.endswith(suffix):
+                        continue
+                    try:
+                        # 只有文件系统不提供d_type时才会退回到stat
+                        if not entry.is_dir(follow_symlinks=False):
+                            names.add(entry.name)
+                    except OSError:
+                        continue
+        except (OSError, FileNotFoundError):
+            pass
+        return names
+    
+    @staticmethod
+    def scan_file_sizes(directory: str, suffix: Optional[str] = None) -> Dict[str, int]:
+        """
+        扫描目录，返回 {文件名: 大小}
+        
+        大小取自同一次 os.scandir 的目录项（DirEntry.stat）：Windows上目录项本身带有大小，
+        不再访问文件；其他平台每个目录项在扫描时获取一次并缓存，不再按路径重新查找文件
+        """
+        sizes = {}
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if suffix and not entry.name.endswith(suffix):
+                        continue
+                    try:
+                        if not entry.is_dir(follow_symlinks=False):
+                            sizes[entry.name] = entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
+        except (OSError, FileNotFoundError):
+            pass
+        return sizes
+    
     @staticmethod
     def remove_file_safely(file_path: str) -> bool:
         """安全删除文件"""
@@ -70,6 +119,30 @@ class FileUtils:
         except Exception:
             return False
     
+    @staticmethod
+    def save_json_atomic(data: dict, file_path: str) -> bool:
+        """原子地保存JSON数据：先写临时文件再替换，中途崩溃不会留下半个文件"""
+        temp_file = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, file_path)
+            return True
+        except Exception:
+            FileUtils.remove_file_safely(temp_file)
+            return False
+    
+    @staticmethod
+    def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+        """计算文件的SHA-256"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
     @staticmethod
     def load_json(file_path: str) -> Optional[dict]:
         """从文件加载JSON数据"""
@@ -7,11 +7,23 @@ from datetime import datetime
 from typing import Optional
 
 
+class _LazyFileHandler(logging.FileHandler):
+    """第一次写入日志时才创建日志目录和文件的文件处理器"""
+
+    def __init__(self, filename: str, encoding: Optional[str] = None):
+        super().__init__(filename, encoding=encoding, delay=True)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
 class Logger:
     """日志工具类"""
     
     _instance: Optional['Logger'] = None
     _logger: Optional[logging.Logger] = None
+    _console_handler: Optional[logging.Handler] = None
     
     def __new__(cls) -> 'Logger':
         if cls._instance is None:
@@ -31,13 +43,9 @@ class Logger:
         if self._logger.handlers:
             return
         
-        # 创建日志目录
-        log_dir = 'logs'
-        os.makedirs(log_dir, exist_ok=True)
-        
-        # 文件处理器
-        log_file = os.path.join(log_dir, f'xiaoet_{datetime.now().strftime("%Y%m%d")}.log')
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+        # 文件处理器，导入时不创建日志目录和文件
+        log_file = os.path.join('logs', f'xiaoet_{datetime.now().strftime("%Y%m%d")}.log')
+        file_handler = _LazyFileHandler(log_file, encoding='utf-8')
         file_handler.setLevel(logging.INFO)
         
         # 控制台处理器
@@ -55,6 +63,7 @@ class Logger:
         
         self._logger.addHandler(file_handler)
         self._logger.addHandler(console_handler)
+        self._console_handler = console_handler
     
     def info(self, message: str) -> None:
         """记录信息日志"""
@@ -80,6 +89,16 @@ class Logger:
         """设置日志级别"""
         if self._logger:
             self._logger.setLevel(level)
+    
+    def add_console_filter(self, log_filter) -> None:
+        """为控制台输出添加过滤器（如输出日志前清除终端进度条）"""
+        if self._console_handler:
+            self._console_handler.addFilter(log_filter)
+    
+    def remove_console_filter(self, log_filter) -> None:
+        """移除控制台输出的过滤器"""
+        if self._console_handler:
+            self._console_handler.removeFilter(log_filter)
 
 
 # 全局日志实例
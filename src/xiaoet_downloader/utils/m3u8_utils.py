@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import re
+from typing import Callable, Dict, Iterable, Iterator, Optional, TextIO, Tuple
+
+
+# 标签属性列表中的一个属性：KEY=值 或 KEY="带引号的值"
+ATTRIBUTE_PATTERN = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+
+class M3U8Utils:
+    """m3u8播放列表工具类"""
+
+    @staticmethod
+    def is_uri_line(line: str) -> bool:
+        """判断是否为URI行（非空且不是标签/注释）"""
+        return bool(line) and not line.startswith('#')
+
+    @staticmethod
+    def iter_lines(text: str) -> Iterator[str]:
+        """逐行遍历播放列表文本，不像 splitlines/StringIO 那样复制整个文本"""
+        start = 0
+        length = len(text)
+        while start < length:
+            end = text.find('\n', start)
+            if end < 0:
+                end = length
+            yield text[start:end]
+            start = end + 1
+
+    @staticmethod
+    def parse_extinf(line: str) -> float:
+        """解析 #EXTINF:<时长>,<标题> 行中的时长，失败返回0"""
+        try:
+            return float(line[len('#EXTINF:'):].split(',', 1)[0])
+        except ValueError:
+            return 0.0
+
+    @staticmethod
+    def parse_attributes(line: str) -> Dict[str, str]:
+        """解析标签的属性列表，如 #EXT-X-MEDIA:TYPE=AUDIO,URI="audio.m3u8" """
+        _, _, attributes = line.partition(':')
+        return {key: value.strip('"') for key, value in ATTRIBUTE_PATTERN.findall(attributes)}
+
+    @staticmethod
+    def select_rendition(playlist_text: str, audio_only: bool = False) -> Optional[str]:
+        """
+        从主播放列表中选择要下载的媒体播放列表
+
+        只要音频时优先选择独立音轨（#EXT-X-MEDIA:TYPE=AUDIO，默认音轨优先），
+        其次是只含音频编码的码流；都没有时和普通下载一样选择码率最高的码流，
+        合并时再去掉视频
+
+        Returns:
+            Optional[str]: 媒体播放列表的URI，不是主播放列表时返回None
+        """
+        audio = []
+        variants = []
+        attributes = None
+        for raw_line in playlist_text.splitlines():
+            line = raw_line.strip()
+            if line.startswith('#EXT-X-MEDIA:'):
+                media = M3U8Utils.parse_attributes(line)
+                if media.get('TYPE') == 'AUDIO' and media.get('URI'):
+                    audio.append((media.get('DEFAULT') == 'YES', media['URI']))
+            elif line.startswith('#EXT-X-STREAM-INF:'):
+                attributes = M3U8Utils.parse_attributes(line)
+            elif attributes is not None and M3U8Utils.is_uri_line(line):
+                codecs = [codec.strip() for codec in attributes.get('CODECS', '').split(',') if codec.strip()]
+                audio_variant = bool(codecs) and all(codec.startswith(('mp4a', 'ac-3', 'ec-3')) for codec in codecs)
+                try:
+                    bandwidth = int(attributes.get('BANDWIDTH', 0))
+                except ValueError:
+                    bandwidth = 0
+                variants.append((audio_variant, bandwidth, line))
+                attributes = None
+        if not variants and not audio:
+            return None
+        if audio_only:
+            if audio:
+                return max(audio, key=lambda item: item[0])[1]
+            audio_variants = [variant for variant in variants if variant[0]]
+            if audio_variants:
+                return max(audio_variants, key=lambda variant: variant[1])[2]
+        video_variants = [variant for variant in variants if not variant[0]] or variants
+        return max(video_variants, key=lambda variant: variant[1])[2] if video_variants else audio[0][1]
+
+    @staticmethod
+    def summarize(lines: Iterable[str]) -> Tuple[int, float]:
+        """
+        轻量统计播放列表，不构建完整的解析对象
+
+        Returns:
+            Tuple[int, float]: (片段数, 总时长秒数)
+        """
+        count = 0
+        duration = 0.0
+        for raw_line in lines:
+            line = raw_line.strip()
+            if line.startswith('#EXTINF:'):
+                duration += M3U8Utils.parse_extinf(line)
+            elif M3U8Utils.is_uri_line(line):
+                count += 1
+        return count, duration
+
+    @staticmethod
+    def rewrite_lines(lines: Iterable[str], out: TextIO,
+                      uri_mapper: Callable[[int, str], str]) -> int:
+        """
+        逐行重写播放列表，只替换URI行，其余标签原样输出
+
+        Args:
+            lines: 原始播放列表的行迭代器
+            out: 输出文本流
+            uri_mapper: (片段序号, 原始URI) -> 新URI
+
+        Returns:
+            int: 重写的片段数
+        """
+        index = 0
+        for raw_line in lines:
+            line = raw_line.strip()
+            if not line:
+                continue
+            if M3U8Utils.is_uri_line(line):
+                line = uri_mapper(index, line)
+                index += 1
+            out.write(line)
+            out.write('\n')
+        return index
+
+    @staticmethod
+    def rewrite_playlist(lines: Iterable[str], output_file: str,
+                         uri_mapper: Callable[[int, str], str]) -> int:
+        """
+        流式重写播放列表到文件，先写临时文件再原子替换
+
+        Args:
+            lines: 原始播放列表的行迭代器
+            output_file: 输出文件路径
+            uri_mapper: (片段序号, 原始URI) -> 新URI
+
+        Returns:
+            int: 重写的片段数
+        """
+        temp_file = output_file + '.tmp'
+        with open(temp_file, 'w', encoding='utf8') as f:
+            count = M3U8Utils.rewrite_lines(lines, f, uri_mapper)
+        os.replace(temp_file, output_file)
+        return count
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import hashlib
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit
+
+
+class UrlUtils:
+    """URL处理工具类"""
+
+    # CDN签名/鉴权相关的查询参数，与内容无关
+    SIGNATURE_PARAMS = frozenset({
+        'sign', 't', 'us', 'exper', 'rlimit', 'whref', 'sign_type', 'token',
+        'expires', 'signature', 'auth_key', 'key', 'policy', 'key-pair-id',
+    })
+
+    @staticmethod
+    def is_signature_param(name: str) -> bool:
+        """判断查询参数是否为签名参数"""
+        lowered = name.lower()
+        return lowered in UrlUtils.SIGNATURE_PARAMS or lowered.startswith('x-amz-')
+
+    @staticmethod
+    def playlist_prefix(play_url: str) -> str:
+        """m3u8播放地址对应的片段URL前缀"""
+        if 'v.f230' in play_url:
+            return play_url.split('v.f230')[0]
+        return play_url.split('?', 1)[0].rsplit('/', 1)[0] + '/'
+
+    @staticmethod
+    def segment_url(play_url: str, prefix: str, uri: str) -> str:
+        """
+        把播放列表中的片段URI转为完整URL
+
+        绝对URL原样返回，以/开头的URI相对于播放地址的主机，其余拼接在前缀之后
+        """
+        if uri.startswith(('http://', 'https://')):
+            return uri
+        if uri.startswith('/'):
+            return urljoin(play_url, uri)
+        return prefix + uri
+
+    @staticmethod
+    def is_playlist_url(url: str) -> bool:
+        """是否为m3u8播放列表地址（否则为可直接下载的媒体文件）"""
+        return urlsplit(url).path.lower().endswith('.m3u8')
+
+    @staticmethod
+    def url_expiry(url: str) -> Optional[float]:
+        """
+        签名URL的过期时间（Unix时间戳），没有过期参数时返回None
+
+        腾讯云点播等CDN的 t 参数为十六进制时间戳，expires 参数为十进制时间戳
+        """
+        for name, value in parse_qsl(urlsplit(url).query):
+            lowered = name.lower()
+            try:
+                if lowered == 't':
+                    timestamp = int(value, 16)
+                elif lowered == 'expires':
+                    timestamp = int(value)
+                else:
+                    continue
+            except ValueError:
+                continue
+            if 1e9 < timestamp < 1e11:
+                return float(timestamp)
+        return None
+
+    @staticmethod
+    def stable_path(url: str) -> str:
+        """
+        去掉主机和签名参数后的稳定CDN路径
+
+        不同线路/签名的同一片段得到相同的结果，例如
+        https://a.cdn.com/p/v.f230.ts?start=0&end=10&sign=x&t=y -> /p/v.f230.ts?end=10&start=0
+        """
+        parts = urlsplit(url)
+        query = sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                       if not UrlUtils.is_signature_param(name))
+        path = parts.path or '/'
+        return f'{path}?{urlencode(query)}' if query else path
+
+    @staticmethod
+    def stable_key(url: str) -> str:
+        """稳定CDN路径的SHA-256，用作缓存/去重的键"""
+        return hashlib.sha256(UrlUtils.stable_path(url).encode('utf-8')).hexdigest()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import random
+import tempfile
+import threading
+import sys
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# 添加src目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from xiaoet_downloader.core.downloader import VideoDownloader
+from xiaoet_downloader.core.transcoder import VideoTranscoder
+from xiaoet_downloader.core.transport import Http2Session
+from xiaoet_downloader.models.config import XiaoetConfig
+from xiaoet_downloader.models.video import ResourceType, VideoResource
+
+try:
+    import httpx  # noqa: F401
+    import h2  # noqa: F401
+    HAS_HTTP2 = True
+except ImportError:
+    HAS_HTTP2 = False
+
+
+def media_playlist(prefix, count):
+    lines = ['#EXTM3U', '#EXT-X-TARGETDURATION:10']
+    for index in range(count):
+        lines += ['#EXTINF:10.0,', f'{prefix}_{index}.ts']
+    return '\n'.join(lines + ['#EXT-X-ENDLIST']) + '\n'
+
+
+class MediaServer:
+    """提供主播放列表、视频/音频媒体播放列表和单个音频文件的测试服务器"""
+
+    MASTER = """#EXTM3U
+#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aac",NAME="audio",DEFAULT=YES,URI="audio.m3u8"
+#EXT-X-STREAM-INF:BANDWIDTH=2500000,CODECS="avc1.640028,mp4a.40.2",AUDIO="aac"
+video.m3u8
+"""
+
+    def __init__(self, segments=3):
+        self.files = {
+            '/master.m3u8': self.MASTER.encode(),
+            '/video.m3u8': media_playlist('video', segments).encode(),
+            '/audio.m3u8': media_playlist('audio', segments).encode(),
+            '/lesson.mp3': random.Random(0).randbytes(300 * 1024),
+        }
+        for index in range(segments):
+            self.files[f'/video_{index}.ts'] = random.Random(index).randbytes(64 * 1024)
+            self.files[f'/audio_{index}.ts'] = random.Random(100 + index).randbytes(4 * 1024)
+        self.requests = Counter()
+        # 前几次请求只返回一半内容（Content-Length不变）
+        self.truncate = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                server.requests[path] += 1
+                data = server.files.get(path)
+                if data is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(data)))
+                if server.truncate:
+                    server.truncate -= 1
+                    self.send_header('Connection', 'close')
+                    self.end_headers()
+                    self.wfile.write(data[:len(data) // 2])
+                    self.close_connection = True
+                    return
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class TestAudioDownload(unittest.TestCase):
+    """测试音频下载：选择独立音轨、直接下载音频文件"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.download_dir = self.temp_dir.name
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def downloader(self, audio_only=False, http2=False):
+        config = XiaoetConfig(app_id='app', cookie='', product_id='p', download_dir=self.download_dir,
+                              audio_only=audio_only, http2=http2)
+        downloader = VideoDownloader(config)
+        downloader.RETRY_DELAY = 0
+        self.addCleanup(downloader.session.close)
+        return downloader
+
+    def test_audio_rendition(self):
+        """测试只保留音频时只下载主播放列表中的音轨"""
+        with MediaServer() as server:
+            result = self.downloader(audio_only=True).download_m3u8_video(
+                VideoResource('v_1', 'lesson'), f'{server.base_url}/master.m3u8', self.download_dir)
+            self.assertTrue(result.success, result.message)
+            self.assertEqual(server.requests['/audio_0.ts'], 1)
+            self.assertNotIn('/video_0.ts', server.requests)
+            with open(os.path.join(result.file_path, 'v_0.ts'), 'rb') as f:
+                self.assertEqual(f.read(), server.files['/audio_0.ts'])
+
+            # 普通下载选择视频码流
+            result = self.downloader().download_m3u8_video(
+                VideoResource('v_2', 'lesson'), f'{server.base_url}/master.m3u8', self.download_dir)
+            self.assertTrue(result.success, result.message)
+            self.assertEqual(server.requests['/video_0.ts'], 1)
+
+    def test_probe_master_playlist(self):
+        """测试预读主播放列表时流式统计选择的媒体播放列表"""
+        with MediaServer(segments=4) as server:
+            self.assertEqual(self.downloader(audio_only=True).probe_playlist(f'{server.base_url}/master.m3u8'),
+                             (4, 40.0))
+            self.assertEqual(self.downloader().probe_playlist(f'{server.base_url}/video.m3u8'), (4, 40.0))
+            self.assertEqual(server.requests['/audio.m3u8'], 1)
+            self.assertIsNone(self.downloader().probe_playlist(f'{server.base_url}/missing.m3u8'))
+
+    @unittest.skipUnless(HAS_HTTP2, "未安装httpx[http2]")
+    def test_probe_over_http2(self):
+        """测试开启HTTP/2时经Http2Session流式预读播放列表"""
+        with MediaServer(segments=4) as server:
+            downloader = self.downloader(audio_only=True, http2=True)
+            self.assertIsInstance(downloader.session, Http2Session)
+            self.assertEqual(downloader.probe_playlist(f'{server.base_url}/master.m3u8'), (4, 40.0))
+            self.assertEqual(self.downloader(http2=True).probe_playlist(f'{server.base_url}/video.m3u8'), (4, 40.0))
+            self.assertIsNone(self.downloader(http2=True).probe_playlist(f'{server.base_url}/missing.m3u8'))
+
+    def test_audio_file(self):
+        """测试直接下载的音频文件：不完整时重试，保存到输出存储"""
+        resource = VideoResource('a_1', '音频课', resource_type=ResourceType.AUDIO)
+        with MediaServer() as server:
+            server.truncate = 1
+            result = self.downloader().download_file(resource, f'{server.base_url}/lesson.mp3', self.download_dir)
+            self.assertTrue(result.success, result.message)
+            self.assertEqual(server.requests['/lesson.mp3'], 2)
+            self.assertFalse(os.path.exists(result.file_path + '.tmp'))
+
+            server.truncate = 5
+            failed = self.downloader().download_file(VideoResource('a_2', '音频课2'),
+                                                     f'{server.base_url}/lesson.mp3', self.download_dir)
+            self.assertFalse(failed.success)
+            self.assertEqual(server.requests['/lesson.mp3'], 5)
+            self.assertEqual(os.listdir(os.path.join(self.download_dir, 'a_2')), [])
+
+        transcoder = VideoTranscoder(self.download_dir)
+        stored = transcoder.store_audio_file(resource, result.file_path)
+        self.assertTrue(stored.success)
+        self.assertEqual(stored.file_path, os.path.join(self.download_dir, '音频课.mp3'))
+        with open(stored.file_path, 'rb') as f:
+            self.assertEqual(f.read(), server.files['/lesson.mp3'])
+        self.assertTrue(transcoder.index.is_done('a_1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import random
+import tempfile
+import threading
+import time
+import sys
+from pathlib import Path
+
+# 添加src目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from xiaoet_downloader import BatchDownload, DownloadEvent, EventType, XiaoetConfig, XiaoetDownloadManager
+from xiaoet_downloader.core.checkpoint import ResourcePhase
+from xiaoet_downloader.core.fault_injection import FaultInjectingServer
+from xiaoet_downloader.models.segment import SegmentTable
+from xiaoet_downloader.models.video import DownloadResult, VideoResource
+
+
+class FakeManager:
+    """模拟下载管理器：按阶段调用回调，每个资源报告若干片段进度"""
+
+    def __init__(self, segments=3, fail=()):
+        self.segments = segments
+        self.fail = set(fail)
+        self.batch = None
+        self.processed = []
+
+    def process(self, resource):
+        self.processed.append(resource.resource_id)
+        batch = self.batch
+        batch.on_phase(resource.resource_id, ResourcePhase.DOWNLOADING)
+        table = SegmentTable([f'{index}.ts' for index in range(self.segments)])
+        try:
+            for index in range(self.segments):
+                table.mark_completed(index, 10)
+                batch.on_progress(resource, table, 10)
+        except Exception as e:
+            return DownloadResult(resource, False, f"下载失败: {str(e)}")
+        if resource.resource_id in self.fail:
+            return DownloadResult(resource, False, "合并失败")
+        batch.on_phase(resource.resource_id, ResourcePhase.DOWNLOADED)
+        return DownloadResult(resource, True, "合并完成", f'/out/{resource.resource_id}.mp4')
+
+    def start(self, resource_ids, max_events=1000):
+        resources = [VideoResource(resource_id, resource_id) for resource_id in resource_ids]
+        self.batch = BatchDownload(resources, self.process, max_events)
+        return self.batch.start()
+
+
+class TestBatchDownload(unittest.TestCase):
+    """测试批量任务的事件顺序、背压和取消"""
+
+    def test_events(self):
+        manager = FakeManager(segments=2, fail={'v_2'})
+        batch = manager.start(['v_1', 'v_2'])
+        events = [(event.type, event.resource_id) for event in batch]
+        self.assertEqual(events, [
+            (EventType.RESOLVED, 'v_1'), (EventType.PROGRESS, 'v_1'), (EventType.PROGRESS, 'v_1'),
+            (EventType.DOWNLOADED, 'v_1'), (EventType.MUXED, 'v_1'),
+            (EventType.RESOLVED, 'v_2'), (EventType.PROGRESS, 'v_2'), (EventType.PROGRESS, 'v_2'),
+            (EventType.FAILED, 'v_2'), (EventType.FINISHED, ''),
+        ])
+        results = batch.result()
+        self.assertEqual([r.resource.resource_id for r in results['success']], ['v_1'])
+        self.assertEqual([r.resource.resource_id for r in results['failed']], ['v_2'])
+        self.assertTrue(batch.done)
+
+        event = DownloadEvent(EventType.PROGRESS, 'v_1', completed=1, total=2)
+        self.assertEqual(event.to_dict()['type'], 'progress')
+
+    def test_backpressure(self):
+        """测试事件队列满时下载线程等待读取"""
+        manager = FakeManager(segments=50)
+        batch = manager.start(['v_1'], max_events=4)
+        time.sleep(0.3)
+        # 队列已满，下载线程停在第4个片段之后
+        self.assertFalse(batch.done)
+        self.assertEqual(batch._queue.qsize(), 4)
+        events = list(batch)
+        self.assertEqual(sum(1 for event in events if event.type == EventType.PROGRESS), 50)
+        self.assertEqual(events[-1].type, EventType.FINISHED)
+
+    def test_cancel(self):
+        """测试取消后中止当前资源，剩余资源记为已取消，不读取事件也能结束"""
+        manager = FakeManager(segments=50)
+        batch = manager.start(['v_1', 'v_2', 'v_3'], max_events=4)
+        events = iter(batch)
+        self.assertEqual(next(events).type, EventType.RESOLVED)
+        batch.cancel()
+        results = batch.result()
+        self.assertEqual(manager.processed, ['v_1'])
+        self.assertEqual(len(results['cancelled']), 3)
+        self.assertEqual(results['success'], [])
+
+
+class FakeAPI:
+    """只返回固定播放地址的API客户端"""
+
+    def __init__(self, play_url):
+        self.play_url = play_url
+
+    def get_micro_navigation_info(self):
+        return {'user_id': 'u_1'}
+
+    def get_column_resources(self, product_id):
+        return [VideoResource('v_1', '第一课'), VideoResource('v_2', '第二课')]
+
+    def get_video_detail_info(self, resource_id):
+        return {'play_sign': f'sign_{resource_id}'}
+
+    def get_play_url(self, user_id, play_sign, play_line='A'):
+        return {'720p_hls': {'play_url': self.play_url}}
+
+    def get_best_quality_url(self, play_list_dict):
+        item = play_list_dict['720p_hls']
+        return item['play_url'], '720p_hls'
+
+
+class TestDownloadMany(unittest.TestCase):
+    """测试下载管理器的批量下载接口"""
+
+    def test_download_many(self):
+        segments = [random.Random(index).randbytes(8 * 1024) for index in range(4)]
+        with tempfile.TemporaryDirectory() as temp_dir, FaultInjectingServer(segments) as server:
+            config = XiaoetConfig(app_id='app', cookie='c', product_id='p_1', download_dir=temp_dir)
+            manager = XiaoetDownloadManager(config)
+            manager.api_client = FakeAPI(server.playlist_url)
+
+            # 同一进程中同时运行两个批量任务
+            first = manager.download_many(['v_1'], auto_transcode=False)
+            second = manager.download_many(['v_2'], auto_transcode=False)
+            events = {'v_1': [], 'v_2': []}
+
+            def consume(batch):
+                for event in batch:
+                    if event.resource_id:
+                        events[event.resource_id].append(event)
+
+            threads = [threading.Thread(target=consume, args=(batch,)) for batch in (first, second)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(30)
+            manager.downloader.session.close()
+
+            for resource_id, title in (('v_1', '第一课'), ('v_2', '第二课')):
+                types = [event.type for event in events[resource_id]]
+                self.assertEqual(types[0], EventType.RESOLVED)
+                self.assertEqual(types.count(EventType.PROGRESS), len(segments))
+                self.assertEqual(types[-1], EventType.DOWNLOADED)
+                self.assertEqual(events[resource_id][0].title, title)
+                progress = [event for event in events[resource_id] if event.type == EventType.PROGRESS]
+                self.assertEqual(progress[-1].completed, len(segments))
+                self.assertTrue(os.path.exists(os.path.join(temp_dir, resource_id, 'v_0.ts')))
+            self.assertEqual(len(first.result()['success']), 1)
+            # 任务结束后移除回调
+            self.assertEqual(manager.progress_hooks, [])
+            self.assertEqual(manager.phase_hooks, [])
+
+    def test_cancel_during_download(self):
+        """测试下载过程中取消：在片段之间中止，记为取消而不是失败，不记录错误日志"""
+        segments = [random.Random(index).randbytes(8 * 1024) for index in range(4)]
+        with tempfile.TemporaryDirectory() as temp_dir, FaultInjectingServer(segments) as server:
+            config = XiaoetConfig(app_id='app', cookie='c', product_id='p_1', download_dir=temp_dir)
+            manager = XiaoetDownloadManager(config)
+            manager.api_client = FakeAPI(server.playlist_url)
+            handle = {}
+            started = threading.Event()
+
+            def cancel_after_first(resource, table, fetched):
+                if table.completed_count == 1:
+                    started.wait(5)
+                    handle['batch'].cancel()
+
+            manager.progress_hooks.append(cancel_after_first)
+            with self.assertNoLogs('xiaoet_downloader', level='ERROR'):
+                handle['batch'] = manager.download_many(['v_1'], auto_transcode=False)
+                started.set()
+                results = handle['batch'].result()
+            manager.downloader.session.close()
+
+            self.assertEqual(len(results['cancelled']), 1)
+            self.assertEqual(results['failed'], [])
+            self.assertEqual(results['cancelled'][0].message, "已取消")
+            self.assertTrue(os.path.exists(os.path.join(temp_dir, 'v_1', 'v_0.ts')))
+            self.assertFalse(os.path.exists(os.path.join(temp_dir, 'v_1', 'v_1.ts')))
+
+    def test_batches_serialized(self):
+        """测试同一个资源在两个批量任务中不会同时处理，等待期间取消的任务不再下载"""
+        segments = [random.Random(index).randbytes(8 * 1024) for index in range(4)]
+        with tempfile.TemporaryDirectory() as temp_dir, FaultInjectingServer(segments) as server:
+            config = XiaoetConfig(app_id='app', cookie='c', product_id='p_1', download_dir=temp_dir)
+            manager = XiaoetDownloadManager(config)
+            manager.api_client = FakeAPI(server.playlist_url)
+            process_resource = manager._process_resource
+            lock = threading.Lock()
+            state = {'active': 0, 'peak': 0, 'processed': []}
+            entered = threading.Event()
+            release = threading.Event()
+
+            def tracked(resource, *args):
+                with lock:
+                    state['active'] += 1
+                    state['peak'] = max(state['peak'], state['active'])
+                    state['processed'].append(resource.resource_id)
+                entered.set()
+                release.wait(5)
+                try:
+                    return process_resource(resource, *args)
+                finally:
+                    with lock:
+                        state['active'] -= 1
+
+            manager._process_resource = tracked
+            first = manager.download_many(['v_1'], auto_transcode=False)
+            self.assertTrue(entered.wait(5))
+            second = manager.download_many(['v_1'], auto_transcode=False)
+            cancelled = manager.download_many(['v_2'], auto_transcode=False)
+            time.sleep(0.2)
+            cancelled.cancel()
+            release.set()
+
+            results = [batch.result() for batch in (first, second, cancelled)]
+            manager.downloader.session.close()
+            self.assertEqual(state['peak'], 1)
+            self.assertEqual(state['processed'], ['v_1', 'v_1'])
+            self.assertEqual([len(result['success']) for result in results], [1, 1, 0])
+            self.assertEqual(len(results[2]['cancelled']), 1)
+            for index, data in enumerate(segments):
+                with open(os.path.join(temp_dir, 'v_1', f'v_{index}.ts'), 'rb') as f:
+                    self.assertEqual(f.read(), data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import random
+import tempfile
+import threading
+import time
+import sys
+from pathlib import Path
+
+# 添加src目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+import requests
+
+from xiaoet_downloader.core.cache_proxy import CachingProxy, LRUDiskCache, SingleFlight
+from xiaoet_downloader.core.downloader import VideoDownloader
+from xiaoet_downloader.core.fault_injection import FaultInjectingServer, FaultProfile
+from xiaoet_downloader.models.config import XiaoetConfig
+from xiaoet_downloader.models.video import VideoResource
+from xiaoet_downloader.utils.url_utils import UrlUtils
+
+
+class TestLRUDiskCache(unittest.TestCase):
+    """测试磁盘缓存的容量上限和淘汰顺序"""
+
+    def test_eviction(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = LRUDiskCache(temp_dir, max_bytes=30)
+            cache.put('aa1', b'x' * 10)
+            cache.put('bb2', b'y' * 10)
+            cache.put('cc3', b'z' * 10)
+            # 访问后aa1变为最近使用，淘汰bb2
+            self.assertEqual(cache.get('aa1'), b'x' * 10)
+            cache.put('dd4', b'w' * 10)
+            self.assertIsNone(cache.get('bb2'))
+            self.assertFalse(os.path.exists(cache.path('bb2')))
+            self.assertEqual(cache.total_bytes, 30)
+            self.assertEqual(cache.evictions, 1)
+
+            # 重新加载后保留容量统计
+            reloaded = LRUDiskCache(temp_dir, max_bytes=30)
+            self.assertEqual(len(reloaded), 3)
+            self.assertEqual(reloaded.total_bytes, 30)
+
+
+class TestSingleFlight(unittest.TestCase):
+    """测试并发调用合并"""
+
+    def test_collapse(self):
+        flight = SingleFlight()
+        calls = []
+        started = threading.Event()
+
+        def work():
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return 'data'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do('k', work))) for _ in range(5)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(shared for _, shared in results), [False] + [True] * 4)
+        self.assertTrue(all(result == 'data' for result, _ in results))
+
+
+class TestCachingProxy(unittest.TestCase):
+    """测试多个下载器经缓存代理下载同一视频"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.segments = [random.Random(index).randbytes(16 * 1024) for index in range(8)]
+        # 上游响应较慢，使并发请求有机会合并
+        self.upstream = FaultInjectingServer(self.segments, FaultProfile('slow', slow_rate=1.0, slow_delay=0.05))
+        self.upstream.start()
+        self.proxy = CachingProxy(os.path.join(self.temp_dir.name, 'cache'), port=0,
+                                  upstream_hosts=('127.0.0.1', 'localhost')).start()
+        host, port = self.proxy.address
+        self.proxy_url = f'http://{host}:{port}'
+
+    def tearDown(self):
+        self.proxy.stop()
+        self.upstream.stop()
+        self.temp_dir.cleanup()
+
+    def download(self, name, play_url):
+        download_dir = os.path.join(self.temp_dir.name, name)
+        config = XiaoetConfig(app_id='app', cookie='', product_id='p', download_dir=download_dir,
+                              cache_proxy=self.proxy_url)
+        downloader = VideoDownloader(config)
+        result = downloader.download_m3u8_video(VideoResource('v_1', name), play_url, download_dir)
+        downloader.session.close()
+        self.assertTrue(result.success, result.message)
+        for index, data in enumerate(self.segments):
+            with open(os.path.join(result.file_path, f'v_{index}.ts'), 'rb') as f:
+                self.assertEqual(f.read(), data)
+
+    def test_each_segment_fetched_once(self):
+        """测试并发下载和换主机下载时每个片段只请求一次上游"""
+        play_url = self.upstream.playlist_url
+        errors = []
+
+        def download(name):
+            try:
+                self.download(name, play_url)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=download, args=(f'box{i}',)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(self.upstream.injector.requests, len(self.segments))
+
+        # 不同主机（线路）的同一路径命中缓存
+        self.download('box3', play_url.replace('127.0.0.1', 'localhost'))
+        self.assertEqual(self.upstream.injector.requests, len(self.segments))
+
+        stats = requests.get(f'{self.proxy_url}/stats', timeout=5).json()
+        self.assertEqual(stats['misses'], len(self.segments) + 1)
+        self.assertEqual(stats['hits'] + stats['shared'] + stats['misses'], stats['requests'])
+        self.assertEqual(stats['cached_entries'], len(self.segments))
+
+    def test_rejects_other_urls(self):
+        """测试不代理媒体以外的URL和不允许的主机"""
+        self.assertEqual(self.proxy.address[0], '127.0.0.1')
+        for url in ('http://127.0.0.1/admin', 'http://169.254.169.254/latest/meta-data.ts'):
+            response = requests.get(f'{self.proxy_url}/fetch', params={'url': url}, timeout=5)
+            self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.upstream.injector.requests, 0)
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=b'', location=None):
+        self.status_code = status_code
+        self.content = body
+        self.headers = {'Location': location} if location else {}
+        self.is_redirect = location is not None
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    """按URL返回预设响应的上游会话"""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.urls = []
+
+    def get(self, url, headers=None, timeout=None, allow_redirects=True):
+        self.urls.append(url)
+        return self.responses[url]
+
+
+class TestUpstreamAllowlist(unittest.TestCase):
+    """测试上游主机白名单"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_default_hosts(self):
+        proxy = CachingProxy(self.temp_dir.name)
+        self.assertEqual(proxy.host, '127.0.0.1')
+        self.assertTrue(proxy.allowed('https://v-vod-k.xiaoeknow.com/a/seg_1.ts?sign=abc'))
+        self.assertTrue(proxy.allowed('https://xiaoeknow.com/a/index.m3u8'))
+        for url in ('https://evilxiaoeknow.com/a/seg_1.ts', 'https://xiaoeknow.com.evil.com/a/seg_1.ts',
+                    'http://10.0.0.1/a/seg_1.ts', 'file:///etc/seg_1.ts',
+                    'https://v-vod-k.xiaoeknow.com/admin'):
+            self.assertFalse(proxy.allowed(url), url)
+        self.assertTrue(CachingProxy(self.temp_dir.name, upstream_hosts=['CDN.Example.com'])
+                        .allowed('https://a.cdn.example.com/seg_1.ts'))
+
+    def test_redirects(self):
+        """测试只跟随到允许的主机的重定向"""
+        session = FakeSession({
+            'https://a.xiaoeknow.com/seg_1.ts': FakeResponse(302, location='https://b.xiaoeknow.com/seg_1.ts'),
+            'https://b.xiaoeknow.com/seg_1.ts': FakeResponse(200, b'data'),
+            'https://a.xiaoeknow.com/seg_2.ts': FakeResponse(302, location='http://169.254.169.254/seg_2.ts'),
+        })
+        proxy = CachingProxy(self.temp_dir.name, session=session)
+        response, _ = proxy.fetch('https://a.xiaoeknow.com/seg_1.ts')
+        self.assertEqual((response.status, response.body), (200, b'data'))
+        response, _ = proxy.fetch('https://a.xiaoeknow.com/seg_2.ts')
+        self.assertEqual(response.status, 403)
+        self.assertNotIn('http://169.254.169.254/seg_2.ts', session.urls)
+
+
+class TestPlaylistCache(unittest.TestCase):
+    """测试内存中的m3u8缓存淘汰过期和超出上限的条目"""
+
+    def test_eviction(self):
+        urls = [f'https://a.xiaoeknow.com/v_{index}/index.m3u8' for index in range(4)]
+        session = FakeSession({url: FakeResponse(200, b'#EXTM3U') for url in urls})
+        with tempfile.TemporaryDirectory() as temp_dir:
+            proxy = CachingProxy(temp_dir, session=session, playlist_ttl=0.2)
+            proxy.MAX_PLAYLISTS = 2
+            for url in urls[:3]:
+                proxy.fetch(url)
+            self.assertEqual(len(proxy._playlists), 2)
+            self.assertEqual(proxy.fetch(urls[2])[1], 'HIT')
+
+            # 过期的条目在读取或写入其他条目时删除
+            time.sleep(0.3)
+            self.assertEqual(proxy.fetch(urls[2])[1], 'MISS')
+            self.assertEqual(len(proxy._playlists), 1)
+            time.sleep(0.3)
+            proxy.fetch(urls[3])
+            self.assertEqual(list(proxy._playlists), [UrlUtils.stable_key(urls[3])])
+
+
+if __name__ == '__main__':
+    unittest.main()
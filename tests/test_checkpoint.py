@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import tempfile
+import shutil
+import os
+import random
+import sys
+from array import array
+from pathlib import Path
+from unittest import mock
+
+# 添加src目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from xiaoet_downloader.core.checkpoint import CheckpointJournal, ResourcePhase, remove_stale_temp_files
+from xiaoet_downloader.core.downloader import VideoDownloader
+from xiaoet_downloader.core.fault_injection import FaultInjectingServer
+from xiaoet_downloader.models.config import XiaoetConfig
+from xiaoet_downloader.models.segment import SegmentTable
+from xiaoet_downloader.models.video import ResourceType, VideoResource
+from xiaoet_downloader.utils.file_utils import FileUtils
+
+
+class TestCheckpointJournal(unittest.TestCase):
+    """测试CheckpointJournal类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.resources = [
+            VideoResource('v_1', '第一课', published_at='2024-01-01'),
+            VideoResource('a_2', '音频', resource_type=ResourceType.AUDIO),
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_resume_roundtrip(self):
+        """测试写入后重新加载课程目录、队列、阶段和片段大小"""
+        journal = CheckpointJournal(self.temp_dir, flush_interval=3600)
+        journal.start('p_1', 'u_1', self.resources)
+        journal.set_queue(['v_1'])
+        journal.set_phase('v_1', ResourcePhase.DOWNLOADING)
+
+        table = SegmentTable([f'{index}.ts' for index in range(10)])
+        for index in (0, 1, 2, 9):
+            table.mark_completed(index, 100)
+        journal.record_segments('v_1', table)
+        # 间隔内的片段进度只在强制写入时落盘
+        pending = CheckpointJournal(self.temp_dir)
+        self.assertTrue(pending.load('p_1'))
+        self.assertEqual(pending.completed_segments('v_1'), [])
+        journal.flush(force=True)
+
+        restored = CheckpointJournal(self.temp_dir)
+        self.assertTrue(restored.load('p_1'))
+        self.assertEqual(restored.user_id, 'u_1')
+        self.assertEqual(restored.queue, ['v_1'])
+        self.assertEqual(restored.phase('v_1'), ResourcePhase.DOWNLOADING)
+        self.assertEqual(restored.phase('a_2'), ResourcePhase.PENDING)
+        self.assertEqual(restored.completed_segments('v_1'), [0, 1, 2, 9])
+        self.assertEqual(list(restored.segment_sizes('v_1')), [100, 100, 100] + [0] * 6 + [100])
+        self.assertIsNone(restored.segment_sizes('a_2'))
+        catalogue = restored.catalogue()
+        self.assertEqual([resource.resource_id for resource in catalogue], ['v_1', 'a_2'])
+        self.assertEqual(catalogue[1].resource_type, ResourceType.AUDIO)
+        self.assertEqual(catalogue[0].published_at, '2024-01-01')
+
+    def test_load_other_course(self):
+        """测试其他课程的检查点不会被加载"""
+        CheckpointJournal(self.temp_dir).start('p_1', 'u_1', self.resources)
+        self.assertFalse(CheckpointJournal(self.temp_dir).load('p_2'))
+
+    def test_remove_stale_temp_files(self):
+        """测试只清理要恢复的资源目录中遗留的临时文件"""
+        resource_dir = os.path.join(self.temp_dir, 'v_1')
+        os.makedirs(resource_dir)
+        for name in ('v_0.ts', 'v_1.ts.tmp', 'video.m3u8.tmp'):
+            Path(resource_dir, name).write_bytes(b'x')
+        # 其他进程可能正在写入的目录
+        for name in ('.segment_store', 'v_2'):
+            os.makedirs(os.path.join(self.temp_dir, name))
+            Path(self.temp_dir, name, 'data.tmp').write_bytes(b'x')
+        self.assertEqual(remove_stale_temp_files(self.temp_dir, ['v_1', 'v_3']), 2)
+        self.assertEqual(os.listdir(resource_dir), ['v_0.ts'])
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir, '.segment_store', 'data.tmp')))
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir, 'v_2', 'data.tmp')))
+
+
+class TestResumeSeeding(unittest.TestCase):
+    """测试恢复时用检查点记录的片段大小建立片段表"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.segments = [bytes([0x47]) + random.Random(index).randbytes(187 + 188 * index) for index in range(5)]
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def download(self, server, known_sizes=None):
+        """下载一次，返回 (结果, 获取片段文件大小的次数)"""
+        config = XiaoetConfig(app_id='app', cookie='', product_id='p', download_dir=self.temp_dir)
+        downloader = VideoDownloader(config)
+        get_file_size = FileUtils.get_file_size
+        stats = []
+
+        def counting(path):
+            if path.endswith('.ts'):
+                stats.append(path)
+            return get_file_size(path)
+
+        try:
+            with mock.patch.object(FileUtils, 'get_file_size', side_effect=counting):
+                result = downloader.download_m3u8_video(VideoResource('v_1', 'lesson'), server.playlist_url,
+                                                        self.temp_dir, known_sizes=known_sizes)
+        finally:
+            downloader.session.close()
+        self.assertTrue(result.success, result.message)
+        return result, len(stats)
+
+    def test_seed_from_journal(self):
+        sizes = array('q', [len(data) for data in self.segments])
+        with FaultInjectingServer(self.segments) as server:
+            _, stats = self.download(server)
+            self.assertEqual(stats, 0)
+
+            # 没有检查点时使用打开存储时目录扫描得到的大小
+            _, stats = self.download(server)
+            self.assertEqual(stats, 0)
+
+            # 全部片段使用记录的大小
+            _, stats = self.download(server, sizes)
+            self.assertEqual(stats, 0)
+
+            # 存储中已不存在的片段重新下载
+            os.remove(os.path.join(self.temp_dir, 'v_1', 'v_2.ts'))
+            _, stats = self.download(server, sizes)
+            self.assertEqual(stats, 0)
+            with open(os.path.join(self.temp_dir, 'v_1', 'v_2.ts'), 'rb') as f:
+                self.assertEqual(f.read(), self.segments[2])
+
+            # 片段数不一致的记录作废
+            _, stats = self.download(server, sizes[:3])
+            self.assertEqual(stats, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -90,7 +90,17 @@ class TestXiaoetConfig(unittest.TestCase):
             'app_id': 'test_app_id',
             'cookie': 'test_cookie',
             'product_id': 'test_product_id',
-            'download_dir': 'test_download'
+            'download_dir': 'test_download',
+            'segment_layout': 'files',
+            'segment_dedup': False,
+            'hedge_requests': False,
+            'play_lines': ['A'],
+            'http2': False,
+            'lookahead': 2,
+            'output_storage': None,
+            'encode_profile': None,
+            'cache_proxy': None,
+            'audio_only': False
         }
         
         self.assertEqual(result, expected)
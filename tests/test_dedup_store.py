@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import tempfile
+import os
+import sys
+from pathlib import Path
+from unittest import mock
+
+# 添加src目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from xiaoet_downloader.core import dedup_store
+from xiaoet_downloader.core.dedup_store import SegmentDedupStore
+from xiaoet_downloader.core.downloader import VideoDownloader
+from xiaoet_downloader.models.config import XiaoetConfig
+from xiaoet_downloader.utils.url_utils import UrlUtils
+
+
+class TestSegmentDedupStore(unittest.TestCase):
+    """测试SegmentDedupStore类"""
+    
+    def setUp(self):
+        """设置测试环境"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.download_dir = self.temp_dir.name
+    
+    def tearDown(self):
+        """清理测试环境"""
+        self.temp_dir.cleanup()
+    
+    def test_stable_key_ignores_host_and_signature(self):
+        """测试稳定键忽略主机和签名参数"""
+        a = 'https://v-tos-k.xiaoeknow.com/p/drm/v.f230.ts?start=0&end=10&sign=abc&t=684e210e&us=x'
+        b = 'https://other-line.example.com/p/drm/v.f230.ts?end=10&start=0&sign=def&t=684e3000'
+        c = 'https://v-tos-k.xiaoeknow.com/p/drm/v.f230.ts?start=10&end=20&sign=abc'
+        self.assertEqual(UrlUtils.stable_key(a), UrlUtils.stable_key(b))
+        self.assertNotEqual(UrlUtils.stable_key(a), UrlUtils.stable_key(c))
+        self.assertEqual(UrlUtils.stable_path(a), '/p/drm/v.f230.ts?end=10&start=0')
+    
+    def test_link_refcount_and_gc(self):
+        """测试硬链接复用、引用计数和清理"""
+        store = SegmentDedupStore(self.download_dir)
+        key = UrlUtils.stable_key('https://cdn/p/v.ts?start=0')
+        first = os.path.join(self.download_dir, 'first.ts')
+        second = os.path.join(self.download_dir, 'second.ts')
+        with open(first, 'wb') as f:
+            f.write(b'segment-data')
+        
+        store.add(key, source=first)
+        self.assertEqual(store.link_into(key, second), len(b'segment-data'))
+        self.assertEqual(store.refcount(key), 2)
+        self.assertEqual(store.hits, 1)
+        
+        # 仍有引用时不清理
+        os.remove(first)
+        self.assertEqual(store.gc(), (0, 0))
+        os.remove(second)
+        self.assertEqual(store.gc(), (1, len(b'segment-data')))
+        self.assertIsNone(store.lookup(key))
+    
+    def test_add_without_hardlink(self):
+        """测试不能硬链接时不加入存储（副本没有引用计数，会被立即清理）"""
+        store = SegmentDedupStore(self.download_dir)
+        source = os.path.join(self.download_dir, 'v_0.ts')
+        with open(source, 'wb') as f:
+            f.write(b'segment-data')
+        with mock.patch.object(dedup_store.os, 'link', side_effect=OSError('not supported')):
+            self.assertFalse(store.add('ab' * 32, source))
+        self.assertIsNone(store.lookup('ab' * 32))
+    
+    def test_packed_layout_rejected(self):
+        """测试打包布局不能开启去重"""
+        config = XiaoetConfig(app_id='app', cookie='c', product_id='p', download_dir=self.download_dir,
+                              segment_layout='packed', segment_dedup=True)
+        with self.assertRaises(ValueError):
+            config.validate()
+        downloader = VideoDownloader(config)
+        downloader.session.close()
+        self.assertIsNone(downloader.dedup)
+        
+        config.segment_layout = 'files'
+        self.assertTrue(config.validate())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import tempfile
+import os
+import threading
+import time
+import sys
+from pathlib import Path
+
+# 添加src目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from xiaoet_downloader.core.encoder import EncodeProfile, ParallelEncoder
+
+
+class TestParallelEncoder(unittest.TestCase):
+    """测试ParallelEncoder的分块切分"""
+    
+    def setUp(self):
+        """设置测试环境"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.playlist = os.path.join(self.temp_dir.name, 'video.m3u8')
+        lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:10',
+                 '#EXT-X-KEY:METHOD=AES-128,URI="https://key.example.com/k1"']
+        for index in range(10):
+            if index == 6:
+                lines.append('#EXT-X-KEY:METHOD=AES-128,URI="https://key.example.com/k2"')
+            lines += ['#EXTINF:10.0,', f'v_{index}.ts']
+        lines.append('#EXT-X-ENDLIST')
+        with open(self.playlist, 'w', encoding='utf8') as f:
+            f.write('\n'.join(lines) + '\n')
+    
+    def tearDown(self):
+        """清理测试环境"""
+        self.temp_dir.cleanup()
+    
+    def test_split_on_segment_boundaries(self):
+        """测试按时长在片段边界切分，并在每块开头重复密钥标签"""
+        encoder = ParallelEncoder(EncodeProfile(chunk_seconds=30), runner=lambda ff: None)
+        chunks = encoder.split(self.playlist)
+        
+        self.assertEqual([chunk.duration for chunk in chunks], [30.0, 30.0, 30.0, 10.0])
+        for chunk in chunks:
+            self.assertEqual(chunk.lines[0], '#EXTM3U')
+            self.assertEqual(chunk.lines[-1], '#EXT-X-ENDLIST')
+            self.assertEqual(sum(1 for line in chunk.lines if line.startswith('#EXT-X-KEY')), 1)
+        
+        self.assertIn('k1', [line for line in chunks[1].lines if line.startswith('#EXT-X-KEY')][0])
+        self.assertIn('k2', [line for line in chunks[2].lines if line.startswith('#EXT-X-KEY')][0])
+        self.assertIn('k2', [line for line in chunks[3].lines if line.startswith('#EXT-X-KEY')][0])
+        self.assertEqual(chunks[3].lines[-2], os.path.join(self.temp_dir.name, 'v_9.ts'))
+        self.assertEqual(self._media_sequences(chunks), [0, 3, 6, 9])
+    
+    def test_media_sequence_for_implicit_iv(self):
+        """测试没有显式IV的加密播放列表中每块写入自己第一个片段的媒体序列号"""
+        lines = ['#EXTM3U', '#EXT-X-TARGETDURATION:10', '#EXT-X-MEDIA-SEQUENCE:100',
+                 '#EXT-X-KEY:METHOD=AES-128,URI="https://key.example.com/k1"']
+        for index in range(5):
+            lines += ['#EXTINF:10.0,', f'v_{index}.ts']
+        with open(self.playlist, 'w', encoding='utf8') as f:
+            f.write('\n'.join(lines + ['#EXT-X-ENDLIST']) + '\n')
+        
+        encoder = ParallelEncoder(EncodeProfile(chunk_seconds=20), runner=lambda ff: None)
+        chunks = encoder.split(self.playlist)
+        self.assertEqual(self._media_sequences(chunks), [100, 102, 104])
+        for chunk in chunks:
+            self.assertEqual(sum(1 for line in chunk.lines if line.startswith('#EXT-X-MEDIA-SEQUENCE')), 1)
+            self.assertTrue(any(line.startswith('#EXT-X-KEY') and 'IV=' not in line for line in chunk.lines))
+    
+    def test_jobs_limit(self):
+        """测试批量转码分配的并发数限制同时编码的分块数（配置的并发数更大时也生效）"""
+        lock = threading.Lock()
+        state = {'active': 0, 'peak': 0}
+        
+        def runner(ff):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(0.05)
+            with lock:
+                state['active'] -= 1
+        
+        encoder = ParallelEncoder(EncodeProfile(chunk_seconds=10, jobs=8), runner, jobs=2)
+        encoder.encode(self.playlist, os.path.join(self.temp_dir.name, 'out.mp4'),
+                       os.path.join(self.temp_dir.name, 'encode'))
+        self.assertEqual(state['peak'], 2)
+    
+    @staticmethod
+    def _media_sequences(chunks):
+        return [int(line.split(':', 1)[1]) for chunk in chunks for line in chunk.lines
+                if line.startswith('#EXT-X-MEDIA-SEQUENCE:')]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import random
+import tempfile
+import time
+import sys
+from pathlib import Path
+
+# 添加src目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+import m3u8
+import requests
+
+from xiaoet_downloader.core.downloader import VideoDownloader
+from xiaoet_downloader.core.fault_injection import (
+    FAULT_PROFILES, FaultInjectingServer, FaultInjectingSession, FaultInjector, FaultProfile
+)
+from xiaoet_downloader.core.line_selector import PlayLine
+from xiaoet_downloader.models.config import XiaoetConfig
+from xiaoet_downloader.models.segment import SegmentTable
+from xiaoet_downloader.models.video import VideoResource
+
+
+SEGMENT_COUNT = 24
+SEGMENT_SIZE = 32 * 1024
+
+# 各故障配置下完成整个视频的时间上限（秒），用于发现重试等待或退避被意外放大
+TIME_BUDGETS = {
+    'none': 2.0,
+    'resets': 3.0,
+    'slow': 4.0,
+    'truncated': 3.0,
+    'bursts': 3.0,
+    'expired': 3.0,
+    'mixed': 4.0,
+}
+
+
+def make_segments():
+    return [random.Random(index).randbytes(SEGMENT_SIZE) for index in range(SEGMENT_COUNT)]
+
+
+class TestFaultInjector(unittest.TestCase):
+    """测试故障决策"""
+
+    def test_deterministic(self):
+        """测试同一配置下决策可复现，且同一URL连续出错不超过上限"""
+        profile = FaultProfile('resets', reset_rate=0.9, seed=7)
+        urls = [f'http://cdn/seg_{index}.ts?sign=x' for index in range(20)]
+
+        def decisions():
+            injector = FaultInjector(profile)
+            return [injector.decide(url)[0] for url in urls for _ in range(3)]
+
+        first = decisions()
+        self.assertEqual(first, decisions())
+        self.assertIn(FaultInjector.RESET, first)
+        for offset in range(0, len(first), 3):
+            self.assertIn(None, first[offset:offset + 3])
+
+    def test_error_burst(self):
+        """测试错误突发延续到之后的请求"""
+        injector = FaultInjector(FaultProfile('bursts', error_rate=1.0, error_burst=3, max_consecutive=5))
+        faults = [injector.decide(f'http://cdn/seg_{index}.ts')[0] for index in range(3)]
+        self.assertEqual(faults, [FaultInjector.ERROR] * 3)
+        self.assertEqual(injector.injected[FaultInjector.ERROR], 3)
+
+
+class TestDownloadUnderFaults(unittest.TestCase):
+    """在各种故障下下载完整视频，检查完成情况、数据完整性和耗时"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.segments = make_segments()
+        config = XiaoetConfig(app_id='app', cookie='', product_id='p', download_dir=self.temp_dir.name)
+        self.downloader = VideoDownloader(config)
+        # 缩短重试等待，保持测试耗时稳定
+        self.downloader.RETRY_DELAY = 0.01
+        self.downloader.MAX_BACKOFF = 0.05
+
+    def tearDown(self):
+        self.downloader.session.close()
+        self.temp_dir.cleanup()
+
+    def resolve(self, server):
+        """模拟重新解析播放地址：获取带新签名的播放列表"""
+        response = requests.get(server.playlist_url, timeout=10)
+        response.raise_for_status()
+        table = SegmentTable.from_segments(m3u8.loads(response.text).data['segments'])
+        return [PlayLine('', server.playlist_url, playlist_text=response.text, table=table)]
+
+    def download(self, server, name):
+        resource = VideoResource(f'v_{name}', name)
+        lines = self.resolve(server)
+        start = time.monotonic()
+        result = self.downloader.download_m3u8_video(
+            resource, lines[0].play_url, self.temp_dir.name, lines=lines,
+            refresh=lambda: self.resolve(server)
+        )
+        return result, time.monotonic() - start
+
+    def assert_intact(self, result):
+        self.assertTrue(result.success, result.message)
+        for index, data in enumerate(self.segments):
+            with open(os.path.join(result.file_path, f'v_{index}.ts'), 'rb') as f:
+                self.assertEqual(f.read(), data, f'片段 {index} 内容不一致')
+
+    def test_profiles(self):
+        """测试所有预设故障配置"""
+        for name, profile in FAULT_PROFILES.items():
+            with self.subTest(profile=name), FaultInjectingServer(self.segments, profile) as server:
+                result, elapsed = self.download(server, name)
+                self.assert_intact(result)
+                self.assertLess(elapsed, TIME_BUDGETS[name])
+                if name != 'none':
+                    self.assertGreater(sum(server.injector.injected.values()), 0)
+                if name == 'expired':
+                    self.assertGreater(server.injector.generation, 0)
+                    self.assertGreater(self.downloader.url_refreshes, 0)
+                # 完整的片段表明截断的响应没有被当作成功写入
+                self.assertEqual(result.segment_table.total_size, SEGMENT_COUNT * SEGMENT_SIZE)
+
+    def test_session_wrapper(self):
+        """测试在客户端一侧注入故障"""
+        profile = FaultProfile('client', reset_rate=0.1, truncate_rate=0.2, error_rate=0.1, expire_rate=0.1)
+        self.downloader.session = FaultInjectingSession(self.downloader.session, profile)
+        self.downloader.fetcher.session = self.downloader.session
+        with FaultInjectingServer(self.segments) as server:
+            result, elapsed = self.download(server, 'client')
+        self.assert_intact(result)
+        self.assertLess(elapsed, TIME_BUDGETS['mixed'])
+        self.assertGreater(self.downloader.session.injector.injected[FaultInjector.TRUNCATE], 0)
+
+    def test_exhausted_retries(self):
+        """测试故障超过重试次数时视频标记为不完整，而不是写入错误的数据"""
+        profile = FaultProfile('broken', truncate_rate=1.0, max_consecutive=10)
+        self.downloader.session = FaultInjectingSession(self.downloader.session, profile)
+        self.downloader.fetcher.session = self.downloader.session
+        with FaultInjectingServer(self.segments[:3]) as server:
+            result, _ = self.download(server, 'broken')
+        self.assertFalse(result.success)
+        self.assertEqual(result.segment_table.completed_count, 0)
+        self.assertEqual(list(result.segment_table.expected_sizes), [SEGMENT_SIZE] * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
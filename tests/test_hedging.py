@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import threading
+import time
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# 添加src目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+import requests
+
+from xiaoet_downloader.core.hedging import HedgedFetcher, LatencyTracker
+
+
+class SlowFirstAttemptHandler(BaseHTTPRequestHandler):
+    """带 slow 参数的路径第一次请求很慢，之后的请求立即返回"""
+    
+    seen = set()
+    lock = threading.Lock()
+    
+    def log_message(self, *args):
+        pass
+    
+    def do_GET(self):
+        with self.lock:
+            first = self.path not in self.seen
+            self.seen.add(self.path)
+        if 'slow' in self.path and first:
+            time.sleep(2)
+        if 'stall' in self.path and first:
+            # 发送任何字节之前长时间阻塞
+            time.sleep(3)
+        body = self.path.encode() * 10
+        if 'trickle' in self.path and first:
+            # 发送响应头和部分内容后阻塞
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body[:4])
+            self.wfile.flush()
+            time.sleep(5)
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class TestHedgedFetcher(unittest.TestCase):
+    """测试HedgedFetcher类"""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), SlowFirstAttemptHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}'
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+    
+    def test_percentile(self):
+        """测试分位数计算"""
+        tracker = LatencyTracker(window=100, min_samples=10)
+        self.assertIsNone(tracker.percentile(0.95))
+        for value in range(100):
+            tracker.add(value / 100)
+        self.assertAlmostEqual(tracker.percentile(0.95), 0.95)
+    
+    def test_hedge_cuts_tail_latency(self):
+        """测试慢请求被对冲请求抢先完成"""
+        fetcher = HedgedFetcher(requests.Session(), enabled=True)
+        for index in range(25):
+            self.assertEqual(fetcher.get(f'{self.base_url}/warmup/{index}').status_code, 200)
+        
+        start = time.monotonic()
+        result = fetcher.get(f'{self.base_url}/slow/1')
+        elapsed = time.monotonic() - start
+        
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(result.content, b'/slow/1' * 10)
+        self.assertLess(elapsed, 1.5)
+        stats = fetcher.summary()
+        self.assertEqual(stats['hedges'], 1)
+        self.assertEqual(stats['hedge_wins'], 1)
+    
+    def test_tracks_end_to_end_latency(self):
+        """测试对冲获胜时记录从主请求开始的耗时，而不是对冲请求自身的耗时"""
+        fetcher = HedgedFetcher(requests.Session(), enabled=True, min_delay=0.3)
+        self._warm_up(fetcher)
+        
+        result = fetcher.get(f'{self.base_url}/slow/latency')
+        self.assertTrue(result.hedged)
+        self.assertGreaterEqual(fetcher.tracker._samples[-1], 0.3)
+        self.assertLess(result.elapsed, 0.3)
+    
+    def _warm_up(self, fetcher):
+        for index in range(25):
+            self.assertEqual(fetcher.get(f'{self.base_url}/warmup/{index}').status_code, 200)
+    
+    def test_stalled_losers_do_not_block(self):
+        """测试在第一个字节之前阻塞的落败请求不会拖慢后续请求"""
+        fetcher = HedgedFetcher(requests.Session(), enabled=True)
+        self._warm_up(fetcher)
+        # 落败请求各阻塞3秒：如果占用固定的线程池，后面的请求会排队等待
+        for index in range(12):
+            start = time.monotonic()
+            result = fetcher.get(f'{self.base_url}/stall/{index}')
+            self.assertEqual(result.status_code, 200)
+            self.assertTrue(result.hedged)
+            self.assertLess(time.monotonic() - start, 1.5)
+        self.assertEqual(fetcher.summary()['hedge_wins'], 12)
+    
+    def test_loser_connection_closed(self):
+        """测试收到响应头后阻塞的落败请求在取消时立即中止"""
+        fetcher = HedgedFetcher(requests.Session(), enabled=True)
+        self._warm_up(fetcher)
+        finished = []
+        fetch = fetcher._fetch
+        
+        def tracked_fetch(*args):
+            try:
+                return fetch(*args)
+            finally:
+                finished.append(time.monotonic())
+        
+        fetcher._fetch = tracked_fetch
+        result = fetcher.get(f'{self.base_url}/trickle/1')
+        returned = time.monotonic()
+        self.assertEqual(result.content, b'/trickle/1' * 10)
+        self.assertTrue(result.hedged)
+        # 服务器阻塞5秒，落败请求在取消后立即结束
+        deadline = returned + 1
+        while len(finished) < 2 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(len(finished), 2)
+    
+    def test_disabled(self):
+        """测试关闭对冲时不发重复请求"""
+        fetcher = HedgedFetcher(requests.Session(), enabled=False)
+        for index in range(25):
+            fetcher.get(f'{self.base_url}/plain/{index}')
+        self.assertEqual(fetcher.summary()['hedges'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import tempfile
+import shutil
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).parent.parent / 'src'
+MAIN_SCRIPT = Path(__file__).parent.parent / 'main.py'
+
+HEAVY_MODULES = ('requests', 'm3u8', 'ffmpy', 'httpx')
+# 转码器及其依赖，只检查环境时不应导入
+TRANSCODE_MODULES = ('xiaoet_downloader.core.transcoder', 'xiaoet_downloader.core.encoder',
+                     'xiaoet_downloader.core.verifier')
+# 延迟导入的模块：导入包和下载管理器的耗时应明显少于全部导入这些模块的耗时
+DEFERRED_IMPORTS = ('xiaoet_downloader.core.downloader', 'xiaoet_downloader.core.transcoder',
+                    'xiaoet_downloader.api.client')
+# 导入包和下载管理器的启动耗时上限（微秒，-X importtime 的累计耗时之和）
+IMPORT_BUDGET_US = 120_000
+# 每种导入测量的次数，取最小值以减少机器负载带来的波动
+MEASURE_RUNS = 3
+
+
+class TestImportTime(unittest.TestCase):
+    """测试启动时不导入重量级依赖、不创建日志文件"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _import_times(self, *args):
+        """在子进程中用 -X importtime 执行，返回 {模块名: 累计耗时}"""
+        env = dict(os.environ, PYTHONPATH=str(SRC_DIR))
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', *args],
+            cwd=self.temp_dir, env=env, capture_output=True, text=True, check=True
+        )
+        times = {}
+        for line in completed.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            times[name.strip()] = int(cumulative)
+        return times
+
+    def _min_import_time(self, code, modules):
+        """多次执行代码，返回指定顶层模块累计耗时之和的最小值"""
+        return min(sum(times.get(name, 0) for name in modules)
+                   for times in (self._import_times('-c', code) for _ in range(MEASURE_RUNS)))
+
+    def test_lazy_import(self):
+        """测试导入包和下载管理器不会导入requests、m3u8等模块"""
+        times = self._import_times(
+            '-c',
+            'import xiaoet_downloader\n'
+            'from xiaoet_downloader import XiaoetConfig, XiaoetDownloadManager, logger'
+        )
+        heavy = [name for name in times if name.split('.')[0] in HEAVY_MODULES]
+        self.assertEqual(heavy, [])
+        # 没有写日志时不创建日志目录
+        self.assertEqual(os.listdir(self.temp_dir), [])
+
+    def test_import_time_against_baseline(self):
+        """测试导入包和下载管理器的耗时不超过启动耗时上限，也不超过全部导入（包括延迟导入的模块）耗时的一半"""
+        lazy_modules = ('xiaoet_downloader', 'xiaoet_downloader.core.manager')
+        lazy = self._min_import_time(
+            'import xiaoet_downloader\nimport xiaoet_downloader.core.manager', lazy_modules)
+        self.assertLess(lazy, IMPORT_BUDGET_US)
+        eager = self._min_import_time(
+            'import xiaoet_downloader\nimport xiaoet_downloader.core.manager\n'
+            + ''.join(f'import {name}\n' for name in DEFERRED_IMPORTS),
+            lazy_modules + DEFERRED_IMPORTS)
+        self.assertLess(lazy * 2, eager)
+
+    def test_check_environment(self):
+        """测试 --check 只检查环境，不导入转码器和网络相关模块"""
+        config_file = os.path.join(self.temp_dir, 'config.json')
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump({'app_id': 'app', 'cookie': 'c', 'product_id': 'p', 'download_dir': 'download'}, f)
+        times = self._import_times(str(MAIN_SCRIPT), '--check', '--config', config_file)
+        imported = [name for name in times
+                    if name.split('.')[0] in HEAVY_MODULES or name in TRANSCODE_MODULES]
+        self.assertEqual(imported, [])
+        self.assertTrue(os.path.isdir(os.path.join(self.temp_dir, 'download')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import threading
+import time
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# 添加src目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+import requests
+
+from xiaoet_downloader.core.line_selector import PlayLine, PlayLineSet, PlayLineSelector
+from xiaoet_downloader.models.segment import SegmentTable
+from xiaoet_downloader.utils.url_utils import UrlUtils
+
+PLAYLIST = "#EXTM3U\n#EXT-X-TARGETDURATION:10\n" + "".join(
+    f"#EXTINF:10.0,\nv.f230.ts?start={index}\n" for index in range(3)
+) + "#EXT-X-ENDLIST\n"
+
+
+class TwoLineHandler(BaseHTTPRequestHandler):
+    """/slow/ 路径下的片段响应很慢，/fast/ 路径立即返回"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if '.m3u8' in self.path:
+            body = PLAYLIST.encode()
+        else:
+            if self.path.startswith('/slow/'):
+                time.sleep(0.3)
+            body = b'x' * 1024
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeAPIClient:
+    """每条线路返回不同主机路径的播放地址"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def get_play_url(self, user_id, play_sign, play_line='A'):
+        path = 'slow' if play_line == 'A' else 'fast'
+        return {'720p_hls': {'play_url': f'{self.base_url}/{path}/{play_line}/v.f230.m3u8?sign=1'}}
+
+    def get_best_quality_url(self, play_list_dict):
+        return play_list_dict['720p_hls']['play_url'], '720p_hls'
+
+
+def make_line(name, throughput=0.0):
+    """构造测试线路"""
+    line = PlayLine(name, f'https://{name}.cdn.com/p/v.f230.m3u8', '720p_hls',
+                    table=SegmentTable(['v.f230.ts?start=0', '/root/abs.ts']))
+    line.throughput = throughput
+    return line
+
+
+class TestPlayLine(unittest.TestCase):
+    """测试线路选择和故障转移"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), TwoLineHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_segment_url(self):
+        """测试各线路按自己的前缀拼接片段URL"""
+        line = make_line('b')
+        self.assertEqual(line.segment_url(0), 'https://b.cdn.com/p/v.f230.ts?start=0')
+        self.assertEqual(line.segment_url(1), 'https://b.cdn.com/root/abs.ts')
+        self.assertEqual(UrlUtils.playlist_prefix('https://x.com/a/b/index.m3u8?p=a/b'), 'https://x.com/a/b/')
+
+    def test_failover_on_errors(self):
+        """测试当前线路连续出错后切换到备用线路并停用"""
+        line_a, line_b = make_line('a', 100.0), make_line('b', 50.0)
+        line_set = PlayLineSet([line_a, line_b], max_failures=2)
+        line_set.record_failure(line_a)
+        self.assertIs(line_set.current, line_a)
+        line_set.record_failure(line_a)
+        self.assertIs(line_set.current, line_b)
+        self.assertTrue(line_a.disabled)
+        self.assertIsNone(line_set.alternate())
+
+    def test_failover_on_slowdown(self):
+        """测试吞吐量持续下降时切换到更快的线路"""
+        line_a, line_b = make_line('a', 1000.0), make_line('b', 800.0)
+        line_set = PlayLineSet([line_a, line_b], slow_factor=3.0, slow_limit=3)
+        for _ in range(2):
+            line_set.record_success(line_a, 100, 1.0)
+        self.assertIs(line_set.current, line_a)
+        line_set.record_success(line_a, 100, 1.0)
+        self.assertIs(line_set.current, line_b)
+        self.assertFalse(line_a.disabled)
+        self.assertEqual(line_set.switches, 1)
+
+    def test_select_fastest_line(self):
+        """测试测速后选择最快的线路"""
+        selector = PlayLineSelector(FakeAPIClient(self.base_url), requests.Session(), ['A', 'B'])
+        lines = selector.select('user', 'sign')
+        self.assertEqual([line.name for line in lines], ['B', 'A'])
+        self.assertEqual(sorted(lines[0].samples), [0, 1])
+        self.assertEqual(lines[1].samples, {})
+        self.assertTrue(lines[0].segment_url(2).startswith(f'{self.base_url}/fast/B/v.f230.ts'))
+
+    def test_truncated_sample_discarded(self):
+        """测试响应体短于Content-Length的测速片段不作为样本保存"""
+        class TruncatingSession:
+            def get(self, url, timeout=None):
+                response = requests.Response()
+                response.status_code = 200
+                response.headers['Content-Length'] = '1024'
+                response._content = b'x' * (512 if 'start=1' in url else 1024)
+                return response
+
+        selector = PlayLineSelector(FakeAPIClient(self.base_url), TruncatingSession(), ['A'])
+        line = PlayLine('A', f'{self.base_url}/fast/A/v.f230.m3u8',
+                        table=SegmentTable([f'v.f230.ts?start={index}' for index in range(3)]))
+        selector._benchmark(line)
+        self.assertEqual(sorted(line.samples), [0])
+        self.assertEqual(line.throughput, 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import json
+import os
+import tempfile
+import threading
+import time
+import sys
+from pathlib import Path
+
+# 添加src目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from xiaoet_downloader.core.line_selector import PlayLine
+from xiaoet_downloader.core.lookahead import LookaheadResolver
+from xiaoet_downloader.core.session_health import AuthExpiredError, SessionHealthMonitor
+from xiaoet_downloader.models.config import XiaoetConfig
+from xiaoet_downloader.models.video import VideoResource
+from xiaoet_downloader.utils.url_utils import UrlUtils
+
+
+class FakeResolve:
+    """记录解析顺序，第一次解析 v_1 时返回即将过期的地址"""
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, resource):
+        with self.lock:
+            self.calls.append(resource.resource_id)
+            first = self.calls.count(resource.resource_id) == 1
+        ttl = 10 if resource.resource_id == 'v_1' and first else 3600
+        expiry = format(int(time.time()) + ttl, 'x')
+        return [PlayLine('A', f'https://cdn.com/{resource.resource_id}/v.f230.m3u8?t={expiry}&sign=x')]
+
+
+class TestLookaheadResolver(unittest.TestCase):
+    """测试播放地址预解析"""
+
+    def setUp(self):
+        self.resources = [VideoResource(f'v_{index}', f'视频{index}') for index in range(4)]
+
+    def test_url_expiry(self):
+        """测试解析十六进制t参数和expires参数"""
+        self.assertEqual(UrlUtils.url_expiry('https://a.com/x.ts?t=5e8f3c2a&sign=1'), 0x5e8f3c2a)
+        self.assertEqual(UrlUtils.url_expiry('https://a.com/x.ts?Expires=1700000000'), 1700000000)
+        self.assertIsNone(UrlUtils.url_expiry('https://a.com/x.ts?start=0'))
+
+    def test_prefetch_ahead(self):
+        """测试取用时后续资源已在后台解析"""
+        resolve = FakeResolve()
+        resolver = LookaheadResolver(self.resources, resolve, depth=2, refresh_margin=60)
+        playback = resolver.get(0)
+        self.assertIn('/v_0/', playback.play_url)
+        time.sleep(0.2)
+        self.assertEqual(sorted(resolve.calls), ['v_0', 'v_1', 'v_2'])
+
+        resolver.get(2)
+        resolver.close()
+        self.assertEqual(resolver.hits, 1)
+
+    def test_refresh_expiring(self):
+        """测试即将过期的地址在取用时重新解析"""
+        resolve = FakeResolve()
+        resolver = LookaheadResolver(self.resources, resolve, depth=1, refresh_margin=60)
+        resolver.get(0)
+        playback = resolver.get(1)
+        resolver.close()
+        self.assertEqual(resolve.calls.count('v_1'), 2)
+        self.assertEqual(resolver.refreshes, 1)
+        self.assertFalse(playback.expiring(60))
+
+    def test_recover_after_cookie_reload(self):
+        """测试重新加载cookie后，登录失效期间预解析失败的资源重新解析而不再等待"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config_path = os.path.join(temp_dir, 'config.json')
+
+            def write_cookie(cookie):
+                with open(config_path, 'w', encoding='utf-8') as f:
+                    json.dump({'app_id': 'app', 'cookie': cookie, 'product_id': 'p_1'}, f)
+
+            write_cookie('old')
+            config = XiaoetConfig.from_file(config_path)
+            monitor = SessionHealthMonitor(config, lambda: config.cookie == 'new', config_path,
+                                           reload_timeout=2, poll_interval=0.05)
+            fake = FakeResolve()
+
+            def resolve(resource):
+                if config.cookie != 'new':
+                    raise AuthExpiredError('HTTP 401')
+                return fake(resource)
+
+            def with_session(action):
+                # 与下载管理器相同：登录失效时等待新的cookie后重试
+                while True:
+                    try:
+                        return action()
+                    except AuthExpiredError as e:
+                        if not monitor.wait_for_credentials(e):
+                            raise
+
+            resolver = LookaheadResolver(self.resources, resolve, depth=2, refresh_margin=0)
+            timer = threading.Timer(0.3, write_cookie, args=('new',))
+            timer.start()
+            started = time.monotonic()
+            playbacks = [with_session(lambda: resolver.get(position)) for position in range(3)]
+            timer.join()
+            resolver.close()
+            self.assertLess(time.monotonic() - started, 1.5)
+            self.assertEqual([playback.resource.resource_id for playback in playbacks], ['v_0', 'v_1', 'v_2'])
+            self.assertTrue(all(playback.lines for playback in playbacks))
+            self.assertEqual((monitor.expirations, monitor.reloads), (1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
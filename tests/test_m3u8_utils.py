@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import tempfile
+import os
+import sys
+from pathlib import Path
+
+# 添加src目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+import m3u8
+
+from xiaoet_downloader.utils.m3u8_utils import M3U8Utils
+
+
+PLAYLIST = """#EXTM3U
+#EXT-X-VERSION:3
+#EXT-X-TARGETDURATION:10
+#EXT-X-MEDIA-SEQUENCE:0
+#EXT-X-KEY:METHOD=AES-128,URI="https://key.example.com/get_key?sign=abc",IV=0x0102
+#EXTINF:10.000,
+v.f230.ts?start=0&end=100&type=mpegts&sign=abc
+
+#EXTINF:9.500,
+v.f230.ts?start=100&end=200&type=mpegts&sign=abc
+#EXTINF:3.2,
+https://cdn.example.com/path/v.f230.ts?start=200&end=240
+#EXT-X-ENDLIST
+"""
+
+MASTER_PLAYLIST = """#EXTM3U
+#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aac",NAME="English",DEFAULT=NO,URI="audio_en.m3u8"
+#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aac",NAME="中文",DEFAULT=YES,URI="audio_zh.m3u8"
+#EXT-X-STREAM-INF:BANDWIDTH=800000,CODECS="avc1.64001f,mp4a.40.2",AUDIO="aac"
+video_480.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=2500000,CODECS="avc1.640028,mp4a.40.2",AUDIO="aac"
+video_1080.m3u8
+"""
+
+
+class TestM3U8Utils(unittest.TestCase):
+    """测试M3U8Utils类"""
+    
+    def test_rewrite_playlist(self):
+        """测试流式重写只替换URI行"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_file = os.path.join(temp_dir, 'video.m3u8')
+            count = M3U8Utils.rewrite_playlist(
+                M3U8Utils.iter_lines(PLAYLIST), output_file,
+                lambda index, uri: f'v_{index}.ts'
+            )
+            self.assertEqual(count, 3)
+            self.assertFalse(os.path.exists(output_file + '.tmp'))
+            
+            with open(output_file, encoding='utf8') as f:
+                rewritten = m3u8.loads(f.read())
+        
+        original = m3u8.loads(PLAYLIST)
+        self.assertEqual([s.uri for s in rewritten.segments], ['v_0.ts', 'v_1.ts', 'v_2.ts'])
+        self.assertEqual([s.duration for s in rewritten.segments],
+                         [s.duration for s in original.segments])
+        self.assertEqual([s.key.uri for s in rewritten.segments],
+                         [s.key.uri for s in original.segments])
+        self.assertTrue(rewritten.is_endlist)
+    
+    def test_iter_lines(self):
+        """测试逐行遍历与 splitlines 结果一致"""
+        for text in (PLAYLIST, PLAYLIST.rstrip('\n'), '', '\n\n#EXTM3U'):
+            self.assertEqual(list(M3U8Utils.iter_lines(text)), text.splitlines())
+    
+    def test_select_rendition(self):
+        """测试从主播放列表选择码流和音轨"""
+        # 媒体播放列表不需要选择
+        self.assertIsNone(M3U8Utils.select_rendition(PLAYLIST))
+        self.assertEqual(M3U8Utils.select_rendition(MASTER_PLAYLIST), 'video_1080.m3u8')
+        # 只要音频时选择默认音轨
+        self.assertEqual(M3U8Utils.select_rendition(MASTER_PLAYLIST, audio_only=True), 'audio_zh.m3u8')
+        
+        # 没有独立音轨时选择只含音频的码流，也没有时退回码率最高的码流
+        audio_variant = """#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=2000000,CODECS="avc1.640028,mp4a.40.2"
+video.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=64000,CODECS="mp4a.40.2"
+audio.m3u8
+"""
+        self.assertEqual(M3U8Utils.select_rendition(audio_variant, audio_only=True), 'audio.m3u8')
+        self.assertEqual(M3U8Utils.select_rendition(audio_variant), 'video.m3u8')
+        video_only = audio_variant.split('#EXT-X-STREAM-INF:BANDWIDTH=64000')[0]
+        self.assertEqual(M3U8Utils.select_rendition(video_only, audio_only=True), 'video.m3u8')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import tempfile
+import os
+import sys
+from pathlib import Path
+
+# 添加src目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from xiaoet_downloader.core.output_index import OutputIndex
+from xiaoet_downloader.core.transcoder import VideoTranscoder
+from xiaoet_downloader.models.segment import SegmentTable
+from xiaoet_downloader.models.video import VideoResource
+from xiaoet_downloader.utils.file_utils import FileUtils
+
+from test_verifier import build_mp4
+
+
+class TestOutputIndex(unittest.TestCase):
+    """测试OutputIndex类"""
+    
+    def setUp(self):
+        """设置测试环境"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+    
+    def tearDown(self):
+        """清理测试环境"""
+        self.temp_dir.cleanup()
+    
+    def test_title_collision(self):
+        """测试同名课程分配不同的输出文件名"""
+        index = OutputIndex(self.temp_dir.name)
+        first = index.claim_name('v_1', '第一课', '.mp4')
+        second = index.claim_name('v_2', '第一课', '.mp4')
+        self.assertEqual(first, '第一课.mp4')
+        self.assertEqual(second, '第一课_v_2.mp4')
+        self.assertEqual(index.claim_name('v_1', '第一课', '.mp4'), first)
+    
+    def test_persistence(self):
+        """测试记录持久化后重新加载"""
+        index = OutputIndex(self.temp_dir.name)
+        name = index.claim_name('v_1', '第一课', '.mp4')
+        index.record('v_1', name, f'/data/{name}', 1024, 'abc')
+        self.assertTrue(index.is_done('v_1'))
+        
+        reloaded = OutputIndex(self.temp_dir.name)
+        self.assertTrue(reloaded.is_done('v_1'))
+        self.assertFalse(reloaded.is_done('v_2'))
+        self.assertEqual(reloaded.get('v_1')['size'], 1024)
+        self.assertEqual(reloaded.claim_name('v_2', '第一课', '.mp4'), '第一课_v_2.mp4')
+        
+        reloaded.remove('v_1')
+        self.assertFalse(OutputIndex(self.temp_dir.name).is_done('v_1'))
+    
+    def test_existing_output_verified(self):
+        """测试索引中没有记录的已存在输出文件校验通过才补录，不完整时重新合并"""
+        download_dir = self.temp_dir.name
+        resource_dir = os.path.join(download_dir, 'v_1')
+        os.makedirs(resource_dir)
+        FileUtils.save_json({'title': '第一课', 'complete': True, 'total_segments': 2},
+                            os.path.join(resource_dir, 'metadata.json'))
+        with open(os.path.join(resource_dir, 'video.m3u8'), 'w', encoding='utf-8') as f:
+            f.write('#EXTM3U\n#EXTINF:10.0,\nv_0.ts\n#EXTINF:10.0,\nv_1.ts\n#EXT-X-ENDLIST\n')
+        output_file = os.path.join(download_dir, '第一课.mp4')
+        muxed = []
+        
+        def run(ff):
+            muxed.append(ff.cmd)
+            with open(output_file, 'wb') as f:
+                f.write(build_mp4(duration=20.0))
+        
+        # 崩溃的合并留下的截断文件：重新合并
+        with open(output_file, 'wb') as f:
+            f.write(build_mp4(duration=20.0)[:200])
+        transcoder = VideoTranscoder(download_dir)
+        transcoder._run = run
+        result = transcoder.transcode_video(VideoResource('v_1', '第一课'))
+        self.assertTrue(result.success, result.message)
+        self.assertEqual(result.message, "合并完成")
+        self.assertEqual(len(muxed), 1)
+        
+        # 完整的文件：补录到索引，不再合并
+        transcoder.index.remove('v_1')
+        result = transcoder.transcode_video(VideoResource('v_1', '第一课'))
+        self.assertEqual(result.message, "文件已存在，跳过合并")
+        self.assertEqual(len(muxed), 1)
+        self.assertEqual(transcoder.index.get('v_1')['size'], os.path.getsize(output_file))
+    
+    def test_duration_from_segment_table(self):
+        """测试提供下载时的片段表时用其中的时长校验输出，不读取本地播放列表"""
+        download_dir = self.temp_dir.name
+        resource_dir = os.path.join(download_dir, 'v_1')
+        os.makedirs(resource_dir)
+        FileUtils.save_json({'title': '第一课', 'complete': True, 'total_segments': 2},
+                            os.path.join(resource_dir, 'metadata.json'))
+        output_file = os.path.join(download_dir, '第一课.mp4')
+        
+        def run(ff):
+            with open(output_file, 'wb') as f:
+                f.write(build_mp4(duration=20.0))
+        
+        transcoder = VideoTranscoder(download_dir)
+        transcoder._run = run
+        # 本地播放列表不存在：时长只能来自片段表
+        table = SegmentTable(['v_0.ts', 'v_1.ts'], [10.0, 10.0])
+        result = transcoder.transcode_video(VideoResource('v_1', '第一课'), table)
+        self.assertTrue(result.success, result.message)
+        self.assertEqual(transcoder.index.get('v_1')['duration'], 20.0)
+        
+        # 片段表的时长与输出不符时校验失败
+        transcoder.index.remove('v_1')
+        os.remove(output_file)
+        table = SegmentTable(['v_0.ts', 'v_1.ts'], [30.0, 30.0])
+        result = transcoder.transcode_video(VideoResource('v_1', '第一课'), table)
+        self.assertFalse(result.success)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import tempfile
+import threading
+import os
+import sys
+from pathlib import Path
+
+# 添加src目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+import ffmpy
+
+from xiaoet_downloader.core.output_storage import (
+    OutputStorage, S3OutputStorage, create_output_storage
+)
+from xiaoet_downloader.core.transcoder import VideoTranscoder
+
+# 模拟ffmpeg：先向stderr写入超过管道缓冲区的错误输出，再向stdout写入内容
+FAKE_FFMPEG = """
+import sys
+sys.stderr.write('e' * (1024 * 1024))
+sys.stderr.flush()
+sys.stdout.buffer.write(b'o' * 300 * 1024)
+sys.exit(int(sys.argv[1]))
+"""
+
+
+class FakeS3Client:
+    """内存中的S3兼容存储替身，只实现分片上传相关接口"""
+    
+    def __init__(self, fail_part=None):
+        self.objects = {}
+        self.uploads = {}
+        self.aborted = []
+        self.fail_part = fail_part
+        self.lock = threading.Lock()
+    
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = f'upload-{len(self.uploads) + 1}'
+        self.uploads[upload_id] = {}
+        return {'UploadId': upload_id}
+    
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        if PartNumber == self.fail_part:
+            raise IOError('connection reset')
+        with self.lock:
+            self.uploads[UploadId][PartNumber] = bytes(Body)
+        return {'ETag': f'"etag-{PartNumber}"'}
+    
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        numbers = [part['PartNumber'] for part in MultipartUpload['Parts']]
+        assert numbers == sorted(parts), numbers
+        self.objects[(Bucket, Key)] = b''.join(parts[number] for number in numbers)
+    
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId, None)
+        self.aborted.append(UploadId)
+    
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise KeyError(Key)
+        return {'ContentLength': len(self.objects[(Bucket, Key)])}
+
+
+class TestOutputStorage(unittest.TestCase):
+    """测试输出存储"""
+    
+    def setUp(self):
+        """设置测试环境"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+    
+    def tearDown(self):
+        """清理测试环境"""
+        self.temp_dir.cleanup()
+    
+    def test_local_writer(self):
+        """测试本地写入器提交前不可见"""
+        storage = create_output_storage(self.temp_dir.name)
+        self.assertIsInstance(storage, OutputStorage)
+        writer = storage.open_writer('a.mp4')
+        writer.write(b'abc')
+        self.assertFalse(storage.exists('a.mp4'))
+        self.assertEqual(writer.commit(), 3)
+        self.assertEqual(storage.size('a.mp4'), 3)
+    
+    def test_s3_multipart_upload(self):
+        """测试分片上传按顺序拼接"""
+        client = FakeS3Client()
+        storage = S3OutputStorage(self.temp_dir.name, 'bucket', prefix='course/',
+                                  concurrency=3, client=client)
+        part_size = storage.part_size
+        payload = os.urandom(1024) * (part_size * 3 // 1024 + 7)
+        
+        writer = storage.open_writer('lesson.mp4')
+        for start in range(0, len(payload), 300 * 1024):
+            writer.write(payload[start:start + 300 * 1024])
+        self.assertEqual(writer.commit(), len(payload))
+        
+        self.assertEqual(client.objects[('bucket', 'course/lesson.mp4')], payload)
+        self.assertTrue(storage.exists('lesson.mp4'))
+        self.assertEqual(storage.uri('lesson.mp4'), 's3://bucket/course/lesson.mp4')
+    
+    def test_s3_abort_on_failure(self):
+        """测试分片上传失败时取消上传"""
+        client = FakeS3Client(fail_part=2)
+        storage = S3OutputStorage(self.temp_dir.name, 'bucket', client=client)
+        writer = storage.open_writer('lesson.mp4')
+        writer.write(b'x' * storage.part_size * 2)
+        with self.assertRaises(IOError):
+            writer.commit()
+        self.assertEqual(client.aborted, ['upload-1'])
+        self.assertFalse(storage.exists('lesson.mp4'))
+    
+    def test_mux_to_stream_large_stderr(self):
+        """测试ffmpeg大量错误输出时管道输出不会互相阻塞"""
+        script = os.path.join(self.temp_dir.name, 'fake_ffmpeg.py')
+        with open(script, 'w', encoding='utf-8') as f:
+            f.write(FAKE_FFMPEG)
+        client = FakeS3Client()
+        storage = S3OutputStorage(self.temp_dir.name, 'bucket', client=client)
+        outcomes = {}
+        
+        def mux(exit_code):
+            transcoder = VideoTranscoder(self.temp_dir.name, storage,
+                                         command_prefix=[sys.executable, script, str(exit_code)])
+            try:
+                outcomes[exit_code] = transcoder._mux_to_stream('video.m3u8', f'out{exit_code}.mp4')
+            except ffmpy.FFRuntimeError as e:
+                outcomes[exit_code] = e
+        
+        for exit_code in (0, 1):
+            thread = threading.Thread(target=mux, args=(exit_code,), daemon=True)
+            thread.start()
+            thread.join(20)
+            self.assertFalse(thread.is_alive(), "ffmpeg管道输出互相阻塞")
+        self.assertEqual(client.objects[('bucket', 'out0.mp4')], b'o' * 300 * 1024)
+        self.assertIsInstance(outcomes[1], ffmpy.FFRuntimeError)
+        self.assertIn('eeee', str(outcomes[1]))
+        self.assertNotIn(('bucket', 'out1.mp4'), client.objects)
+    
+    def test_unknown_type(self):
+        """测试未知存储类型"""
+        with self.assertRaises(ValueError):
+            create_output_storage(self.temp_dir.name, {'type': 'ftp'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import io
+import sys
+from pathlib import Path
+
+# 添加src目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from xiaoet_downloader.core.progress import ProgressTracker, format_bytes, format_duration
+from xiaoet_downloader.models.segment import SegmentTable
+from xiaoet_downloader.models.video import VideoResource
+
+
+class TestProgressTracker(unittest.TestCase):
+    """测试进度汇总、平滑吞吐量和预计剩余时间"""
+
+    def setUp(self):
+        self.tracker = ProgressTracker(total_videos=2, stream=io.StringIO(), alpha=0.5)
+        self.video = VideoResource('v_1', '第一课')
+        self.table = SegmentTable([f'{index}.ts' for index in range(10)])
+
+    def complete(self, index, size, fetched=True):
+        self.table.mark_completed(index, size)
+        self.tracker.update(self.video, self.table, size if fetched else 0)
+
+    def test_aggregate(self):
+        """测试缓存片段计入进度但不计入下载字节"""
+        self.complete(0, 100, fetched=False)
+        self.complete(1, 100)
+        self.complete(2, 100)
+        snapshot = self.tracker.snapshot()
+        self.assertEqual(snapshot['completed_segments'], 3)
+        self.assertEqual(snapshot['downloaded_bytes'], 200)
+        self.assertEqual(snapshot['active'][0]['completed_segments'], 3)
+
+        self.tracker.finish_video(self.video, True)
+        snapshot = self.tracker.snapshot()
+        self.assertEqual(snapshot['finished_videos'], 1)
+        self.assertEqual(snapshot['active'], [])
+
+    def test_throughput_and_eta(self):
+        """测试指数加权平滑的吞吐量和视频、课程的预计剩余时间"""
+        self.tracker.sample(now=0.0)
+        for index in range(4):
+            self.complete(index, 100)
+        self.tracker.sample(now=1.0)
+        self.assertEqual(self.tracker.rate, 400.0)
+        for index in range(4, 5):
+            self.complete(index, 100)
+        self.tracker.sample(now=2.0)
+        self.assertEqual(self.tracker.rate, 250.0)
+
+        snapshot = self.tracker.snapshot()
+        # 本视频剩余5个片段（各100字节），本视频速度250字节/秒
+        self.assertAlmostEqual(snapshot['active'][0]['eta'], 2.0)
+        # 另一个视频按已知视频的平均片段数估计：剩余15个片段
+        self.assertAlmostEqual(snapshot['eta'], 6.0)
+
+    def test_plain_output(self):
+        """测试输出不是终端时每次刷新输出一行进度"""
+        self.complete(0, 2048)
+        self.assertFalse(self.tracker.tty)
+        line = self.tracker.format_line()
+        self.assertIn('视频 0/2', line)
+        self.assertIn('2.0 KB', line)
+        self.assertEqual(format_bytes(3 * 1024 * 1024), '3.0 MB')
+        self.assertEqual(format_duration(3725), '1:02:05')
+        self.assertEqual(format_duration(None), '--:--')
+
+
+if __name__ == '__main__':
+    unittest.main()
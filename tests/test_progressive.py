@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import random
+import tempfile
+import sys
+from pathlib import Path
+
+# 添加src目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from xiaoet_downloader.core.downloader import VideoDownloader
+from xiaoet_downloader.core.fault_injection import FaultInjectingServer
+from xiaoet_downloader.core.progressive import ProgressiveOutput
+from xiaoet_downloader.core.segment_store import create_segment_store
+from xiaoet_downloader.models.config import XiaoetConfig
+from xiaoet_downloader.models.video import VideoResource
+
+
+def build_playlist(count, key=None):
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:10']
+    if key:
+        lines.append(f'#EXT-X-KEY:METHOD=AES-128,URI="{key}"')
+    for index in range(count):
+        lines += [f'#EXTINF:10.0,', f'https://cdn.example.com/seg_{index}.ts?sign=abc']
+    lines.append('#EXT-X-ENDLIST')
+    return '\n'.join(lines) + '\n'
+
+
+class TestProgressiveOutput(unittest.TestCase):
+    """测试连续片段的追加顺序、live.m3u8和输出TS文件"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        # 每个片段为整数个TS包
+        self.segments = [bytes([0x47]) + random.Random(index).randbytes(187) for index in range(4)]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def read_live(self, live):
+        with open(live.live_path, encoding='utf-8') as f:
+            return f.read()
+
+    def check_layout(self, layout):
+        resource_dir = os.path.join(self.temp_dir.name, layout)
+        os.makedirs(resource_dir)
+        output_path = os.path.join(self.temp_dir.name, f'{layout}.ts')
+        store = create_segment_store(layout, resource_dir, len(self.segments))
+        store.open()
+        live = ProgressiveOutput(resource_dir, build_playlist(len(self.segments)), store, output_path)
+        live.open()
+        try:
+            # 乱序完成：片段1先完成时不输出，片段0完成后一起输出
+            for index, expected in ((1, 0), (0, 2), (3, 0)):
+                store.write(index, self.segments[index])
+                self.assertEqual(live.segment_ready(index), expected)
+            self.assertEqual(live.next_index, 2)
+            with open(output_path, 'rb') as f:
+                self.assertEqual(f.read(), b''.join(self.segments[:2]))
+            playlist = self.read_live(live)
+            self.assertIn('#EXT-X-PLAYLIST-TYPE:EVENT', playlist)
+            self.assertEqual(playlist.count('#EXTINF'), 2)
+            self.assertNotIn('#EXT-X-ENDLIST', playlist)
+
+            store.write(2, self.segments[2])
+            self.assertEqual(live.segment_ready(2), 2)
+            self.assertTrue(live.complete)
+        finally:
+            self.assertEqual(live.close(), output_path)
+            store.close()
+
+        with open(output_path, 'rb') as f:
+            self.assertEqual(f.read(), b''.join(self.segments))
+        playlist = self.read_live(live)
+        self.assertEqual(playlist.count('#EXTINF'), 4)
+        self.assertTrue(playlist.endswith('#EXT-X-ENDLIST\n'))
+        self.assertNotIn('cdn.example.com', playlist)
+
+    def test_files_layout(self):
+        self.check_layout('files')
+
+    def test_packed_layout(self):
+        self.check_layout('packed')
+
+    def test_incomplete(self):
+        """测试未完成时不返回输出文件，播放列表不结束"""
+        store = create_segment_store('files', self.temp_dir.name, len(self.segments))
+        store.open()
+        live = ProgressiveOutput(self.temp_dir.name, build_playlist(len(self.segments)), store,
+                                 os.path.join(self.temp_dir.name, 'out.ts'))
+        live.open()
+        store.write(0, self.segments[0])
+        live.segment_ready(0)
+        self.assertIsNone(live.close())
+        self.assertNotIn('#EXT-X-ENDLIST', self.read_live(live))
+
+    def test_encrypted(self):
+        """测试加密的播放列表只输出live.m3u8"""
+        output_path = os.path.join(self.temp_dir.name, 'out.ts')
+        store = create_segment_store('files', self.temp_dir.name, len(self.segments))
+        store.open()
+        live = ProgressiveOutput(self.temp_dir.name, build_playlist(len(self.segments), key='key.bin'),
+                                 store, output_path)
+        live.open()
+        for index, data in enumerate(self.segments):
+            store.write(index, data)
+            live.segment_ready(index)
+        self.assertIsNone(live.close())
+        self.assertFalse(os.path.exists(output_path))
+        playlist = self.read_live(live)
+        self.assertIn('#EXT-X-KEY:METHOD=AES-128', playlist)
+        self.assertTrue(playlist.endswith('#EXT-X-ENDLIST\n'))
+
+
+class TestProgressiveDownload(unittest.TestCase):
+    """测试下载器边下载边输出"""
+
+    def test_download(self):
+        segments = [bytes([0x47]) + random.Random(index).randbytes(187 + 188 * 10) for index in range(6)]
+        with tempfile.TemporaryDirectory() as temp_dir, FaultInjectingServer(segments) as server:
+            config = XiaoetConfig(app_id='app', cookie='', product_id='p', download_dir=temp_dir)
+            downloader = VideoDownloader(config)
+            output_path = os.path.join(temp_dir, 'lesson.ts')
+            result = downloader.download_m3u8_video(VideoResource('v_1', 'lesson'), server.playlist_url,
+                                                    temp_dir, progressive=True, progressive_output=output_path)
+            downloader.session.close()
+            self.assertTrue(result.success, result.message)
+            self.assertEqual(result.output_path, output_path)
+            with open(output_path, 'rb') as f:
+                self.assertEqual(f.read(), b''.join(segments))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import random
+import tempfile
+import sys
+from collections import Counter
+from pathlib import Path
+
+# 添加src目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from xiaoet_downloader.models.config import XiaoetConfig
+from xiaoet_downloader.models.video import VideoResource
+from xiaoet_downloader.core.fault_injection import FaultInjectingServer
+from xiaoet_downloader.core.manager import XiaoetDownloadManager
+from xiaoet_downloader.core.scheduler import CourseScheduler, create_policy
+
+
+class TestCourseScheduler(unittest.TestCase):
+    """测试CourseScheduler和排序策略"""
+    
+    def setUp(self):
+        """设置测试环境"""
+        self.resources = [
+            VideoResource('v_long', '长视频', published_at='2024-01-03 10:00:00'),
+            VideoResource('v_short', '短视频', published_at='2024-01-01 10:00:00'),
+            VideoResource('v_mid', '中等视频'),
+            VideoResource('v_new', '最新视频', published_at='2024-02-01 10:00:00'),
+        ]
+        self.summaries = {
+            'v_long': (1000, 10000.0),
+            'v_short': (10, 100.0),
+            'v_mid': (100, 1000.0),
+            'v_new': None,
+        }
+        self.temp_dir = tempfile.TemporaryDirectory()
+    
+    def tearDown(self):
+        """清理测试环境"""
+        self.temp_dir.cleanup()
+    
+    def _plan(self, name, priority_ids=None):
+        scheduler = CourseScheduler(create_policy(name, priority_ids))
+        queue = scheduler.plan(
+            self.resources,
+            lambda resource: self.summaries[resource.resource_id],
+            self.temp_dir.name
+        )
+        return [item.resource.resource_id for item in queue]
+    
+    def test_catalogue(self):
+        """测试默认保持目录顺序且不预读"""
+        scheduler = CourseScheduler()
+        queue = scheduler.plan(self.resources, lambda resource: self.fail("不应预读"), self.temp_dir.name)
+        self.assertEqual([item.resource.resource_id for item in queue],
+                         ['v_long', 'v_short', 'v_mid', 'v_new'])
+    
+    def test_shortest(self):
+        """测试片段最少优先，预读失败的排最后"""
+        self.assertEqual(self._plan('shortest'), ['v_short', 'v_mid', 'v_long', 'v_new'])
+    
+    def test_newest(self):
+        """测试最新发布优先"""
+        self.assertEqual(self._plan('newest'), ['v_new', 'v_long', 'v_short', 'v_mid'])
+    
+    def test_priority(self):
+        """测试显式优先级"""
+        self.assertEqual(self._plan('priority', ['v_mid', 'v_new']),
+                         ['v_mid', 'v_new', 'v_long', 'v_short'])
+    
+    def test_throughput_counts_cached_segments(self):
+        """测试剩余下载量最少优先会扣除已缓存片段"""
+        long_dir = Path(self.temp_dir.name) / 'v_long'
+        long_dir.mkdir()
+        for index in range(995):
+            (long_dir / f'v_{index}.ts').write_bytes(b'x')
+        self.assertEqual(self._plan('throughput'), ['v_long', 'v_short', 'v_mid', 'v_new'])
+    
+    def test_unknown_policy(self):
+        """测试未知策略"""
+        with self.assertRaises(ValueError):
+            create_policy('random')
+
+
+class CountingAPI:
+    """返回固定播放地址并统计getPlayUrl请求次数的API客户端"""
+    
+    def __init__(self, play_url):
+        self.play_url = play_url
+        self.play_url_calls = Counter()
+    
+    def get_micro_navigation_info(self):
+        return {'user_id': 'u_1'}
+    
+    def get_column_resources(self, product_id):
+        return [VideoResource('v_1', '第一课'), VideoResource('v_2', '第二课')]
+    
+    def get_video_detail_info(self, resource_id):
+        return {'play_sign': f'sign_{resource_id}'}
+    
+    def get_play_url(self, user_id, play_sign, play_line='A'):
+        self.play_url_calls[play_sign] += 1
+        return {'720p_hls': {'play_url': self.play_url}}
+    
+    def get_best_quality_url(self, play_list_dict):
+        return play_list_dict['720p_hls']['play_url'], '720p_hls'
+
+
+class TestPrereadReuse(unittest.TestCase):
+    """测试预读播放列表时获取的播放地址在下载时复用"""
+    
+    def test_preread_url_reused(self):
+        segments = [random.Random(index).randbytes(1024) for index in range(3)]
+        with tempfile.TemporaryDirectory() as temp_dir, FaultInjectingServer(segments) as server:
+            config = XiaoetConfig(app_id='app', cookie='c', product_id='p_1', download_dir=temp_dir)
+            manager = XiaoetDownloadManager(config)
+            api = CountingAPI(server.playlist_url)
+            manager.api_client = api
+            results = manager.download_course(auto_transcode=False, policy=create_policy('shortest'),
+                                              show_progress=False)
+            manager.downloader.session.close()
+            self.assertEqual(len(results['success']), 2)
+            self.assertTrue(os.path.exists(os.path.join(temp_dir, 'v_2', 'v_0.ts')))
+        self.assertEqual(api.play_url_calls, Counter({'sign_v_1': 1, 'sign_v_2': 1}))
+        self.assertEqual(manager._preread_urls, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import tempfile
+import os
+import sys
+from pathlib import Path
+from unittest import mock
+
+# 添加src目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from xiaoet_downloader.core.segment_store import PackedSegmentStore, SegmentStore, create_segment_store
+from xiaoet_downloader.utils.file_utils import FileUtils
+
+
+class TestSegmentStore(unittest.TestCase):
+    """测试片段存储"""
+    
+    def setUp(self):
+        """设置测试环境"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.resource_dir = self.temp_dir.name
+        self.segments = [bytes([index]) * (100 + index) for index in range(5)]
+    
+    def tearDown(self):
+        """清理测试环境"""
+        self.temp_dir.cleanup()
+    
+    def test_files_layout(self):
+        """测试每个片段一个文件的布局"""
+        store = create_segment_store('files', self.resource_dir, len(self.segments))
+        self.assertIsInstance(store, SegmentStore)
+        store.open()
+        store.write(0, self.segments[0])
+        store.close()
+        
+        reopened = create_segment_store('files', self.resource_dir, len(self.segments))
+        reopened.open()
+        self.assertEqual(reopened.cached_size(0), 100)
+        self.assertEqual(reopened.cached_size(1), 0)
+        self.assertEqual(reopened.playlist_entry(0, 'remote.ts'), 'v_0.ts')
+    
+    def test_scan_dir(self):
+        """测试目录扫描只返回文件，跳过子目录和其他后缀"""
+        for name in ('v_0.ts', 'v_1.ts', 'v_1.ts.tmp', 'index.m3u8'):
+            Path(self.resource_dir, name).write_bytes(b'x')
+        Path(self.resource_dir, 'v_1.ts').write_bytes(b'xyz')
+        os.mkdir(os.path.join(self.resource_dir, 'v_9.ts'))
+        self.assertEqual(FileUtils.scan_dir(self.resource_dir, suffix='.ts'), {'v_0.ts', 'v_1.ts'})
+        self.assertEqual(FileUtils.scan_dir(os.path.join(self.resource_dir, 'missing')), set())
+        self.assertEqual(FileUtils.scan_file_sizes(self.resource_dir, suffix='.ts'), {'v_0.ts': 1, 'v_1.ts': 3})
+        self.assertEqual(FileUtils.scan_file_sizes(os.path.join(self.resource_dir, 'missing')), {})
+    
+    def test_cached_sizes_from_scan(self):
+        """测试已缓存片段的大小取自打开时的目录扫描，不逐个获取文件大小"""
+        store = SegmentStore(self.resource_dir, len(self.segments))
+        store.open()
+        for index in (0, 2):
+            store.write(index, self.segments[index])
+        
+        reopened = SegmentStore(self.resource_dir, len(self.segments))
+        with mock.patch.object(FileUtils, 'get_file_size', wraps=FileUtils.get_file_size) as get_size, \
+                mock.patch.object(os.path, 'getsize', wraps=os.path.getsize) as getsize:
+            reopened.open()
+            sizes = [reopened.cached_size(index) for index in range(len(self.segments))]
+        self.assertEqual(sizes, [100, 0, 102, 0, 0])
+        self.assertEqual([reopened.has_segment(index) for index in range(3)], [True, False, True])
+        self.assertEqual((get_size.call_count, getsize.call_count), (0, 0))
+        
+        store.open(nocache=True)
+        self.assertEqual(store.cached_size(0), 0)
+    
+    def test_packed_layout_roundtrip(self):
+        """测试打包布局乱序写入、重新打开和内存映射读取"""
+        store = create_segment_store('packed', self.resource_dir, len(self.segments))
+        self.assertIsInstance(store, PackedSegmentStore)
+        store.open()
+        for index in (2, 0, 1, 4):
+            store.write(index, self.segments[index])
+        store.close()
+        
+        pack_size = os.path.getsize(os.path.join(self.resource_dir, 'segments.pack'))
+        self.assertEqual(pack_size, sum(len(self.segments[i]) for i in (0, 1, 2, 4)))
+        
+        reopened = PackedSegmentStore(self.resource_dir, len(self.segments))
+        reopened.open()
+        self.assertEqual(reopened.cached_size(3), 0)
+        self.assertEqual(reopened.cached_size(4), 104)
+        offset, length = reopened.entry(0)
+        self.assertEqual(reopened.playlist_entry(0, 'remote.ts'),
+                         f'#EXT-X-BYTERANGE:{length}@{offset}\nsegments.pack')
+        self.assertEqual(reopened.playlist_entry(3, 'remote.ts'), 'remote.ts')
+        
+        reopened.write(3, self.segments[3])
+        reopened.close()
+        
+        data = {index: bytes(view) for index, view in reopened.iter_segments()}
+        self.assertEqual(data, dict(enumerate(self.segments)))
+    
+    def test_packed_nocache(self):
+        """测试忽略缓存时清空容器文件"""
+        store = PackedSegmentStore(self.resource_dir, len(self.segments))
+        store.open()
+        store.write(0, self.segments[0])
+        store.close()
+        
+        store = PackedSegmentStore(self.resource_dir, len(self.segments))
+        store.open(nocache=True)
+        self.assertEqual(store.cached_size(0), 0)
+        store.close()
+    
+    def test_unknown_layout(self):
+        """测试未知布局"""
+        with self.assertRaises(ValueError):
+            create_segment_store('zip', self.resource_dir, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
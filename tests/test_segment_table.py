@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import sys
+from pathlib import Path
+
+# 添加src目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from xiaoet_downloader.models.segment import SegmentTable, SegmentStatus
+
+
+class TestSegmentTable(unittest.TestCase):
+    """测试SegmentTable类"""
+    
+    def setUp(self):
+        """设置测试环境"""
+        self.segments = [
+            {'uri': 'v.f230.ts?start=0&end=100', 'duration': 10.0},
+            {'uri': 'v.f230.ts?start=100&end=200', 'duration': 9.5},
+            {'uri': 'https://cdn.example.com/v.f230.ts?start=200', 'duration': 2.5},
+        ]
+        self.table = SegmentTable.from_segments(self.segments)
+    
+    def test_uris_and_durations(self):
+        """测试URI和时长读取"""
+        self.assertEqual(len(self.table), 3)
+        for index, segment in enumerate(self.segments):
+            self.assertEqual(self.table.uri(index), segment['uri'])
+        self.assertAlmostEqual(self.table.total_duration, 22.0)
+    
+    def test_status_counts(self):
+        """测试状态计数"""
+        self.assertEqual(self.table.count(SegmentStatus.PENDING), 3)
+        self.assertFalse(self.table.is_complete)
+        
+        self.table.set_status(0, SegmentStatus.DOWNLOADING)
+        self.table.mark_completed(0, 1024)
+        self.table.mark_failed(1)
+        self.assertEqual(self.table.completed_count, 1)
+        self.assertEqual(self.table.count(SegmentStatus.FAILED), 1)
+        self.assertEqual(self.table.count(SegmentStatus.PENDING), 1)
+        self.assertEqual(list(self.table.indices(SegmentStatus.FAILED)), [1])
+        
+        self.table.mark_completed(1, 2048)
+        self.table.mark_completed(2, 512)
+        self.assertTrue(self.table.is_complete)
+        self.assertEqual(self.table.total_size, 3584)
+    
+    def test_retries(self):
+        """测试重试计数"""
+        self.assertEqual(self.table.add_retry(2), 1)
+        self.assertEqual(self.table.add_retry(2), 2)
+        self.assertEqual(self.table.retries[0], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import tempfile
+import shutil
+import json
+import os
+import threading
+import sys
+from pathlib import Path
+
+# 添加src目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from xiaoet_downloader.core.session_health import AuthExpiredError, SessionHealthMonitor, check_auth_response
+from xiaoet_downloader.models.config import XiaoetConfig
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, url='https://app.h5.xiaoeknow.com/api', history=(), headers=None):
+        self.status_code = status_code
+        self.url = url
+        self.history = list(history)
+        self.headers = headers or {}
+
+
+class TestSessionHealth(unittest.TestCase):
+    """测试登录失效的识别和cookie重新加载"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.temp_dir, 'config.json')
+        self.write_cookie('old')
+        self.config = XiaoetConfig.from_file(self.config_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write_cookie(self, cookie):
+        with open(self.config_path, 'w', encoding='utf-8') as f:
+            json.dump({'app_id': 'app', 'cookie': cookie, 'product_id': 'p_1'}, f)
+
+    def test_check_auth_response(self):
+        """测试识别401/403、登录页重定向和未登录的业务错误"""
+        check_auth_response(FakeResponse(), {'code': 0, 'data': {}})
+        check_auth_response(FakeResponse(), {'code': 500, 'msg': '服务繁忙'})
+        for response, body in (
+            (FakeResponse(401), None),
+            (FakeResponse(url='https://app.xiaoeknow.com/login?from=api', history=[object()]), None),
+            (FakeResponse(302, headers={'location': '/login'}), None),
+            (FakeResponse(), {'code': 2, 'msg': '请先登录'}),
+        ):
+            with self.assertRaises(AuthExpiredError):
+                check_auth_response(response, body)
+
+    def test_suspect(self):
+        """测试空数据只在确认登录失效时才抛出异常"""
+        SessionHealthMonitor(self.config, lambda: True).suspect('空数据')
+        with self.assertRaises(AuthExpiredError):
+            SessionHealthMonitor(self.config, lambda: False).suspect('空数据')
+
+    def test_wait_for_credentials(self):
+        """测试等待配置文件中的cookie更新后重新加载"""
+        error = AuthExpiredError('空数据')
+        self.assertFalse(SessionHealthMonitor(self.config, lambda: False, self.config_path).wait_for_credentials(error))
+
+        monitor = SessionHealthMonitor(self.config, lambda: self.config.cookie == 'new',
+                                       self.config_path, reload_timeout=5, poll_interval=0.05)
+        timer = threading.Timer(0.2, self.write_cookie, args=('new',))
+        timer.start()
+        self.assertTrue(monitor.wait_for_credentials(error))
+        timer.join()
+        self.assertEqual(self.config.cookie, 'new')
+        self.assertEqual(monitor.reloads, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
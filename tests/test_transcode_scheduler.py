@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import tempfile
+import threading
+import time
+import sys
+from pathlib import Path
+from unittest import mock
+
+# 添加src目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from xiaoet_downloader.core import transcode_scheduler
+from xiaoet_downloader.core.transcode_scheduler import TranscodeScheduler, build_priority_prefix
+from xiaoet_downloader.core.transcoder import VideoTranscoder
+from xiaoet_downloader.models.video import DownloadResult, ResourceType, VideoResource
+from xiaoet_downloader.utils.file_utils import FileUtils
+
+
+class TestPriorityPrefix(unittest.TestCase):
+    """测试降低ffmpeg优先级的命令前缀"""
+
+    def test_prefix(self):
+        with mock.patch.object(transcode_scheduler.sys, 'platform', 'linux'), \
+                mock.patch.object(transcode_scheduler.shutil, 'which', lambda name: f'/usr/bin/{name}'):
+            self.assertEqual(build_priority_prefix(), [])
+            self.assertEqual(build_priority_prefix(10, ionice=True), ['ionice', '-c', '3', 'nice', '-n', '10'])
+            self.assertEqual(build_priority_prefix(0), ['nice', '-n', '0'])
+
+    def test_missing_commands(self):
+        """测试系统没有nice/ionice命令或为Windows时不加前缀"""
+        with mock.patch.object(transcode_scheduler.sys, 'platform', 'linux'), \
+                mock.patch.object(transcode_scheduler.shutil, 'which', lambda name: None):
+            self.assertEqual(build_priority_prefix(10, ionice=True), [])
+        with mock.patch.object(transcode_scheduler.sys, 'platform', 'win32'):
+            self.assertEqual(build_priority_prefix(10, ionice=True), [])
+
+
+class TestTranscodeScheduler(unittest.TestCase):
+    """测试批量转码的并发数、资源扫描和并行执行"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.download_dir = self.temp_dir.name
+        self.transcoder = VideoTranscoder(self.download_dir, command_prefix=['taskset', '-c', '0'])
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_job_limits(self):
+        """测试并发数取CPU并发与IO并发上限中的较小值"""
+        self.assertEqual(TranscodeScheduler(self.transcoder, max_jobs=8, io_jobs=2).jobs, 2)
+        self.assertEqual(TranscodeScheduler(self.transcoder, max_jobs=2, io_jobs=8).jobs, 2)
+        self.assertEqual(TranscodeScheduler(self.transcoder, max_jobs=16).jobs, TranscodeScheduler.DEFAULT_IO_JOBS)
+        with mock.patch.object(transcode_scheduler.os, 'cpu_count', return_value=None):
+            self.assertEqual(TranscodeScheduler(self.transcoder).jobs, 1)
+
+    def test_encode_jobs(self):
+        """测试CPU并发在同时转码的视频之间平分"""
+        self.assertEqual(TranscodeScheduler(self.transcoder, max_jobs=8, io_jobs=2).transcoder.encode_jobs, 4)
+        self.assertEqual(TranscodeScheduler(self.transcoder, max_jobs=3, io_jobs=2).transcoder.encode_jobs, 1)
+
+    def test_transcoder_settings(self):
+        """测试调度器的转码器追加优先级前缀并共享输出索引"""
+        with mock.patch.object(transcode_scheduler, 'build_priority_prefix', return_value=['nice', '-n', '5']):
+            scheduler = TranscodeScheduler(self.transcoder, nice=5)
+        self.assertEqual(scheduler.transcoder.command_prefix, ['taskset', '-c', '0', 'nice', '-n', '5'])
+        self.assertEqual(self.transcoder.command_prefix, ['taskset', '-c', '0'])
+        self.assertIs(scheduler.transcoder.index, self.transcoder.index)
+        self.assertIs(scheduler.transcoder.storage, self.transcoder.storage)
+
+    def test_audio_only_preserved(self):
+        """测试调度器的转码器保留只输出音频的设置"""
+        transcoder = VideoTranscoder(self.download_dir, segment_layout='packed', audio_only=True)
+        scheduler = TranscodeScheduler(transcoder, max_jobs=2)
+        self.assertTrue(scheduler.transcoder.audio_only)
+        self.assertEqual(scheduler.transcoder.segment_layout, 'packed')
+        self.assertIsNone(transcoder.encode_jobs)
+
+    def test_find_downloaded_resources(self):
+        """测试只找出有元数据的视频和音频资源目录"""
+        for name, title in (('v_2', '第二课'), ('a_1', '音频课'), ('v_3', ''), ('t_1', '图文')):
+            os.makedirs(os.path.join(self.download_dir, name))
+            FileUtils.save_json({'title': title, 'complete': True}, os.path.join(self.download_dir, name, 'metadata.json'))
+        # 没有元数据的目录和片段存储等内部目录
+        os.makedirs(os.path.join(self.download_dir, 'v_4'))
+        os.makedirs(os.path.join(self.download_dir, '.segment_store'))
+        Path(self.download_dir, 'v_5').write_text('not a directory')
+
+        resources = self.transcoder.find_downloaded_resources()
+        self.assertEqual([(r.resource_id, r.title, r.resource_type) for r in resources], [
+            ('a_1', '音频课', ResourceType.AUDIO),
+            ('v_2', '第二课', ResourceType.VIDEO),
+            ('v_3', 'v_3', ResourceType.VIDEO),
+        ])
+
+    def test_run_parallel(self):
+        """测试同时运行的转码任务数不超过并发数，异常记为失败"""
+        scheduler = TranscodeScheduler(self.transcoder, max_jobs=2, io_jobs=4)
+        lock = threading.Lock()
+        state = {'active': 0, 'peak': 0}
+
+        def transcode(resource):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(0.05)
+            with lock:
+                state['active'] -= 1
+            if resource.resource_id == 'v_3':
+                raise RuntimeError('ffmpeg崩溃')
+            return DownloadResult(resource, True, "合并完成")
+
+        scheduler.transcoder.transcode_video = transcode
+        resources = [VideoResource(f'v_{index}', f'第{index}课') for index in range(6)]
+        results = scheduler.run(resources)
+        self.assertEqual(state['peak'], 2)
+        self.assertEqual(len(results['success']), 5)
+        self.assertEqual([r.resource.resource_id for r in results['failed']], ['v_3'])
+        self.assertIn('ffmpeg崩溃', results['failed'][0].message)
+
+        self.assertEqual(scheduler.run([]), {'success': [], 'failed': []})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import threading
+import json
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# 添加src目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+import requests
+
+from xiaoet_downloader.core.transport import Http2Session, create_http_session
+
+try:
+    import httpx  # noqa: F401
+    import h2  # noqa: F401
+    HAS_HTTP2 = True
+except ImportError:
+    HAS_HTTP2 = False
+
+
+LINES_BODY = '#EXTM3U\n#EXTINF:10.0,第一段\r\nseg_0.ts\n\n#EXT-X-ENDLIST'.encode('utf-8')
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    """GET返回路径，POST返回请求体和请求头，/missing 返回404"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/missing':
+            self._reply(404, b'')
+        elif self.path == '/lines':
+            # 没有声明字符集的多行文本
+            self._reply(200, LINES_BODY)
+        else:
+            self._reply(200, self.path.encode() * 100)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self._reply(200, json.dumps({'body': body.decode(), 'ua': self.headers['User-Agent']}).encode())
+
+
+class TestTransport(unittest.TestCase):
+    """测试HTTP传输"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), EchoHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_http1_by_default(self):
+        """测试默认使用requests会话"""
+        session = create_http_session(False, {'User-Agent': 'test'})
+        self.assertIsInstance(session, requests.Session)
+        self.assertEqual(session.headers['User-Agent'], 'test')
+
+    @unittest.skipUnless(HAS_HTTP2, "未安装httpx[http2]")
+    def test_http2_session_interface(self):
+        """测试HTTP/2会话与requests接口一致，明文服务器自动使用HTTP/1.1"""
+        session = create_http_session(True, {'User-Agent': 'test'})
+        self.assertIsInstance(session, Http2Session)
+
+        response = session.get(f'{self.base_url}/seg.ts', timeout=5, stream=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.iter_content(64)), b'/seg.ts' * 100)
+        response.close()
+        self.assertEqual(session.protocols['HTTP/1.1'], 1)
+
+        response = session.post(f'{self.base_url}/api', data={'a': '1'}, timeout=5)
+        self.assertEqual(response.json(), {'body': 'a=1', 'ua': 'test'})
+        response = session.post(f'{self.base_url}/api', data='{"b": 2}', timeout=5)
+        self.assertEqual(response.json()['body'], '{"b": 2}')
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            session.get(f'{self.base_url}/missing', timeout=5).raise_for_status()
+        session.close()
+
+    @unittest.skipUnless(HAS_HTTP2, "未安装httpx[http2]")
+    def test_http2_response_matches_requests(self):
+        """测试HTTP/2响应的encoding、iter_lines、headers、url和上下文管理与requests一致"""
+        sessions = [create_http_session(False), create_http_session(True)]
+        observed = []
+        for session in sessions:
+            with session.get(f'{self.base_url}/lines', timeout=5, stream=True) as response:
+                self.assertIsNone(response.encoding)
+                self.assertEqual(response.headers.get('content-length'), str(len(LINES_BODY)))
+                self.assertEqual(response.headers['Content-Length'], str(len(LINES_BODY)))
+                self.assertEqual(response.url, f'{self.base_url}/lines')
+                response.encoding = response.encoding or 'utf-8'
+                # 小块读取，多字节字符和换行符跨块
+                observed.append(list(response.iter_lines(chunk_size=5, decode_unicode=True)))
+            with session.get(f'{self.base_url}/lines', timeout=5, stream=True) as response:
+                observed.append(list(response.iter_lines(chunk_size=3)))
+            session.close()
+        self.assertEqual(observed[0], observed[2])
+        self.assertEqual(observed[1], observed[3])
+        self.assertIn('#EXTINF:10.0,第一段', observed[2])
+        self.assertEqual(observed[2][-1], '#EXT-X-ENDLIST')
+        self.assertTrue(all(isinstance(line, bytes) for line in observed[3]))
+
+    @unittest.skipUnless(HAS_HTTP2, "未安装httpx[http2]")
+    def test_connection_error_mapping(self):
+        """测试传输错误转换为requests异常"""
+        session = create_http_session(True)
+        with self.assertRaises(requests.exceptions.RequestException):
+            session.get('http://127.0.0.1:1/unreachable', timeout=2)
+        session.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import struct
+import tempfile
+import sys
+from pathlib import Path
+
+# 添加src目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from xiaoet_downloader.core.output_index import OutputIndex
+from xiaoet_downloader.core.verifier import LibraryVerifier, OutputVerifier, read_mp4_info
+
+
+def box(box_type, payload):
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def full_box(box_type, payload, version=0):
+    return box(box_type, struct.pack('>I', version << 24) + payload)
+
+
+def build_mp4(duration=20.0, samples=10, keyframe_every=5, sample_size=64):
+    """
+    生成最小的MP4：ftyp + mdat + moov（moov在末尾），一个H.264视频轨道，
+    每个样本为一个长度前缀的NAL单元，每个样本一个chunk
+    """
+    sample_data = [struct.pack('>I', sample_size - 4) + bytes([0x65 if i % keyframe_every == 0 else 0x41])
+                   + bytes(sample_size - 5) for i in range(samples)]
+    ftyp = box(b'ftyp', b'isom' + struct.pack('>I', 512) + b'isomavc1')
+    mdat_offset = len(ftyp) + 8
+    mdat = box(b'mdat', b''.join(sample_data))
+    offsets = [mdat_offset + i * sample_size for i in range(samples)]
+
+    timescale = 1000
+    mvhd = full_box(b'mvhd', struct.pack('>IIII', 0, 0, timescale, int(duration * timescale)) + bytes(80))
+    hdlr = full_box(b'hdlr', struct.pack('>I4s', 0, b'vide') + bytes(12) + b'\0')
+    stsd = full_box(b'stsd', struct.pack('>I', 1) + box(b'avc1', bytes(78)))
+    stsz = full_box(b'stsz', struct.pack('>II', 0, samples) + struct.pack(f'>{samples}I', *[sample_size] * samples))
+    keyframes = [i + 1 for i in range(0, samples, keyframe_every)]
+    stss = full_box(b'stss', struct.pack('>I', len(keyframes)) + struct.pack(f'>{len(keyframes)}I', *keyframes))
+    stsc = full_box(b'stsc', struct.pack('>IIII', 1, 1, 1, 1))
+    stco = full_box(b'stco', struct.pack('>I', samples) + struct.pack(f'>{samples}I', *offsets))
+    stbl = box(b'stbl', stsd + stsz + stss + stsc + stco)
+    trak = box(b'trak', box(b'mdia', hdlr + box(b'minf', stbl)))
+    moov = box(b'moov', mvhd + trak)
+    return ftyp + mdat + moov
+
+
+class TestOutputVerifier(unittest.TestCase):
+    """测试单个MP4文件的校验"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'video.mp4')
+        self.verifier = OutputVerifier(probe=False)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write(self, data):
+        with open(self.path, 'wb') as f:
+            f.write(data)
+
+    def test_valid(self):
+        """测试完整的文件通过校验"""
+        self.write(build_mp4(duration=20.0))
+        info = read_mp4_info(self.path)
+        self.assertAlmostEqual(info.duration, 20.0)
+        self.assertEqual(info.video.keyframes(), [0, 5])
+
+        result = self.verifier.verify_file(self.path, 20.4)
+        self.assertTrue(result.ok, result.message)
+        self.assertEqual(result.keyframes_checked, 2)
+
+    def test_truncated(self):
+        """测试被截断的文件（moov丢失或box超出文件末尾）"""
+        data = build_mp4()
+        self.write(data[:-100])
+        result = self.verifier.verify_file(self.path, 20.0)
+        self.assertFalse(result.ok)
+        self.assertIn('截断', result.message)
+
+        self.write(b'')
+        self.assertFalse(self.verifier.verify_file(self.path).ok)
+
+    def test_duration_mismatch(self):
+        """测试容器时长与播放列表时长不一致"""
+        self.write(build_mp4(duration=12.0))
+        result = self.verifier.verify_file(self.path, 20.0)
+        self.assertFalse(result.ok)
+        self.assertIn('时长不一致', result.message)
+
+    def test_corrupted_keyframe(self):
+        """测试关键帧数据损坏"""
+        data = bytearray(build_mp4(sample_size=64))
+        # 第6个样本（关键帧）的NAL长度改为超出样本
+        offset = data.index(b'mdat') + 4 + 5 * 64
+        data[offset:offset + 4] = struct.pack('>I', 1000)
+        self.write(bytes(data))
+        result = self.verifier.verify_file(self.path, 20.0)
+        self.assertFalse(result.ok)
+        self.assertIn('关键帧 5', result.message)
+
+    def test_ts(self):
+        """测试边下载边输出的TS文件：整数个TS包、同步字节"""
+        self.path = os.path.join(self.temp_dir.name, 'video.ts')
+        packet = bytes([0x47]) + bytes(187)
+        self.write(packet * 10)
+        self.assertTrue(self.verifier.verify_file(self.path, 20.0).ok)
+
+        self.write(packet * 10 + packet[:100])
+        self.assertIn('截断', self.verifier.verify_file(self.path, 20.0).message)
+
+
+class TestLibraryVerifier(unittest.TestCase):
+    """测试批量校验和结果缓存"""
+
+    def test_run(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            index = OutputIndex(temp_dir)
+            for resource_id, duration in (('v_1', 20.0), ('v_2', 30.0)):
+                name = f'{resource_id}.mp4'
+                with open(os.path.join(temp_dir, name), 'wb') as f:
+                    f.write(build_mp4(duration=20.0))
+                index.record(resource_id, name, os.path.join(temp_dir, name), 0, duration=duration)
+
+            calls = []
+            verifier = OutputVerifier(probe=False)
+            original = verifier.verify_file
+            verifier.verify_file = lambda *args: calls.append(args[2]) or original(*args)
+
+            results = {r.resource_id: r for r in LibraryVerifier(temp_dir, index, verifier, jobs=2).run()}
+            self.assertTrue(results['v_1'].ok)
+            self.assertFalse(results['v_2'].ok)
+            # 结果写入输出索引并持久化
+            self.assertTrue(OutputIndex(temp_dir).get('v_1')['verification']['ok'])
+
+            # 通过且没有变化的文件跳过，失败的文件重新校验
+            calls.clear()
+            results = LibraryVerifier(temp_dir, OutputIndex(temp_dir), verifier).run()
+            self.assertEqual(calls, ['v_2'])
+            self.assertEqual(len(results), 2)
+
+            calls.clear()
+            LibraryVerifier(temp_dir, OutputIndex(temp_dir), verifier).run(force=True)
+            self.assertEqual(sorted(calls), ['v_1', 'v_2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
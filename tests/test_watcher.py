@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import json
+import threading
+import time
+import sys
+import urllib.request
+from pathlib import Path
+
+# 添加src目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from xiaoet_downloader.core.watcher import CourseWatcher
+from xiaoet_downloader.models.segment import SegmentTable
+from xiaoet_downloader.models.video import DownloadResult, VideoResource
+
+
+class FakeCourse:
+    """可变的课程目录，记录处理过的资源"""
+
+    def __init__(self, *resource_ids):
+        self.resource_ids = list(resource_ids)
+        self.processed = []
+        self.fail = set()
+        self.tracker = None
+        self.release = threading.Event()
+
+    def list_resources(self):
+        return [VideoResource(resource_id, resource_id) for resource_id in self.resource_ids]
+
+    def process(self, resource):
+        self.processed.append(resource.resource_id)
+        if resource.resource_id == 'v_3':
+            # 报告一个片段的进度后等待，模拟进行中的传输
+            table = SegmentTable(['0.ts', '1.ts'])
+            table.mark_completed(0, 10)
+            self.tracker.update(resource, table, 10)
+            self.release.wait(5)
+        return DownloadResult(resource, resource.resource_id not in self.fail, '')
+
+
+class TestCourseWatcher(unittest.TestCase):
+    """测试守护模式的增量同步和状态接口"""
+
+    def wait_for(self, condition, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertTrue(condition())
+
+    def test_poll_only_new(self):
+        """测试只把新增资源加入队列，目录没有变化时不处理"""
+        course = FakeCourse('v_1', 'v_2')
+        watcher = CourseWatcher(course.list_resources, course.process)
+        self.assertEqual([r.resource_id for r in watcher.poll()], ['v_1', 'v_2'])
+        self.assertEqual(watcher.poll(), [])
+
+        course.resource_ids.insert(0, 'v_3')
+        self.assertEqual([r.resource_id for r in watcher.poll()], ['v_3'])
+        self.assertEqual(watcher.status()['queue_depth'], 3)
+        self.assertEqual(watcher.polls, 3)
+
+    def test_run_and_status(self):
+        """测试后台下载、失败重试和HTTP状态接口"""
+        course = FakeCourse('v_1', 'v_2')
+        course.fail.add('v_2')
+        watcher = CourseWatcher(course.list_resources, course.process, interval=0.1, status_port=0)
+        course.tracker = watcher.progress
+        thread = threading.Thread(target=watcher.run)
+        thread.start()
+        try:
+            # 失败的资源在之后的轮询中重试
+            self.wait_for(lambda: course.processed.count('v_2') >= 2)
+            self.assertEqual(course.processed.count('v_1'), 1)
+
+            course.resource_ids.append('v_3')
+            self.wait_for(lambda: watcher.progress.fetched_bytes == 10)
+            host, port = watcher.status_address
+            with urllib.request.urlopen(f'http://{host}:{port}/status', timeout=5) as response:
+                status = json.loads(response.read().decode('utf-8'))
+            self.assertEqual(status['completed'], 1)
+            self.assertGreaterEqual(status['failed'], 1)
+            self.assertEqual(status['downloaded_bytes'], 10)
+            self.assertEqual([(video['resource_id'], video['completed_segments'], video['total_segments'])
+                              for video in status['active']], [('v_3', 1, 2)])
+        finally:
+            course.release.set()
+            watcher.stop()
+            thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()